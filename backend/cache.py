@@ -0,0 +1,196 @@
+import atexit
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from backend.database import DatabaseError
+
+
+# Defaults de la sección [cache] de config.toml (el archivo, si no se indica,
+# es `cache.db` en el mismo directorio que la base de notas activa)
+DEFAULT_CACHE: Dict[str, Any] = {
+    "enabled": True,
+    "ttl": 7 * 24 * 3600,   # segundos de validez de una respuesta (0 = no expira)
+    "max_mb": 64,           # tamaño máximo; se desalojan las menos usadas (LRU)
+}
+
+CACHE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        prompt TEXT NOT NULL,
+        model TEXT NOT NULL,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses(accessed_at)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO counters(name, value) VALUES ('hits', 0), ('misses', 0)",
+]
+# Lecturas acumuladas en memoria (contadores y `accessed_at`) antes de escribirlas en una transacción
+FLUSH_EVERY = 256
+
+
+def cache_key(prompt: str, sysprompt: str, model: str, max_tokens: int) -> str:
+    """Hash del prompt formateado y de todos los parámetros que cambian la respuesta."""
+    payload = json.dumps([prompt, sysprompt, model, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache persistente de respuestas del LLM en SQLite, con TTL y desalojo LRU por tamaño."""
+
+    def __init__(self, db_file: str, ttl: int = DEFAULT_CACHE["ttl"],
+                 max_mb: float = DEFAULT_CACHE["max_mb"]) -> None:
+        self.db_file = db_file
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = self.misses = 0   # contadores de esta sesión (los totales quedan en la base)
+        self._conn: Optional[sqlite3.Connection] = None
+        # Pendientes de escribir: `get` solo lee; se vuelcan en `put`, `stats`, `close` o cada FLUSH_EVERY
+        self._pending = {"hits": 0, "misses": 0}
+        self._touched: Dict[str, float] = {}
+
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_file)
+                conn.execute("PRAGMA journal_mode = wal")
+                conn.execute("PRAGMA synchronous = normal")
+                conn.execute("PRAGMA busy_timeout = 5000")
+                with conn:
+                    for statement in CACHE_SCHEMA:
+                        conn.execute(statement)
+            except sqlite3.Error as e:
+                raise DatabaseError(f"No se pudo abrir la cache '{self.db_file}': {e}")
+            self._conn = conn
+            atexit.register(self.flush)  # Procesos de un solo comando: no pierden los pendientes
+        return self._conn
+
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        """Escribe contadores y `accessed_at` pendientes (dentro de una transacción abierta)."""
+        conn.executemany("UPDATE counters SET value = value + ? WHERE name = ?",
+                         [(count, name) for name, count in self._pending.items() if count])
+        conn.executemany("UPDATE responses SET accessed_at = max(accessed_at, ?) WHERE key = ?",
+                         [(accessed, key) for key, accessed in self._touched.items()])
+        self._pending = {"hits": 0, "misses": 0}
+        self._touched.clear()
+
+
+    def flush(self) -> None:
+        """Vuelca a la base las lecturas acumuladas en memoria."""
+        if self._conn is None or not (self._touched or any(self._pending.values())):
+            return
+        with self._conn:
+            self._flush(self._conn)
+
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la respuesta cacheada o None si no está o expiró.
+
+        Es solo una lectura: el acierto o fallo y el uso (para el desalojo LRU)
+        se acumulan en memoria y se escriben por lotes.
+        """
+        conn = self._get_conn()
+        now = time.time()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row and self.ttl and row[1] < now - self.ttl:
+            row = None  # Expirada: la reemplaza el próximo `put` o la borra `purge`
+
+        if row is None:
+            self.misses += 1
+            self._pending["misses"] += 1
+        else:
+            self.hits += 1
+            self._pending["hits"] += 1
+            self._touched[key] = now
+        if sum(self._pending.values()) >= FLUSH_EVERY:
+            self.flush()
+        return row[0] if row else None
+
+
+    def put(self, key: str, response: str, prompt: str = "", model: str = "") -> None:
+        """Guarda una respuesta y desaloja las menos usadas si se supera `max_mb`."""
+        conn = self._get_conn()
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses(key, prompt, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, prompt, model, response, size, now, now)
+            )
+            self._flush(conn)  # El desalojo tiene que ver los `accessed_at` recientes
+            self._evict(conn)
+
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        return len(victims)
+
+
+    def purge(self) -> int:
+        """Elimina las respuestas expiradas. Devuelve cuántas se borraron."""
+        if not self.ttl:
+            return 0
+        conn = self._get_conn()
+        with conn:
+            cursor = conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+
+    def clear(self) -> int:
+        """Vacía la cache y reinicia los contadores. Devuelve cuántas respuestas se borraron."""
+        conn = self._get_conn()
+        with conn:
+            cursor = conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE counters SET value = 0")
+            self._pending = {"hits": 0, "misses": 0}
+            self._touched.clear()
+        conn.execute("VACUUM")
+        return cursor.rowcount
+
+
+    def stats(self) -> Dict[str, Any]:
+        """Entradas, tamaño y contadores acumulados de aciertos/fallos."""
+        conn = self._get_conn()
+        self.flush()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        counters = dict(conn.execute("SELECT name, value FROM counters"))
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "file": self.db_file,
+            "entries": entries,
+            "size": size,
+            "max_size": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_ratio": counters["hits"] / lookups if lookups else 0.0,
+        }
+
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            atexit.unregister(self.flush)
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,110 @@
+from typing import List, Tuple
+
+# Estimación de tokens sin tokenizer: ~4 caracteres por token (texto en español/inglés)
+CHARS_PER_TOKEN = 4
+
+# Separadores preferidos para cortar, de mayor a menor (párrafo, línea, oración, palabra)
+_BOUNDARIES = ("\n\n", "\n", ". ", " ")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cantidad aproximada de tokens de un texto."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _boundary(text: str, low: int, high: int) -> int:
+    """Mejor posición de corte en text[low:high] (después del separador), o `high` si no hay."""
+    for separator in _BOUNDARIES:
+        index = text.rfind(separator, low, high)
+        if index != -1:
+            return index + len(separator)
+    return high
+
+
+def split_chunks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """Divide un texto en fragmentos de ~`chunk_tokens` que se solapan en ~`overlap_tokens`.
+
+    Corta preferentemente en fin de párrafo, de línea, de oración o entre
+    palabras, así ningún fragmento empieza o termina a mitad de palabra.
+    """
+    if chunk_tokens < 1 or overlap_tokens < 0 or overlap_tokens >= chunk_tokens:
+        raise ValueError(f"Parámetros de fragmentación inválidos (chunk_tokens={chunk_tokens}, overlap_tokens={overlap_tokens})")
+
+    size = chunk_tokens * CHARS_PER_TOKEN
+    overlap = overlap_tokens * CHARS_PER_TOKEN
+    if len(text) <= size:
+        return [text]
+
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            end = _boundary(text, start + size // 2, end)
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+
+        # El siguiente fragmento retrocede `overlap` caracteres, alineado a una palabra
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if overlap and space != -1 else next_start
+    return chunks
+
+
+def group_parts(parts: List[str], max_tokens: int) -> List[List[str]]:
+    """Agrupa resultados parciales en grupos de hasta ~`max_tokens` (al menos 2 por grupo).
+
+    Con dos o más partes siempre devuelve menos grupos que partes, así un
+    reduce jerárquico termina.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for part in parts:
+        tokens = estimate_tokens(part)
+        if len(current) >= 2 and size + tokens > max_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(part)
+        size += tokens
+    if len(current) == 1 and groups:
+        groups[-1].extend(current)
+    elif current:
+        groups.append(current)
+    return groups
+
+
+def join_parts(parts: List[str]) -> str:
+    """Une resultados parciales numerados para el paso de reduce."""
+    return "\n\n".join(f"[Parte {i}]\n{part.strip()}" for i, part in enumerate(parts, 1))
+
+
+def pack_notes(notes: List[Tuple[int, str]], max_tokens: int) -> Tuple[str, List[int]]:
+    """Arma el contexto de una pregunta con las notas que entran en ~`max_tokens`.
+
+    Las notas se toman en orden (de más a menos relevante) y se saltean las que
+    no entran completas; si ni la primera entra, se incluye recortada.
+
+    Returns:
+        Tuple[str, List[int]]: texto "[Nota id]\\n..." e IDs incluidos
+    """
+    parts: List[str] = []
+    used: List[int] = []
+    remaining = max_tokens
+    for note_id, content in notes:
+        part = f"[Nota {note_id}]\n{content.strip()}"
+        tokens = estimate_tokens(part)
+        if tokens > remaining:
+            if parts:
+                continue
+            part = part[:remaining * CHARS_PER_TOKEN]
+            tokens = remaining
+        parts.append(part)
+        used.append(note_id)
+        remaining -= tokens + 1
+        if remaining <= 0:
+            break
+    return "\n\n".join(parts), used
@@ -1,4 +1,12 @@
+import json
+import lzma
+import re
 import sqlite3
+import zlib
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.tracing import span
 
 
 class DatabaseError(Exception):
@@ -6,58 +14,950 @@ class DatabaseError(Exception):
     pass
 
 
+# Perfil de PRAGMAs por conexión (sobrescribible desde la sección [database] de config.toml)
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -16000,       # KiB (negativo) -> ~16 MB de page cache
+    "mmap_size": 134217728,     # 128 MB de lectura vía mmap
+    "busy_timeout": 5000,       # ms de espera ante locks de otros procesos
+}
+PRAGMA_KEYS = tuple(DEFAULT_PRAGMAS)
+
+
 def create_connection(db_file: str = "notes.db") -> sqlite3.Connection:
     try:
         conn = sqlite3.connect(db_file)
+        register_functions(conn)
         return conn
     except sqlite3.Error as e:
         raise DatabaseError(f"No se pudo conectar a la base de datos: {e}")
 
 
-def create_table(conn: sqlite3.Connection) -> None:
-    try:
-        sql = """
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Any]) -> None:
+    """Aplica un perfil de PRAGMAs (solo claves conocidas y valores simples)."""
+    for key, value in pragmas.items():
+        if key not in PRAGMA_KEYS:
+            raise DatabaseError(f"PRAGMA no soportado: '{key}'")
+        if not isinstance(value, int) and not (isinstance(value, str) and value.isalnum()):
+            raise DatabaseError(f"Valor inválido para PRAGMA {key}: {value!r}")
+        try:
+            conn.execute(f"PRAGMA {key} = {value}")
+        except sqlite3.Error as e:
+            raise DatabaseError(f"No se pudo aplicar PRAGMA {key}: {e}")
+
+
+# Vista previa guardada por nota (lo que muestran `listar` y el shell) y su expresión SQL
+PREVIEW_CHARS = 50
+_PREVIEW_SQL = f"substr({{}}, 1, {PREVIEW_CHARS})"
+
+# Compresión de cuerpos grandes (claves `compression` y `compress_min_bytes` de [database]).
+# La columna `compression` indica cómo está guardado `content`: 0 = texto plano
+COMPRESSION_CODES = {"none": 0, "zlib": 1, "lzma": 2}
+DEFAULT_COMPRESSION: Dict[str, Any] = {
+    "compression": "none",          # none | zlib | lzma
+    "compress_min_bytes": 4096,     # solo se comprimen cuerpos de al menos este tamaño (UTF-8)
+}
+# Se guarda comprimido solo si ahorra al menos un 10%
+_MIN_SAVING = 0.9
+
+# Política de compresión resuelta: (código, bytes mínimos); None = no comprimir
+Compression = Tuple[int, int]
+
+
+def compression_policy(algorithm: str, min_bytes: int = DEFAULT_COMPRESSION["compress_min_bytes"]) -> Optional[Compression]:
+    """'zlib'/'lzma'/'none' -> política para `add_note`/`update_note`. ValueError si no existe."""
+    code = COMPRESSION_CODES.get(str(algorithm).strip().lower())
+    if code is None:
+        raise ValueError(f"Compresión inválida: {algorithm!r}. Opciones: {', '.join(COMPRESSION_CODES)}")
+    return (code, max(0, int(min_bytes))) if code else None
+
+
+def compress_content(content: str, compression: Optional[Compression]) -> Tuple[Any, int]:
+    """(valor a guardar en `content`, código de `compression`) según la política."""
+    if not compression:
+        return content, 0
+    code, min_bytes = compression
+    raw = content.encode("utf-8")
+    if len(raw) < min_bytes:
+        return content, 0
+    packed = zlib.compress(raw, 6) if code == 1 else lzma.compress(raw, preset=6)
+    if len(packed) > len(raw) * _MIN_SAVING:
+        return content, 0  # Incompresible: no vale la pena pagar la descompresión
+    return packed, code
+
+
+def decompress_content(value: Any, code: int) -> str:
+    """Inverso de `compress_content`. También es la función SQL `mn_decompress(content, compression)`."""
+    if not code or isinstance(value, str):
+        return value  # Texto plano (también el que escribió otro cliente sobre una nota comprimida)
+    if code == 1:
+        return zlib.decompress(value).decode("utf-8")
+    if code == 2:
+        return lzma.decompress(value).decode("utf-8")
+    raise ValueError(f"Código de compresión desconocido: {code}")
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """Funciones SQL de las consultas de mnctl (`NOTE_TEXT`): registrar en cada conexión.
+
+    El esquema (triggers, índice full-text) no las usa: otros clientes de SQLite no las necesitan.
+    """
+    conn.create_function("mn_decompress", 2, decompress_content, deterministic=True)
+
+
+def _text_sql(table: str = "") -> str:
+    """Expresión SQL del texto de una nota (descomprime solo las filas comprimidas)."""
+    prefix = f"{table}." if table else ""
+    return (f"(CASE {prefix}compression WHEN 0 THEN {prefix}content "
+            f"ELSE mn_decompress({prefix}content, {prefix}compression) END)")
+
+
+NOTE_TEXT = _text_sql()
+
+# Columnas de una nota completa y de su versión para listados (mismas posiciones: id, texto, fecha)
+NOTE_COLUMNS = f"id, {NOTE_TEXT}, timestamp, updated_at"
+LISTING_COLUMNS = "id, preview, timestamp, char_count"
+
+
+# Migraciones de esquema: cada una lleva la base de la versión N-1 a la N
+# (PRAGMA user_version). Tienen que ser idempotentes: bases creadas antes del
+# sistema de migraciones (user_version = 0) pueden tener parte del esquema.
+def _migration_notes_table(conn: sqlite3.Connection) -> None:
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS notes (
             id INTEGER PRIMARY KEY,
             content TEXT NOT NULL,
             timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-        cursor = conn.cursor()
-        cursor.execute(sql)
+        )
+    """)
+
+
+def _migration_fts_index(conn: sqlite3.Connection) -> None:
+    create_fts_index(conn)
+
+
+def _migration_updated_at(conn: sqlite3.Connection) -> None:
+    if "updated_at" not in _columns(conn, "notes"):
+        conn.execute("ALTER TABLE notes ADD COLUMN updated_at TEXT")
+    conn.execute("UPDATE notes SET updated_at = timestamp WHERE updated_at IS NULL")
+    # `add_note` ya lo completa en el INSERT; el trigger cubre escrituras externas
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_updated_at_ai AFTER INSERT ON notes
+        WHEN new.updated_at IS NULL BEGIN
+            UPDATE notes SET updated_at = new.timestamp WHERE id = new.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_updated_at_au AFTER UPDATE OF content ON notes BEGIN
+            UPDATE notes SET updated_at = CURRENT_TIMESTAMP WHERE id = new.id;
+        END
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_timestamp ON notes(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_updated_at ON notes(updated_at)")
+
+
+def _migration_embeddings(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS note_embeddings (
+            note_id INTEGER PRIMARY KEY,
+            model TEXT NOT NULL,
+            dim INTEGER NOT NULL,
+            vector BLOB NOT NULL
+        )
+    """)
+    # Borrar o editar una nota invalida su vector: `sync` recalcula solo las que no tienen
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_embeddings_ad AFTER DELETE ON notes BEGIN
+            DELETE FROM note_embeddings WHERE note_id = old.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_embeddings_au AFTER UPDATE OF content ON notes BEGIN
+            DELETE FROM note_embeddings WHERE note_id = new.id;
+        END
+    """)
+
+
+def _migration_preview(conn: sqlite3.Connection) -> None:
+    columns = _columns(conn, "notes")
+    if "preview" not in columns:
+        conn.execute("ALTER TABLE notes ADD COLUMN preview TEXT")
+    if "char_count" not in columns:
+        conn.execute("ALTER TABLE notes ADD COLUMN char_count INTEGER")
+    conn.execute(f"UPDATE notes SET preview = {_PREVIEW_SQL.format('content')}, "
+                 f"char_count = length(content) WHERE char_count IS NULL")
+    # `add_note`/`update_note` ya los completan; los triggers cubren escrituras externas
+    # (el WHEN evita la escritura extra cuando ya vienen bien)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS notes_preview_ai AFTER INSERT ON notes
+        WHEN new.char_count IS NOT length(new.content) OR new.preview IS NOT {_PREVIEW_SQL.format('new.content')} BEGIN
+            UPDATE notes SET preview = {_PREVIEW_SQL.format('new.content')}, char_count = length(new.content)
+            WHERE id = new.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS notes_preview_au AFTER UPDATE OF content ON notes
+        WHEN new.char_count IS NOT length(new.content) OR new.preview IS NOT {_PREVIEW_SQL.format('new.content')} BEGIN
+            UPDATE notes SET preview = {_PREVIEW_SQL.format('new.content')}, char_count = length(new.content)
+            WHERE id = new.id;
+        END
+    """)
+    # Índice cubriente: listar lee solo el índice, nunca las páginas (ni overflow) de los cuerpos
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_listing ON notes(id, timestamp, preview, char_count)")
+
+
+# El texto cambió de verdad: otro valor con el mismo formato. Compactar cambia el formato sin cambiar
+# el texto; `update_note`, cuando cambia los dos, escribe también `char_count` (ver `_on_text_change`)
+_TEXT_CHANGED = "old.content IS NOT new.content AND old.compression = new.compression"
+# Fila guardada como texto plano (las comprimidas son BLOB): la que los triggers pueden leer
+_PLAIN = "typeof({}.content) = 'text'"
+
+
+def _on_text_change(conn: sqlite3.Connection, trigger: str, body: str) -> None:
+    """(Re)crea los triggers que ejecutan `body` cuando cambia el texto de una nota.
+
+    Son dos: un UPDATE del contenido en el mismo formato, o una escritura de mnctl que cambia
+    contenido y formato a la vez (`update_note`). Compactar no escribe `char_count`.
+    """
+    for name, event, guard in (
+        (trigger, "UPDATE OF content", _TEXT_CHANGED),
+        (f"{trigger}_format", "UPDATE OF char_count", "old.compression != new.compression"),
+    ):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} AFTER {event} ON notes WHEN {guard} BEGIN {body} END")
+
+
+def _migration_compression(conn: sqlite3.Connection) -> None:
+    if "compression" not in _columns(conn, "notes"):
+        conn.execute("ALTER TABLE notes ADD COLUMN compression INTEGER NOT NULL DEFAULT 0")
+
+    # Todo sigue siendo SQL puro: cualquier cliente de SQLite puede escribir en `notes` y buscar
+    _on_text_change(conn, "notes_updated_at_au",
+                    "UPDATE notes SET updated_at = CURRENT_TIMESTAMP WHERE id = new.id;")
+    _on_text_change(conn, "notes_embeddings_au", "DELETE FROM note_embeddings WHERE note_id = new.id;")
+    # La vista previa de una nota comprimida la escribe mnctl; los triggers solo leen texto plano
+    for trigger, event in (("notes_preview_ai", "INSERT"), ("notes_preview_au", "UPDATE OF content")):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute(f"""
+            CREATE TRIGGER {trigger} AFTER {event} ON notes
+            WHEN {_PLAIN.format('new')} AND (new.char_count IS NOT length(new.content)
+                OR new.preview IS NOT {_PREVIEW_SQL.format('new.content')}) BEGIN
+                UPDATE notes SET preview = {_PREVIEW_SQL.format('new.content')}, char_count = length(new.content)
+                WHERE id = new.id;
+            END
+        """)
+
+    # El índice full-text se reconstruye sobre una vista con el texto plano (un BLOB no se tokeniza)
+    if has_fts_index(conn):
+        conn.execute("DROP TABLE notes_fts")
+        for trigger in ("notes_fts_ai", "notes_fts_ad", "notes_fts_au", "notes_compressed_bu", "notes_compressed_bd"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for sql in FTS_TEXT_SCHEMA:
+            conn.execute(sql)
+        _on_text_change(conn, "notes_fts_au", f"""
+            INSERT INTO notes_fts(notes_fts, rowid, content)
+            SELECT 'delete', old.id, old.content WHERE {_PLAIN.format('old')};
+            INSERT INTO notes_fts(rowid, content) SELECT new.id, new.content WHERE {_PLAIN.format('new')};
+        """)
+
+
+def _migration_changes(conn: sqlite3.Connection) -> None:
+    # Una fila por nota con su último cambio: cada escritura le da un `seq` nuevo (AUTOINCREMENT
+    # nunca reutiliza números), así la tabla no crece con las ediciones y el borrado queda como tombstone
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER NOT NULL UNIQUE,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_changed_at ON changes(changed_at)")
+    # Las notas existentes cuentan como creadas: `--since 0` equivale a exportar todo
+    conn.execute("""
+        INSERT INTO changes(note_id, op, changed_at)
+        SELECT id, 'insert', coalesce(updated_at, timestamp) FROM notes
+        WHERE id NOT IN (SELECT note_id FROM changes) ORDER BY id
+    """)
+    # DELETE + INSERT (y no INSERT OR REPLACE): el ON CONFLICT de la sentencia externa no lo pisa
+    def record(row: str, op: str) -> str:
+        return (f"DELETE FROM changes WHERE note_id = {row}.id; "
+                f"INSERT INTO changes(note_id, op) VALUES ({row}.id, '{op}');")
+
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS changes_ai AFTER INSERT ON notes BEGIN {record('new', 'insert')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS changes_ad AFTER DELETE ON notes BEGIN {record('old', 'delete')} END")
+    _on_text_change(conn, "changes_au", record("new", "update"))
+
+
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migration_notes_table,   # 1
+    _migration_fts_index,     # 2
+    _migration_updated_at,    # 3
+    _migration_embeddings,    # 4
+    _migration_preview,       # 5
+    _migration_compression,   # 6
+    _migration_changes,       # 7
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Aplica en orden las migraciones pendientes, en una sola transacción.
+
+    Returns:
+        int: versión de esquema resultante
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION  # Camino rápido: sin lock de escritura
+
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Releer con el lock tomado: otro proceso pudo migrar mientras tanto
+        version = get_schema_version(conn)
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[number - 1](conn)
+            conn.execute(f"PRAGMA user_version = {number}")
         conn.commit()
+        return max(version, SCHEMA_VERSION)
     except sqlite3.Error as e:
-        raise DatabaseError(f"No se pudo crear la tabla: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        raise DatabaseError(f"No se pudo migrar el esquema: {e}")
+
 
+# Índice full-text (FTS5, external content sobre `notes`) sincronizado por triggers
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE notes_fts USING fts5(
+        content,
+        content='notes',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF content ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO notes_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO notes_fts(notes_fts) VALUES('rebuild')",  # Backfill de notas existentes
+]
 
-def add_note(conn: sqlite3.Connection, content: str) -> int:
-    sql = "INSERT INTO notes(content) VALUES(?)" # (VALUES(?) → marcador de posición; evita concatenar strings y previene inyección SQL
+# Esquema full-text desde la migración 6: external content sobre `notes_fts_source`, que expone el
+# texto plano (NULL para las comprimidas). Los triggers indexan las filas de texto; las comprimidas
+# las indexa y desindexa mnctl al escribirlas (`_index_note`/`_unindex_note`). El UPDATE lo agrega
+# `_migration_compression` con `_on_text_change`
+FTS_TEXT_SCHEMA = [
+    f"""
+    CREATE VIEW IF NOT EXISTS notes_fts_source AS
+    SELECT id, CASE WHEN {_PLAIN.format('notes')} THEN content END AS content FROM notes
+    """,
+    """
+    CREATE VIRTUAL TABLE notes_fts USING fts5(
+        content,
+        content='notes_fts_source',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes WHEN {_PLAIN.format('new')} BEGIN
+        INSERT INTO notes_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER notes_fts_ad AFTER DELETE ON notes WHEN {_PLAIN.format('old')} BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    # Otro cliente no puede sacar del índice el texto de una nota comprimida: se le rechaza la
+    # escritura antes de dejar el índice inconsistente. mnctl la desindexa antes de escribir
+    *(f"""
+    CREATE TRIGGER notes_compressed_{suffix} BEFORE {event} ON notes
+    WHEN typeof(old.content) = 'blob' AND EXISTS (SELECT 1 FROM notes_fts_docsize WHERE id = old.id) BEGIN
+        SELECT RAISE(ABORT, 'La nota está comprimida: modificala o borrala con mnctl');
+    END
+    """ for suffix, event in (("bu", "UPDATE OF content"), ("bd", "DELETE"))),
+    "INSERT INTO notes_fts(notes_fts) VALUES('rebuild')",
+]
+
+
+def has_fts_index(conn: sqlite3.Connection) -> bool:
     cursor = conn.cursor()
-    cursor.execute(sql, (content,))
-    conn.commit()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+    return cursor.fetchone() is not None
+
+
+def create_fts_index(conn: sqlite3.Connection) -> bool:
+    """Crea el índice FTS5 si falta y lo rellena con las notas existentes.
+
+    Se ejecuta dentro de la transacción de `migrate`.
+
+    Returns:
+        bool: True si el índice está disponible, False si SQLite no tiene FTS5.
+    """
+    if has_fts_index(conn):
+        return True
+
+    try:
+        conn.execute(FTS_SCHEMA[0])
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e):
+            return False  # SQLite compilado sin FTS5: `search_notes` usa LIKE
+        raise
+    for sql in FTS_SCHEMA[1:]:
+        conn.execute(sql)
+    return True
+
+
+class ConnectionManager:
+    """Conexión SQLite persistente: abre la base y prepara el esquema una sola vez."""
+
+    def __init__(self, db_file: str = "notes.db", pragmas: Optional[Dict[str, Any]] = None,
+                 cached_statements: int = 128) -> None:
+        self.db_file = db_file
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._conn: Optional[sqlite3.Connection] = None
+
+
+    def get(self) -> sqlite3.Connection:
+        """Devuelve la conexión activa, abriéndola (PRAGMAs + migraciones) al primer uso."""
+        if self._conn is None:
+            with span("db.open"):
+                try:
+                    conn = sqlite3.connect(self.db_file, cached_statements=self.cached_statements)
+                except sqlite3.Error as e:
+                    raise DatabaseError(f"No se pudo conectar a la base de datos: {e}")
+                register_functions(conn)
+                try:
+                    apply_pragmas(conn, self.pragmas)
+                    migrate(conn)
+                except DatabaseError:
+                    conn.close()
+                    raise
+            self._conn = conn
+        return self._conn
+
+
+    def close(self) -> None:
+        """Cierra la conexión si está abierta. Es seguro llamarlo varias veces."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+
+_INSERT_NOTE = ("INSERT INTO notes(content, updated_at, preview, char_count, compression) "
+                "VALUES(?, CURRENT_TIMESTAMP, ?, ?, ?)")
+
+
+def _note_values(content: str, compression: Optional[Compression]) -> Tuple[Any, str, int, int]:
+    """(content guardado, preview, char_count, compression) de un texto."""
+    value, code = compress_content(content, compression)
+    return value, content[:PREVIEW_CHARS], len(content), code
+
+
+def add_note(conn: sqlite3.Connection, content: str, commit: bool = True,
+             compression: Optional[Compression] = None) -> int:
+    sql = _INSERT_NOTE # (VALUES(?) → marcador de posición; evita concatenar strings y previene inyección SQL
+    cursor = conn.cursor()
+    values = _note_values(content, compression)
+    cursor.execute(sql, values)
     note_id = cursor.lastrowid
+    if values[3]:
+        _index_note(conn, note_id, content)
+    if commit:
+        conn.commit()
     return note_id
 
 
+def _index_note(conn: sqlite3.Connection, note_id: int, content: str) -> None:
+    """Indexa el texto de una nota recién guardada comprimida: los triggers solo leen texto plano."""
+    if has_fts_index(conn):
+        conn.execute("INSERT INTO notes_fts(rowid, content) VALUES (?, ?)", (note_id, content))
+
+
+def _unindex_note(conn: sqlite3.Connection, note_id: int) -> None:
+    """Antes de modificar o borrar una nota: saca del índice su texto si está guardada comprimida."""
+    if not has_fts_index(conn):
+        return
+    row = conn.execute("SELECT content, compression FROM notes WHERE id = ? AND typeof(content) = 'blob'",
+                       (note_id,)).fetchone()
+    if row is not None:
+        conn.execute("INSERT INTO notes_fts(notes_fts, rowid, content) VALUES ('delete', ?, ?)",
+                     (note_id, decompress_content(*row)))
+
+
+def _insert_notes(conn: sqlite3.Connection, contents: Iterable[str], compression: Optional[Compression]) -> int:
+    """Inserta en orden: tandas de texto plano con `executemany` y las comprimidas de a una (`add_note`)."""
+    cursor = conn.cursor()
+    plain: List[tuple] = []
+    total = 0
+    for content in contents:
+        values = _note_values(content, compression)
+        if values[3]:
+            cursor.executemany(_INSERT_NOTE, plain)
+            plain = []
+            add_note(conn, content, commit=False, compression=compression)
+        else:
+            plain.append(values)
+        total += 1
+    cursor.executemany(_INSERT_NOTE, plain)
+    return total
+
+
+def add_notes(conn: sqlite3.Connection, contents: Iterable[str], batch_size: Optional[int] = None,
+              compression: Optional[Compression] = None) -> int:
+    """Inserta muchas notas con `executemany`.
+
+    Args:
+        contents: contenidos a insertar (puede ser un generador)
+        batch_size: notas por transacción; None o 0 = una sola transacción
+        compression: política de compresión de los cuerpos (ver `compression_policy`)
+
+    Returns:
+        int: cantidad de notas insertadas
+    """
+    total = 0
+    try:
+        if not batch_size:
+            total = _insert_notes(conn, contents, compression)
+            conn.commit()
+            return total
+
+        contents = iter(contents)
+        while batch := list(islice(contents, batch_size)):
+            total += _insert_notes(conn, batch, compression)
+            conn.commit()
+        return total
+    except BaseException:
+        conn.rollback()
+        raise
+
+
 def get_all_notes(conn: sqlite3.Connection) -> list[tuple]:
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM notes")
+    cursor.execute(f"SELECT {NOTE_COLUMNS} FROM notes")
     rows = cursor.fetchall()
     return rows
 
 
-def update_note(conn: sqlite3.Connection, note_id: int, new_content: str) -> None:
-    sql = "UPDATE notes SET content = ? WHERE id = ?"
+def _like_pattern(query: str) -> str:
+    """Patrón LIKE literal (escapa comodines) para búsquedas sin FTS5."""
+    return "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+# Frases entre comillas (se respetan) o palabras sueltas
+_QUERY_TERMS = re.compile(r'"[^"]*"?|(?<![\w*^])\w+(?![\w*:(])')
+_OPERATORS = {"AND", "OR", "NOT", "NEAR"}
+
+
+def _prefix_terms(query: str) -> str:
+    """Agrega `*` a las palabras sueltas: `micro` encuentra `microservicios`, como la búsqueda por LIKE."""
+    def term(match: "re.Match") -> str:
+        word = match.group()
+        return word if word.startswith('"') or word in _OPERATORS else word + "*"
+    return _QUERY_TERMS.sub(term, query)
+
+
+def _match_expression(conn: sqlite3.Connection, query: str) -> str:
+    """Devuelve la consulta FTS5 con las palabras sueltas como prefijo, tal cual si así no es válida, o como frase literal."""
+    for candidate in (_prefix_terms(query), query):
+        try:
+            conn.execute("SELECT 1 FROM notes_fts WHERE notes_fts MATCH ? LIMIT 1", (candidate,))
+            return candidate
+        except sqlite3.OperationalError:
+            continue
+    return '"' + query.replace('"', '""') + '"'
+
+
+def iter_notes(conn: sqlite3.Connection, limit: Optional[int] = None, after: Optional[int] = None,
+               reverse: bool = False, page_size: int = 500, until: Optional[int] = None,
+               query: Optional[str] = None, preview: bool = False) -> Iterator[tuple]:
+    """Recorre las notas por páginas sin materializar la tabla completa.
+
+    Usa paginación keyset sobre `id` (monótono, por lo que también respeta
+    el orden de `timestamp`): cada página es una consulta `WHERE id > ?`
+    sobre la clave primaria, así el costo no crece con el desplazamiento.
+
+    Args:
+        limit: máximo de notas a devolver (None = todas)
+        after: empezar después de este ID (antes, si `reverse`)
+        reverse: recorrer de la más nueva a la más vieja
+        page_size: filas leídas por página
+        until: último ID a incluir en el sentido del recorrido
+        query: filtrar por una búsqueda full-text (misma sintaxis que `search_notes`)
+        preview: devolver (id, preview, timestamp, char_count) en vez de la nota completa;
+            se resuelve con el índice cubriente, sin leer los cuerpos
+    """
+    if page_size < 1:
+        raise ValueError("page_size debe ser mayor a 0")
+
+    op, order = ("<", "DESC") if reverse else (">", "ASC")
+    filters, params = [], []
+    if until is not None:
+        filters.append(f"id {'>=' if reverse else '<='} ?")
+        params.append(until)
+    if query and has_fts_index(conn):
+        filters.append("id IN (SELECT rowid FROM notes_fts WHERE notes_fts MATCH ?)")
+        params.append(_match_expression(conn, query))
+    elif query:
+        filters.append(f"{NOTE_TEXT} LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(query))
+
     cursor = conn.cursor()
-    cursor.execute(sql, (new_content, note_id))
-    conn.commit()
+    last_id = after
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        where, args = list(filters), list(params)
+        if last_id is not None:
+            where.append(f"id {op} ?")
+            args.append(last_id)
+
+        sql = f"SELECT {LISTING_COLUMNS if preview else NOTE_COLUMNS} FROM notes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cursor.execute(f"{sql} ORDER BY id {order} LIMIT ?", (*args, size))
+
+        rows = cursor.fetchmany(size)
+        yield from rows
+
+        if len(rows) < size:
+            return
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def get_note(conn: sqlite3.Connection, note_id: int) -> Optional[tuple]:
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {NOTE_COLUMNS} FROM notes WHERE id = ?", (note_id,))
+    return cursor.fetchone()
+
+
+def data_version(conn: sqlite3.Connection) -> int:
+    """`PRAGMA data_version`: cambia cuando otra conexión confirma una escritura en la base."""
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def last_change(conn: sqlite3.Connection) -> int:
+    """Número de secuencia del último cambio registrado (0 si no hay ninguno)."""
+    return conn.execute("SELECT coalesce(max(seq), 0) FROM changes").fetchone()[0]
+
+
+def iter_changes(conn: sqlite3.Connection, since: int = 0, since_time: Optional[str] = None,
+                 page_size: int = 500) -> Iterator[tuple]:
+    """Recorre las notas cambiadas después de `since` (número de secuencia), en orden de cambio.
+
+    Cada nota aparece una sola vez, con su último cambio; el costo es
+    proporcional a los cambios, no al tamaño de la base.
+
+    Args:
+        since: último `seq` ya sincronizado (0 = todas)
+        since_time: solo cambios desde esta fecha UTC ('YYYY-MM-DD HH:MM:SS', como `changed_at`)
+        page_size: filas leídas por página
+
+    Yields:
+        tuple: (seq, id, op, changed_at, texto, timestamp); texto y timestamp
+        son None para las notas borradas (op 'delete', tombstone)
+    """
+    if page_size < 1:
+        raise ValueError("page_size debe ser mayor a 0")
+
+    sql = (f"SELECT c.seq, c.note_id, c.op, c.changed_at, {_text_sql('n')}, n.timestamp "
+           f"FROM changes c LEFT JOIN notes n ON n.id = c.note_id WHERE c.seq > ?")
+    params: List[Any] = []
+    if since_time is not None:
+        sql += " AND c.changed_at >= ?"
+        params.append(since_time)
+
+    cursor = conn.cursor()
+    last_seq = since
+    while True:
+        cursor.execute(f"{sql} ORDER BY c.seq LIMIT ?", (last_seq, *params, page_size))
+        rows = cursor.fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_seq = rows[-1][0]
+
+
+def search_notes(conn: sqlite3.Connection, query: str, limit: int = 20,
+                 highlight: tuple[str, str] = ("[", "]")) -> list[tuple]:
+    """Búsqueda full-text ordenada por relevancia (BM25).
+
+    Acepta la sintaxis de FTS5: frases ("api gateway"), prefijos (micro*)
+    y operadores booleanos (AND, OR, NOT). Las palabras sueltas se buscan
+    como prefijo (micro -> micro*). Si la consulta no es válida para FTS5
+    se busca como frase literal.
+
+    Returns:
+        list[tuple]: (id, timestamp, snippet) con los términos resaltados (la vista previa si la nota está comprimida).
+    """
+    cursor = conn.cursor()
+
+    if not has_fts_index(conn):
+        cursor.execute(
+            "SELECT id, timestamp, preview FROM notes "
+            f"WHERE {NOTE_TEXT} LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+            (_like_pattern(query), limit)
+        )
+        return cursor.fetchall()
+
+    sql = """
+    SELECT n.id, n.timestamp, coalesce(snippet(notes_fts, 0, ?, ?, '...', 12), n.preview)
+    FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+    WHERE notes_fts MATCH ?
+    ORDER BY bm25(notes_fts)
+    LIMIT ?
+    """
+    start, end = highlight
+    cursor.execute(sql, (start, end, _match_expression(conn, query), limit))
+    return cursor.fetchall()
 
 
-def delete_note(conn: sqlite3.Connection, note_id: int) -> None:
+def update_note(conn: sqlite3.Connection, note_id: int, new_content: str, commit: bool = True,
+                compression: Optional[Compression] = None) -> int:
+    sql = "UPDATE notes SET content = ?, preview = ?, char_count = ?, compression = ? WHERE id = ?"
+    cursor = conn.cursor()
+    _unindex_note(conn, note_id)
+    values = _note_values(new_content, compression)
+    cursor.execute(sql, (*values, note_id))
+    if values[3] and cursor.rowcount:
+        _index_note(conn, note_id, new_content)
+    if commit:
+        conn.commit()
+    return cursor.rowcount
+
+
+def delete_note(conn: sqlite3.Connection, note_id: int, commit: bool = True) -> int:
     sql = "DELETE FROM notes WHERE id = ?"
     cursor = conn.cursor()
+    _unindex_note(conn, note_id)
     cursor.execute(sql, (note_id,))
+    if commit:
+        conn.commit()
+    return cursor.rowcount
+
+
+def _apply_operation(conn: sqlite3.Connection, operation: Any,
+                     compression: Optional[Compression] = None) -> Dict[str, Any]:
+    """Aplica una operación de `apply_operations` sin commitear. Devuelve el resultado parcial."""
+    if isinstance(operation, str):
+        operation = json.loads(operation)
+    if not isinstance(operation, dict):
+        raise ValueError("La operación tiene que ser un objeto JSON")
+
+    op = operation.get("op")
+    if op == "create":
+        content = str(operation.get("content") or "").strip()
+        if not content:
+            raise ValueError("Falta 'content' para crear una nota")
+        return {"op": op, "id": add_note(conn, content, commit=False, compression=compression)}
+
+    if op not in ("update", "delete"):
+        raise ValueError(f"Operación inválida: {op!r}. Usá 'create', 'update' o 'delete'")
+    note_id = operation.get("id")
+    if not isinstance(note_id, int) or isinstance(note_id, bool):
+        raise ValueError(f"Falta 'id' (entero) para '{op}'")
+
+    if op == "update":
+        content = str(operation.get("content") or "").strip()
+        if not content:
+            raise ValueError("Falta 'content' para modificar una nota")
+        changed = update_note(conn, note_id, content, commit=False, compression=compression)
+    else:
+        changed = delete_note(conn, note_id, commit=False)
+    if not changed:
+        raise LookupError(f"No existe la nota con ID {note_id}")
+    return {"op": op, "id": note_id}
+
+
+def apply_operations(conn: sqlite3.Connection, operations: Iterable[Any],
+                     chunk_size: Optional[int] = None,
+                     compression: Optional[Compression] = None) -> Iterator[Dict[str, Any]]:
+    """Aplica un stream de operaciones create/update/delete en transacciones.
+
+    Cada operación es un dict (o una línea JSON) como `{"op": "create", "content": ...}`,
+    `{"op": "update", "id": 1, "content": ...}` o `{"op": "delete", "id": 1}`.
+    Una operación inválida se reporta y no aborta el resto.
+
+    Args:
+        operations: operaciones a aplicar (puede ser un generador)
+        chunk_size: operaciones por transacción; None o 0 = una sola transacción
+        compression: política de compresión de los cuerpos creados o modificados
+
+    Yields:
+        dict: resultado por operación (`index`, `ok`, `op`, `id` o `error`),
+        recién después de que su transacción fue commiteada.
+    """
+    results: List[Dict[str, Any]] = []
+    try:
+        for index, operation in enumerate(operations):
+            try:
+                result = {"index": index, "ok": True, **_apply_operation(conn, operation, compression)}
+            except (ValueError, LookupError, sqlite3.IntegrityError) as e:
+                result = {"index": index, "ok": False, "error": str(e)}
+            results.append(result)
+
+            if chunk_size and len(results) >= chunk_size:
+                conn.commit()
+                yield from results
+                results = []
+
+        conn.commit()
+        yield from results
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def compact_notes(conn: sqlite3.Connection, compression: Optional[Compression], batch_size: int = 500,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Recodifica los cuerpos guardados según `compression` (None = descomprimir todos).
+
+    Solo reescribe las filas cuya codificación cambia; el texto es el mismo,
+    así que ni `updated_at`, ni los vectores, ni el log de cambios se tocan. Las que
+    estaban comprimidas se desindexan y reindexan con el mismo texto (`notes_compressed_bu`).
+
+    Returns:
+        dict: `notes` recorridas, `changed` reescritas y `bytes_before`/`bytes_after` de los cuerpos
+    """
+    total = conn.execute("SELECT count(*) FROM notes").fetchone()[0]
+    stats = {"notes": 0, "changed": 0, "bytes_before": 0, "bytes_after": 0}
+    fts = has_fts_index(conn)
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute(
+                "SELECT id, content, compression FROM notes WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            updates, reindex = [], []
+            for note_id, value, code in rows:
+                text = decompress_content(value, code)
+                new_value, new_code = compress_content(text, compression)
+                if new_code != code:
+                    updates.append((new_value, new_code, note_id))
+                    if fts and isinstance(value, bytes):
+                        reindex.append((note_id, text))
+                else:
+                    new_value = value
+                stats["bytes_before"] += _stored_size(value)
+                stats["bytes_after"] += _stored_size(new_value)
+            conn.executemany("INSERT INTO notes_fts(notes_fts, rowid, content) VALUES ('delete', ?, ?)", reindex)
+            conn.executemany("UPDATE notes SET content = ?, compression = ? WHERE id = ?", updates)
+            conn.executemany("INSERT INTO notes_fts(rowid, content) VALUES (?, ?)", reindex)
+            conn.commit()
+            stats["notes"] += len(rows)
+            stats["changed"] += len(updates)
+            last_id = rows[-1][0]
+            if progress:
+                progress(stats["notes"], total)
+    except BaseException:
+        conn.rollback()
+        raise
+    return stats
+
+
+def _stored_size(value: Any) -> int:
+    return len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+
+
+def vacuum(conn: sqlite3.Connection) -> None:
+    """Reescribe el archivo para devolver al disco las páginas liberadas (ej. tras `compact_notes`)."""
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def delete_embeddings(conn: sqlite3.Connection, keep_model: Optional[str] = None) -> int:
+    """Borra los vectores guardados (salvo los de `keep_model`, si se indica). Devuelve cuántos.
+
+    Si no hay nada que borrar no escribe (`buscar --semantic` la llama antes de cada consulta).
+    """
+    where, params = ("", ()) if keep_model is None else (" WHERE model != ?", (keep_model,))
+    if conn.execute(f"SELECT 1 FROM note_embeddings{where} LIMIT 1", params).fetchone() is None:
+        return 0
+    cursor = conn.execute(f"DELETE FROM note_embeddings{where}", params)
     conn.commit()
+    return cursor.rowcount
+
+
+def count_missing_embeddings(conn: sqlite3.Connection) -> int:
+    """Cantidad de notas sin vector (nuevas, editadas o nunca indexadas)."""
+    return conn.execute(
+        "SELECT count(*) FROM notes n LEFT JOIN note_embeddings e ON e.note_id = n.id "
+        "WHERE e.note_id IS NULL"
+    ).fetchone()[0]
+
+
+def iter_missing_embeddings(conn: sqlite3.Connection, page_size: int = 256) -> Iterator[List[tuple]]:
+    """Recorre por páginas (keyset sobre `id`) las notas sin vector: listas de (id, content)."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT n.id, {_text_sql('n')} FROM notes n LEFT JOIN note_embeddings e ON e.note_id = n.id "
+            "WHERE e.note_id IS NULL AND n.id > ? ORDER BY n.id LIMIT ?",
+            (last_id, page_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def save_embeddings(conn: sqlite3.Connection, rows: Iterable[tuple]) -> int:
+    """Guarda vectores (note_id, model, dim, vector) en una transacción. Devuelve cuántos."""
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(
+            "INSERT OR REPLACE INTO note_embeddings(note_id, model, dim, vector) VALUES(?, ?, ?, ?)", rows
+        )
+        conn.commit()
+        return cursor.rowcount
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def count_embeddings(conn: sqlite3.Connection, model: str) -> Tuple[int, Optional[int]]:
+    """(cantidad, dimensión) de los vectores guardados para `model` (dimensión None si no hay)."""
+    return conn.execute("SELECT count(*), max(dim) FROM note_embeddings WHERE model = ?", (model,)).fetchone()
+
+
+def iter_embeddings(conn: sqlite3.Connection, model: str) -> Iterator[tuple]:
+    """Recorre los vectores guardados para `model` sin materializarlos: (note_id, dim, vector) por ID."""
+    return conn.execute(
+        "SELECT note_id, dim, vector FROM note_embeddings WHERE model = ? ORDER BY note_id", (model,)
+    )
 
 
 if __name__ == "__main__":
@@ -65,7 +965,7 @@ if __name__ == "__main__":
     conn = create_connection()
 
     if conn:
-        create_table(conn)
+        migrate(conn)
         # Ejemplo de flujo CRUD:
         id1 = add_note(conn, "Mi primera nota de prueba.")
         id2 = add_note(conn, "Otra nota desde el script.")
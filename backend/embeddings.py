@@ -0,0 +1,251 @@
+import re
+import unicodedata
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend import gemini
+from backend.database import (
+    NOTE_TEXT,
+    count_embeddings,
+    count_missing_embeddings,
+    data_version,
+    delete_embeddings,
+    iter_embeddings,
+    iter_missing_embeddings,
+    save_embeddings
+)
+
+
+class EmbeddingError(Exception):
+    """Error del embedder (configuración inválida o fallo de la llamada)."""
+    pass
+
+
+_WORD_RE = re.compile(r"\w\w+")
+_COMBINING_RE = re.compile("[\u0300-\u036f]")
+# Palabras vacías (ya sin tildes): no aportan significado y acercan notas que no tienen nada en común
+_STOPWORDS = frozenset("""
+    de la que el en los del se las por un para con no una su al lo como mas pero sus le ya este si
+    porque esta entre cuando muy sin sobre tambien me hasta hay donde desde todo nos durante todos
+    uno les ni otros ese eso ante ellos esto mi antes unos yo otro otras otra tanto esa estos mucho
+    nada muchos cual poco ella estas algo es son fue ser the of and to in is it that for on with as
+    was at by be this are or from an
+""".split())
+
+
+def _words(text: str) -> List[str]:
+    """Palabras en minúscula y sin tildes (mismo criterio que el índice full-text), sin palabras vacías."""
+    words = _WORD_RE.findall(_COMBINING_RE.sub("", unicodedata.normalize("NFKD", text.lower())))
+    return [word for word in words if word not in _STOPWORDS]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normaliza cada fila a norma 1 (así el coseno es un producto punto)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class Embedder(ABC):
+    """Interfaz de un modelo de embeddings: textos -> matriz float32 (una fila normalizada por texto).
+
+    `model` identifica los vectores guardados: si cambia, se recalculan.
+    """
+
+    name = "base"
+    model = ""
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder(Embedder):
+    """Embeddings locales por feature hashing de palabras y bigramas (sin red ni modelo).
+
+    Cada término suma ±1 en la posición `crc32(término) % dim` (el bit alto
+    del hash decide el signo, así las colisiones tienden a cancelarse). Capta
+    vocabulario compartido, no sinónimos: es el modo offline y de CI.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512) -> None:
+        if dim < 16:
+            raise EmbeddingError(f"Dimensión inválida para el embedder local: {dim} (mínimo 16)")
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+
+    def embed(self, texts):
+        rows: List[int] = []
+        terms: List[str] = []
+        for row, text in enumerate(texts):
+            words = _words(text)
+            row_terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            terms.extend(row_terms)
+            rows.extend([row] * len(row_terms))
+
+        # Todo el lote en una sola pasada de NumPy: (fila, posición) -> suma de signos
+        hashes = np.fromiter((zlib.crc32(term.encode("utf-8")) for term in terms), dtype=np.uint32, count=len(terms))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        cells = np.asarray(rows, dtype=np.int64) * self.dim + (hashes & 0x7FFFFFFF) % self.dim
+        vectors = np.bincount(cells, weights=signs, minlength=len(texts) * self.dim).reshape(len(texts), self.dim)
+        # Frecuencia sublineal: una palabra repetida no domina el vector
+        return _normalize(np.sign(vectors) * np.log1p(np.abs(vectors)))
+
+
+class GeminiEmbedder(Embedder):
+    """Embeddings de Gemini (`embed_content`), en lotes de hasta `batch_size` textos por llamada."""
+
+    name = "gemini"
+    batch_size = 100
+
+    def __init__(self, model: str = gemini.DEFAULT_EMBEDDING_MODEL) -> None:
+        self.model = model or gemini.DEFAULT_EMBEDDING_MODEL
+
+
+    def embed(self, texts):
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            try:
+                vectors.extend(gemini.embed(list(texts[start:start + self.batch_size]), self.model))
+            except Exception as e:
+                raise EmbeddingError(f"Gemini no pudo calcular los embeddings: {e}")
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    GeminiEmbedder.name: GeminiEmbedder,
+}
+
+
+def create_embedder(settings: Dict[str, Any]) -> Embedder:
+    """Crea el embedder indicado por `settings["embedder"]` (sección [embeddings] de la config)."""
+    name = settings.get("embedder", HashingEmbedder.name)
+    if name not in EMBEDDERS:
+        raise EmbeddingError(f"Embedder desconocido: '{name}'. Opciones: {', '.join(EMBEDDERS)}")
+    if name == HashingEmbedder.name:
+        return HashingEmbedder(dim=int(settings.get("dim", 512)))
+    return GeminiEmbedder(model=settings.get("model", ""))
+
+
+def sync_embeddings(conn: Any, embedder: Embedder, batch_size: int = 256, rebuild: bool = False,
+                    progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Calcula los vectores que faltan: notas nuevas, editadas o de otro modelo.
+
+    Los triggers de `note_embeddings` borran el vector de una nota al editarla
+    o eliminarla, así que cada sincronización solo procesa lo que cambió.
+
+    Args:
+        rebuild: descartar todos los vectores y recalcularlos
+        progress: callback (procesadas, total) tras cada lote
+
+    Returns:
+        int: cantidad de notas indexadas
+    """
+    delete_embeddings(conn, keep_model=None if rebuild else embedder.model)
+    total = count_missing_embeddings(conn)
+    done = 0
+    for rows in iter_missing_embeddings(conn, page_size=batch_size):
+        vectors = embedder.embed([content for _, content in rows])
+        dim = vectors.shape[1]
+        save_embeddings(conn, ((note_id, embedder.model, dim, vector.tobytes())
+                               for (note_id, _), vector in zip(rows, vectors)))
+        done += len(rows)
+        if progress:
+            progress(done, total)
+    return done
+
+
+def load_matrix(conn: Any, model: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, matriz N x dim) de los vectores de `model`.
+
+    Cada vector se copia a su fila de un arreglo preasignado a medida que se
+    lee: la memoria pico es la de la matriz, no la de todos los blobs juntos.
+    """
+    total, dim = count_embeddings(conn, model)
+    ids = np.empty(total, dtype=np.int64)
+    matrix = np.empty((total, dim or 0), dtype=np.float32)
+    count = 0
+    for note_id, row_dim, vector in iter_embeddings(conn, model):
+        if count == total:
+            break  # Otra conexión agregó vectores después del conteo: entran en la próxima carga
+        if row_dim != dim:
+            raise EmbeddingError("Hay vectores de distinta dimensión para el mismo modelo: reindexá con --rebuild")
+        ids[count] = note_id
+        matrix[count] = np.frombuffer(vector, dtype=np.float32)
+        count += 1
+    return ids[:count], matrix[:count]
+
+
+class EmbeddingIndex:
+    """Matriz de vectores en memoria para procesos de larga vida (daemon, shell).
+
+    Se reutiliza entre búsquedas mientras no cambien el modelo ni la versión
+    de la base (`PRAGMA data_version`, que cambia con las escrituras de otras
+    conexiones). Las escrituras propias se avisan con `invalidate()`.
+    """
+
+    def __init__(self) -> None:
+        self._key: Optional[Tuple[int, str]] = None
+        self._matrix: Tuple[np.ndarray, np.ndarray] = (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+
+    def get(self, conn: Any, model: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, matriz) de `model`, releída solo si la base cambió desde la última carga."""
+        key = (data_version(conn), model)
+        if key != self._key:
+            self.invalidate()  # Libera la matriz anterior antes de cargar la nueva
+            self._matrix = load_matrix(conn, model)
+            self._key = key
+        return self._matrix
+
+
+    def invalidate(self) -> None:
+        self._key = None
+        self._matrix = (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices y similitudes coseno de las `k` filas más parecidas a `query` (de mayor a menor)."""
+    scores = matrix @ query
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]  # O(N): solo se ordenan los k elegidos
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return best, scores[best]
+
+
+def semantic_search(conn: Any, embedder: Embedder, query: str, limit: int = 20,
+                    index: Optional[EmbeddingIndex] = None) -> List[tuple]:
+    """Notas más parecidas a `query` por similitud coseno de sus vectores.
+
+    No sincroniza: las notas sin vector (ver `sync_embeddings`) no aparecen.
+    Con `index` la matriz se reutiliza entre búsquedas; si no, se lee de la base.
+
+    Returns:
+        list[tuple]: (id, timestamp, content, score), de mayor a menor similitud
+    """
+    ids, matrix = index.get(conn, embedder.model) if index else load_matrix(conn, embedder.model)
+    if not len(ids) or limit < 1:
+        return []
+
+    query_vector = embedder.embed([query])[0]
+    if query_vector.shape[0] != matrix.shape[1]:
+        raise EmbeddingError("El vector de la consulta no coincide con los guardados: reindexá con --rebuild")
+    best, scores = top_k(matrix, query_vector, limit)
+    ranked = [(int(ids[i]), float(score)) for i, score in zip(best, scores) if score > 0]
+    if not ranked:
+        return []
+
+    placeholders = ",".join("?" * len(ranked))
+    notes = {row[0]: row for row in conn.execute(
+        f"SELECT id, timestamp, {NOTE_TEXT} FROM notes WHERE id IN ({placeholders})", [i for i, _ in ranked]
+    )}
+    return [(*notes[i], score) for i, score in ranked if i in notes]
@@ -0,0 +1,155 @@
+import io
+import json
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import IO, Dict, Iterable, Optional
+
+EXPORT_FORMATS = ("ndjson", "md", "tar", "zip")
+# Un borrado no se puede representar dentro de un .tar/.zip: los cambios incrementales van en estos
+CHANGE_FORMATS = ("ndjson", "md")
+
+
+def infer_format(output: Optional[str]) -> str:
+    """Deduce el formato de exportación por la extensión de la salida (default: ndjson)."""
+    name = (output or "").lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar", ".tar.gz", ".tgz")):
+        return "tar"
+    if name.endswith((".ndjson", ".jsonl")) or name in ("", "-"):
+        return "ndjson"
+    return "md"
+
+
+def note_to_markdown(note: tuple) -> str:
+    """Formato de una nota como archivo .md (front matter mínimo + contenido)."""
+    return f"---\nid: {note[0]}\nfecha: {note[2]}\n---\n\n{note[1]}\n"
+
+
+def export_ndjson(notes: Iterable[tuple], stream: IO[str]) -> int:
+    """Escribe una nota por línea como JSON. Devuelve la cantidad exportada."""
+    count = 0
+    for note in notes:
+        stream.write(json.dumps({"id": note[0], "timestamp": note[2], "content": note[1]}, ensure_ascii=False))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def export_markdown(notes: Iterable[tuple], directory: Path) -> int:
+    """Escribe cada nota como `<directorio>/<id>.md`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for note in notes:
+        (directory / f"{note[0]}.md").write_text(note_to_markdown(note), encoding="utf-8")
+        count += 1
+    return count
+
+
+def export_tar(notes: Iterable[tuple], path: Path) -> int:
+    """Escribe las notas como `notas/<id>.md` dentro de un .tar (.tar.gz/.tgz comprimido)."""
+    mode = "w:gz" if path.name.endswith((".gz", ".tgz")) else "w"
+    count = 0
+    with tarfile.open(path, mode) as tar:
+        for note in notes:
+            data = note_to_markdown(note).encode("utf-8")
+            info = tarfile.TarInfo(f"notas/{note[0]}.md")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            count += 1
+    return count
+
+
+def export_zip(notes: Iterable[tuple], path: Path) -> int:
+    """Escribe las notas como `notas/<id>.md` dentro de un .zip."""
+    count = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for note in notes:
+            zf.writestr(f"notas/{note[0]}.md", note_to_markdown(note))
+            count += 1
+    return count
+
+
+def export_notes(notes: Iterable[tuple], fmt: str, output: str, stdout: Optional[IO[str]] = None) -> int:
+    """Exporta un iterable de notas en streaming (nunca se arma una lista).
+
+    Args:
+        notes: filas (id, content, timestamp, ...) -- típicamente un cursor paginado
+        fmt: 'ndjson', 'md' (árbol de directorios), 'tar' o 'zip'
+        output: ruta de salida ('-' = stdout, solo ndjson)
+        stdout: stream a usar cuando output es '-'
+
+    Returns:
+        int: cantidad de notas exportadas
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido: '{fmt}'. Usá {', '.join(EXPORT_FORMATS)}.")
+
+    if fmt == "ndjson":
+        if output == "-":
+            return export_ndjson(notes, stdout)
+        with open(output, "w", encoding="utf-8") as f:
+            return export_ndjson(notes, f)
+    if output == "-":
+        raise ValueError(f"El formato '{fmt}' no se puede escribir a stdout.")
+
+    path = Path(output)
+    if fmt == "md":
+        return export_markdown(notes, path)
+    if fmt == "tar":
+        return export_tar(notes, path)
+    return export_zip(notes, path)
+
+
+def export_changes(changes: Iterable[tuple], fmt: str, output: str,
+                   stdout: Optional[IO[str]] = None) -> Dict[str, Optional[int]]:
+    """Exporta en streaming las filas de `iter_changes` (seq, id, op, changed_at, texto, timestamp).
+
+    En ndjson cada nota borrada es una línea `{"seq", "id", "op": "delete", "deleted": true}`;
+    en md se escribe `<id>.md` por cada nota cambiada y se borra el de cada nota borrada,
+    así el directorio de una exportación anterior queda al día.
+
+    Returns:
+        dict: `notes` exportadas, `deleted` (tombstones) y `last_seq` (None si no hubo cambios)
+    """
+    if fmt not in CHANGE_FORMATS:
+        raise ValueError(f"Los cambios solo se exportan en {' o '.join(CHANGE_FORMATS)} "
+                         f"('{fmt}' no puede representar notas borradas).")
+    stats: Dict[str, Optional[int]] = {"notes": 0, "deleted": 0, "last_seq": None}
+
+    def write_ndjson(stream: IO[str]) -> None:
+        for seq, note_id, op, changed_at, content, timestamp in changes:
+            if op == "delete":
+                record = {"seq": seq, "id": note_id, "op": op, "changed_at": changed_at, "deleted": True}
+                stats["deleted"] += 1
+            else:
+                record = {"seq": seq, "id": note_id, "op": op, "changed_at": changed_at,
+                          "timestamp": timestamp, "content": content}
+                stats["notes"] += 1
+            stream.write(json.dumps(record, ensure_ascii=False))
+            stream.write("\n")
+            stats["last_seq"] = seq
+
+    if fmt == "ndjson":
+        if output == "-":
+            write_ndjson(stdout)
+        else:
+            with open(output, "w", encoding="utf-8") as f:
+                write_ndjson(f)
+        return stats
+    if output == "-":
+        raise ValueError(f"El formato '{fmt}' no se puede escribir a stdout.")
+
+    directory = Path(output)
+    directory.mkdir(parents=True, exist_ok=True)
+    for seq, note_id, op, changed_at, content, timestamp in changes:
+        path = directory / f"{note_id}.md"
+        if op == "delete":
+            path.unlink(missing_ok=True)
+            stats["deleted"] += 1
+        else:
+            path.write_text(note_to_markdown((note_id, content, timestamp)), encoding="utf-8")
+            stats["notes"] += 1
+        stats["last_seq"] = seq
+    return stats
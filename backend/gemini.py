@@ -1,17 +1,41 @@
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
 import os
+from typing import Any, Dict, Iterator, List, Optional
+
+# El SDK (pydantic, httpx, google-auth) tarda más de un segundo en importarse:
+# se carga recién en la primera llamada, no al importar este módulo.
+_client = None
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_EMBEDDING_MODEL = "text-embedding-004"
+
+
+def _get_client():
+    """Devuelve el cliente de Gemini, creándolo al primer uso."""
+    global _client
+    if _client is None:
+        from google import genai
+        from dotenv import load_dotenv
+
+        load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+        _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _client
+
+
+def _fill_usage(response: Any, usage: Optional[Dict[str, int]]) -> None:
+    """Copia los tokens de `response.usage_metadata` a `usage` (si se pidió y la respuesta los trae)."""
+    metadata = getattr(response, "usage_metadata", None)
+    if usage is None or metadata is None:
+        return
+    usage["input_tokens"] = metadata.prompt_token_count or 0
+    usage["output_tokens"] = metadata.candidates_token_count or 0
 
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
-_api_key = os.getenv("GEMINI_API_KEY")
-_client = genai.Client(api_key=_api_key)
 
 def generate(
     prompt: str,
     sysprompt: str = "",
     max_tokens: int = 512,
-    model: str = "gemini-2.0-flash"
+    model: str = DEFAULT_MODEL,
+    usage: Optional[Dict[str, int]] = None
 ) -> str:
     """Genera texto con Gemini.
 
@@ -20,18 +44,85 @@ def generate(
         sysprompt (str): system instruction
         max_tokens (int): máximo de tokens de salida
         model (str): modelo a utilizar
+        usage (dict, optional): se completa con los tokens de entrada/salida de la llamada
 
     Returns:
         str: texto generado
     """
+    from google.genai import types
+
     config = types.GenerateContentConfig(
         system_instruction=sysprompt,
         max_output_tokens=max_tokens,
     )
-    response = _client.models.generate_content(
+    response = _get_client().models.generate_content(
         model=model,
         config=config,
         contents=prompt
     )
+    _fill_usage(response, usage)
     return response.text
 
+
+
+def generate_stream(
+    prompt: str,
+    sysprompt: str = "",
+    max_tokens: int = 512,
+    model: str = DEFAULT_MODEL,
+    usage: Optional[Dict[str, int]] = None
+) -> Iterator[str]:
+    """Como `generate`, pero devuelve el texto por fragmentos a medida que el modelo lo produce.
+
+    `usage` se completa al terminar (el último fragmento trae los totales).
+
+    Yields:
+        str: fragmentos de texto (los vacíos se omiten)
+    """
+    from google.genai import types
+
+    config = types.GenerateContentConfig(
+        system_instruction=sysprompt,
+        max_output_tokens=max_tokens,
+    )
+    for chunk in _get_client().models.generate_content_stream(
+        model=model,
+        config=config,
+        contents=prompt
+    ):
+        _fill_usage(chunk, usage)
+        if chunk.text:
+            yield chunk.text
+
+
+async def agenerate(
+    prompt: str,
+    sysprompt: str = "",
+    max_tokens: int = 512,
+    model: str = DEFAULT_MODEL,
+    usage: Optional[Dict[str, int]] = None
+) -> str:
+    """Variante asíncrona de `generate` (cliente `aio` del SDK), para llamadas concurrentes."""
+    from google.genai import types
+
+    config = types.GenerateContentConfig(
+        system_instruction=sysprompt,
+        max_output_tokens=max_tokens,
+    )
+    response = await _get_client().aio.models.generate_content(
+        model=model,
+        config=config,
+        contents=prompt
+    )
+    _fill_usage(response, usage)
+    return response.text
+
+
+def embed(texts: List[str], model: str = DEFAULT_EMBEDDING_MODEL) -> List[List[float]]:
+    """Calcula los embeddings de varios textos en una sola llamada.
+
+    Returns:
+        List[List[float]]: un vector por texto, en el mismo orden
+    """
+    response = _get_client().models.embed_content(model=model, contents=texts)
+    return [embedding.values for embedding in response.embeddings]
@@ -5,23 +5,50 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from backend.database import (
     create_connection,
-    create_table,
+    migrate,
     add_note,
+    add_notes,
     get_all_notes,
+    iter_notes,
+    iter_changes,
+    get_note,
+    search_notes,
     update_note,
-    delete_note
+    delete_note,
+    apply_operations,
+    compact_notes,
+    vacuum
 )
+from backend.tracing import span
 
 
-def notes_handler(command, db_file="notes.db", note_id=None, content=None):
+def _spanned(command, results):
+    """Mide el consumo de un generador como el span `db.<command>` (desde el primer al último resultado)."""
+    with span(f"db.{command}", detached=True):
+        yield from results
+
+
+def notes_handler(command, db_file="notes.db", note_id=None, content=None, conn=None, **options):
     """
     Maneja operaciones CRUD para notas en SQLite.
 
     Args:
-        command (str): 'create', 'read', 'update', 'delete'.
+        command (str): 'create', 'create_many', 'read', 'iter', 'changes' (cambios desde un número de
+            secuencia), 'get', 'search', 'update', 'delete', 'batch', 'compact' (recodificar cuerpos),
+            'embed' (sincronizar vectores) o 'semantic' (búsqueda por similitud).
         db_file (str): Ruta a la base de datos.
-        note_id (int, optional): ID de la nota para 'update'/'delete'.
-        content (str, optional): Contenido de la nota para 'create'/'update'.
+        note_id (int, optional): ID de la nota para 'get'/'update'/'delete'.
+        content (str, optional): Contenido de la nota para 'create'/'update',
+            iterable de contenidos para 'create_many', iterable de operaciones
+            para 'batch' o consulta para 'search'/'semantic'.
+        conn (sqlite3.Connection, optional): Conexión ya abierta (y con esquema).
+            Si se otorga se reutiliza y no se cierra; si no, se abre una
+            conexión temporal para esta operación. 'iter', 'changes' y 'batch' la requieren.
+        **options: Parámetros extra de la operación (ej. 'limit', 'highlight'
+            para 'search'; 'batch_size' para 'create_many'; 'limit', 'after', 'reverse', 'page_size',
+            'until', 'query', 'preview' para 'iter'; 'since', 'since_time', 'page_size' para 'changes'; 'chunk_size' para 'batch'; 'compression' para
+            'create'/'create_many'/'update'/'batch'/'compact' y 'progress', 'vacuum' para 'compact';
+            'embedder' y 'batch_size', 'rebuild', 'progress' para 'embed'; 'embedder', 'limit' e 'index' (matriz en memoria, opcional) para 'semantic').
 
     Returns:
         Any: Resultado según operación.
@@ -29,23 +56,65 @@ def notes_handler(command, db_file="notes.db", note_id=None, content=None):
     Raises:
         ValueError: Si el comando es inválido o faltan parámetros.
     """
-    conn = create_connection(db_file)
-    create_table(conn)
+    if command in ('iter', 'changes', 'batch'):
+        # Devuelven un generador: la conexión tiene que sobrevivir a esta llamada
+        if conn is None:
+            raise ValueError(f"'{command}' requiere una conexión abierta ('conn').")
+        if command == 'iter':
+            return _spanned(command, iter_notes(conn, **options))
+        if command == 'changes':
+            return _spanned(command, iter_changes(conn, **options))
+        return _spanned(command, apply_operations(conn, content, **options))
+
+    owns_conn = conn is None
+    if owns_conn:
+        conn = create_connection(db_file)
+        migrate(conn)
 
     try:
-        if command == 'create':
-            return add_note(conn, content)
-        elif command == 'read':
-            return get_all_notes(conn)
-        elif command == 'update':
-            if note_id is None or content is None:
-                raise ValueError("Faltan 'note_id' y/o 'content' para actualizar una nota.")
-            update_note(conn, note_id, content)
-        elif command == 'delete':
-            if note_id is None:
-                raise ValueError("Falta 'note_id' para borrar una nota.")
-            delete_note(conn, note_id)
-        else:
-            raise ValueError("Comando inválido. Usá 'create', 'read', 'delete' o 'update'.")
+        with span(f"db.{command}"):
+            if command == 'create':
+                return add_note(conn, content, compression=options.get('compression'))
+            elif command == 'create_many':
+                return add_notes(conn, content, **options)
+            elif command == 'read':
+                return get_all_notes(conn)
+            elif command == 'get':
+                if note_id is None:
+                    raise ValueError("Falta 'note_id' para leer una nota.")
+                return get_note(conn, note_id)
+            elif command == 'search':
+                if not content:
+                    raise ValueError("Falta 'content' (consulta) para buscar notas.")
+                return search_notes(conn, content, **options)
+            elif command == 'update':
+                if note_id is None or content is None:
+                    raise ValueError("Faltan 'note_id' y/o 'content' para actualizar una nota.")
+                update_note(conn, note_id, content, compression=options.get('compression'))
+            elif command == 'delete':
+                if note_id is None:
+                    raise ValueError("Falta 'note_id' para borrar una nota.")
+                delete_note(conn, note_id)
+            elif command == 'compact':
+                if 'compression' not in options:
+                    raise ValueError("Falta 'compression' (política o None) para compactar.")
+                stats = compact_notes(conn, options['compression'], progress=options.get('progress'))
+                if options.get('vacuum', True):
+                    vacuum(conn)
+                return stats
+            elif command in ('embed', 'semantic'):
+                # NumPy se importa solo para los comandos de embeddings
+                from backend.embeddings import semantic_search, sync_embeddings
+                if 'embedder' not in options:
+                    raise ValueError(f"Falta 'embedder' para '{command}'.")
+                if command == 'embed':
+                    return sync_embeddings(conn, **options)
+                if not content:
+                    raise ValueError("Falta 'content' (consulta) para la búsqueda semántica.")
+                return semantic_search(conn, query=content, **options)
+            else:
+                raise ValueError("Comando inválido. Usá 'create', 'create_many', 'read', 'iter', 'changes', 'get', 'search', "
+                                 "'delete', 'update', 'batch', 'compact', 'embed' o 'semantic'.")
     finally:
-        conn.close()
\ No newline at end of file
+        if owns_conn:
+            conn.close()
\ No newline at end of file
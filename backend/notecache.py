@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Notas en memoria por defecto (clave `note_cache` de la sección [database]; 0 = deshabilitada)
+DEFAULT_NOTE_CACHE = 2048
+
+
+class NoteCache:
+    """Cache de lectura de notas para procesos de larga vida (daemon, REPL, scripts).
+
+    Guarda filas por ID (LRU acotado a `max_notes`) y, si la tabla entra
+    completa, la lectura de todas las notas con su índice por ID. Es válida
+    mientras no cambie la versión de la base: `PRAGMA data_version`, que
+    SQLite incrementa cuando otra conexión confirma una escritura. Las
+    escrituras propias no la cambian: el dueño las avisa con `invalidate()`.
+    """
+
+    def __init__(self, max_notes: int = DEFAULT_NOTE_CACHE) -> None:
+        self.max_notes = max_notes
+        self.hits = 0
+        self.misses = 0
+        self._rows: "OrderedDict[int, Tuple]" = OrderedDict()
+        self._all: Optional[List[Tuple]] = None
+        self._index: Optional[dict] = None
+        self._version: Optional[int] = None
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_notes > 0
+
+
+    def sync(self, data_version: int) -> None:
+        """Descarta todo si otra conexión escribió desde la última lectura."""
+        if data_version != self._version:
+            self.clear()
+            self._version = data_version
+
+
+    def invalidate(self, note_id: Optional[int] = None) -> None:
+        """Escritura propia: olvida la nota `note_id` (o todas) y la lectura completa."""
+        self._all = self._index = None
+        if note_id is None:
+            self._rows.clear()
+        else:
+            self._rows.pop(note_id, None)
+
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._all = self._index = None
+
+
+    def get(self, note_id: int) -> Tuple[bool, Optional[Tuple]]:
+        """(encontrada en cache, fila). Con la tabla completa en memoria, un ID ausente es un acierto (None)."""
+        if self._index is not None:
+            self.hits += 1
+            return True, self._index.get(note_id)
+        row = self._rows.get(note_id)
+        if row is None:
+            self.misses += 1
+            return False, None
+        self._rows.move_to_end(note_id)
+        self.hits += 1
+        return True, row
+
+
+    def put(self, row: Tuple) -> None:
+        self._rows[row[0]] = row
+        self._rows.move_to_end(row[0])
+        while len(self._rows) > self.max_notes:
+            self._rows.popitem(last=False)
+
+
+    def get_all(self) -> Optional[List[Tuple]]:
+        if self._all is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(self._all)
+
+
+    def put_all(self, rows: List[Tuple]) -> None:
+        """Guarda la lectura completa (solo si entra en el límite) y su índice por ID."""
+        if len(rows) > self.max_notes:
+            return
+        self._all = list(rows)
+        self._index = {row[0]: row for row in rows}
+        self._rows = OrderedDict(self._index.items())
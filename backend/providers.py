@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional
+
+from backend import gemini
+
+
+class ProviderError(Exception):
+    """Error del proveedor de generación (configuración inválida o fallo de la llamada)."""
+    pass
+
+
+class Provider(ABC):
+    """Interfaz de un backend de generación de texto.
+
+    Las subclases implementan `generate`, `generate_stream` y `agenerate`
+    con la misma firma que las funciones de `backend.gemini`: si se pasa un
+    dict `usage`, lo completan con `input_tokens` y `output_tokens`. Una
+    subclase incompleta falla al instanciarse, no en medio de una llamada.
+    """
+
+    name = "base"
+    default_model = ""
+
+    @abstractmethod
+    def generate(self, prompt: str, sysprompt: str = "", max_tokens: int = 512, model: str = "",
+                 usage: Optional[Dict[str, int]] = None) -> str:
+        ...
+
+    @abstractmethod
+    def generate_stream(self, prompt: str, sysprompt: str = "", max_tokens: int = 512,
+                        model: str = "", usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    async def agenerate(self, prompt: str, sysprompt: str = "", max_tokens: int = 512, model: str = "",
+                        usage: Optional[Dict[str, int]] = None) -> str:
+        ...
+
+
+class GeminiProvider(Provider):
+    """Google Gemini vía `google.genai` (el SDK se importa recién en la primera llamada)."""
+
+    name = "gemini"
+    default_model = gemini.DEFAULT_MODEL
+
+    def generate(self, prompt, sysprompt="", max_tokens=512, model="", usage=None):
+        return gemini.generate(prompt, sysprompt, max_tokens, model or self.default_model, usage)
+
+    def generate_stream(self, prompt, sysprompt="", max_tokens=512, model="", usage=None):
+        return gemini.generate_stream(prompt, sysprompt, max_tokens, model or self.default_model, usage)
+
+    async def agenerate(self, prompt, sysprompt="", max_tokens=512, model="", usage=None):
+        return await gemini.agenerate(prompt, sysprompt, max_tokens, model or self.default_model, usage)
+
+
+# Parámetros del proveedor local (sección [ai.local] de config.toml)
+DEFAULT_LOCAL: Dict[str, Any] = {
+    "latency": 0.5,             # segundos hasta el primer token
+    "tokens_per_second": 50,    # ritmo de generación (0 = instantáneo)
+    "failure_rate": 0.0,        # fracción de llamadas que fallan (0.0 - 1.0)
+}
+
+_LOCAL_WORDS = (
+    "nota", "texto", "idea", "resumen", "contenido", "punto", "detalle", "tema",
+    "versión", "cambio", "proyecto", "tarea", "dato", "registro", "claro", "breve",
+)
+
+
+class LocalProvider(Provider):
+    """Proveedor local determinístico para benchmarks y CI (sin red ni cuota).
+
+    La respuesta depende solo de (prompt, sysprompt, max_tokens, model): el
+    mismo pedido produce siempre el mismo texto, y la misma decisión de fallar
+    según `failure_rate`. Simula la latencia hasta el primer token y un
+    ritmo de tokens por segundo, también en streaming y en la variante async.
+    """
+
+    name = "local"
+    default_model = "local"
+
+    def __init__(self, latency: float = DEFAULT_LOCAL["latency"],
+                 tokens_per_second: float = DEFAULT_LOCAL["tokens_per_second"],
+                 failure_rate: float = DEFAULT_LOCAL["failure_rate"]) -> None:
+        if latency < 0 or tokens_per_second < 0 or not 0.0 <= failure_rate <= 1.0:
+            raise ProviderError("Parámetros inválidos para el proveedor local "
+                                f"(latency={latency}, tokens_per_second={tokens_per_second}, failure_rate={failure_rate})")
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+
+
+    def _plan(self, prompt: str, sysprompt: str, max_tokens: int, model: str):
+        """Tokens de la respuesta y si la llamada falla (derivados de un hash del pedido)."""
+        digest = hashlib.sha256(f"{model}\0{sysprompt}\0{max_tokens}\0{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        fails = rng.random() < self.failure_rate
+        count = max(1, min(max_tokens, 16 + len(prompt.split()) // 2))
+        tokens = [rng.choice(_LOCAL_WORDS) + " " for _ in range(count)]
+        tokens[-1] = tokens[-1].rstrip() + "."
+        return tokens, fails
+
+
+    def _delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+
+    def _failure(self) -> ProviderError:
+        return ProviderError("Fallo simulado por el proveedor local (failure_rate)")
+
+
+    @staticmethod
+    def _fill_usage(usage: Optional[Dict[str, int]], prompt: str, sysprompt: str, tokens: list) -> None:
+        """Tokens simulados: entrada estimada por largo (~4 caracteres por token), salida = tokens generados."""
+        if usage is not None:
+            usage["input_tokens"] = (len(prompt) + len(sysprompt) + 3) // 4
+            usage["output_tokens"] = len(tokens)
+
+
+    def generate(self, prompt, sysprompt="", max_tokens=512, model="", usage=None):
+        return "".join(self.generate_stream(prompt, sysprompt, max_tokens, model, usage))
+
+
+    def generate_stream(self, prompt, sysprompt="", max_tokens=512, model="", usage=None):
+        tokens, fails = self._plan(prompt, sysprompt, max_tokens, model or self.default_model)
+        time.sleep(self.latency)
+        if fails:
+            raise self._failure()
+        delay = self._delay()
+        for token in tokens:
+            if delay:
+                time.sleep(delay)
+            yield token
+        self._fill_usage(usage, prompt, sysprompt, tokens)
+
+
+    async def agenerate(self, prompt, sysprompt="", max_tokens=512, model="", usage=None):
+        tokens, fails = self._plan(prompt, sysprompt, max_tokens, model or self.default_model)
+        await asyncio.sleep(self.latency + self._delay() * len(tokens))
+        if fails:
+            raise self._failure()
+        self._fill_usage(usage, prompt, sysprompt, tokens)
+        return "".join(tokens)
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    LocalProvider.name: LocalProvider,
+}
+
+
+def create_provider(settings: Dict[str, Any]) -> Provider:
+    """Crea el proveedor indicado por `settings["provider"]` (sección [ai] de la config).
+
+    Los parámetros propios de cada proveedor van en una subsección con su
+    nombre, ej. `[ai.local]`.
+    """
+    name = settings.get("provider", GeminiProvider.name)
+    if name not in PROVIDERS:
+        raise ProviderError(f"Proveedor de IA desconocido: '{name}'. Opciones: {', '.join(PROVIDERS)}")
+    if name == LocalProvider.name:
+        local = settings.get("local", {})
+        unknown = set(local) - set(DEFAULT_LOCAL)
+        if unknown:
+            raise ProviderError(f"Parámetros desconocidos en [ai.local]: {', '.join(sorted(unknown))}")
+        return LocalProvider(**{**DEFAULT_LOCAL, **local})
+    return PROVIDERS[name]()
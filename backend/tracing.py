@@ -0,0 +1,211 @@
+import functools
+import inspect
+import itertools
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+# Trazas livianas por comando: spans anidados (nombre, duración, atributos).
+# Deshabilitado (el default) `span()` devuelve un contexto vacío compartido,
+# así que instrumentar el camino caliente no cuesta casi nada.
+
+_enabled = False
+_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+_current: ContextVar[Optional["Span"]] = ContextVar("mnctl_span", default=None)
+_ids = itertools.count(1)
+_roots: List["Span"] = []
+
+# Inicio del proceso (lo fija el wrapper `mnctl` antes de importar el CLI) para el span de arranque
+process_start: Optional[float] = None
+
+
+class Span:
+    """Un tramo medido. Se usa como context manager; al cerrarse se emite al sink."""
+
+    __slots__ = ("name", "attrs", "parent", "children", "span_id", "start", "duration", "error", "_token", "_detached")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], detached: bool = False) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.parent = _current.get()
+        self.children: List["Span"] = []
+        self.span_id = next(_ids)
+        self.start = 0.0
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self._token = None
+        self._detached = detached  # Spans de generadores: no pasan a ser el span actual
+
+
+    def __enter__(self) -> "Span":
+        (self.parent.children if self.parent else _roots).append(self)
+        if not self._detached:
+            self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.finish(exc)
+
+
+    def finish(self, exc: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.error = f"{type(exc).__name__}: {exc}"
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                _current.set(self.parent)  # Cerrado desde otro contexto (ej. ctx.call_on_close)
+            self._token = None
+        if _sink is not None:
+            _sink(self.to_dict())
+
+
+    def set(self, **attrs: Any) -> None:
+        """Agrega atributos al span (ej. cantidad de filas) después de abrirlo."""
+        self.attrs.update(attrs)
+
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "span": self.span_id,
+            "parent": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "ms": round((self.duration or 0.0) * 1000, 3),
+            "pid": os.getpid(),
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class _NoopSpan:
+    """Contexto vacío que se devuelve con el tracing deshabilitado."""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def finish(self, exc: Optional[BaseException] = None) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def enable(sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+    """Habilita el registro de spans; `sink` recibe cada span (dict) al cerrarse."""
+    global _enabled, _sink
+    _enabled = True
+    _sink = sink
+
+
+def disable() -> None:
+    global _enabled, _sink
+    _enabled = False
+    _sink = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> List[Span]:
+    """Devuelve los spans raíz registrados hasta ahora y empieza una traza nueva."""
+    roots = list(_roots)
+    _roots.clear()
+    return roots
+
+
+def span(name: str, detached: bool = False, **attrs: Any):
+    """`with span("db.query", command="search"):` mide el bloque como hijo del span actual.
+
+    Dentro de un generador usar `detached=True`: el span no pasa a ser el
+    actual, porque el contexto se comparte con el llamador entre cada `yield`.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs, detached=detached)
+
+
+def record(name: str, start: float, end: Optional[float] = None, **attrs: Any) -> None:
+    """Registra un span ya transcurrido (ej. el arranque, medido antes de habilitar el tracing)."""
+    if not _enabled:
+        return
+    finished = Span(name, attrs, detached=True)
+    finished.__enter__()
+    finished.start = start
+    finished.duration = (end if end is not None else time.perf_counter()) - start
+    if _sink is not None:
+        _sink(finished.to_dict())
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorador: mide cada llamada a la función (también async y generadores) como un span."""
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return (yield from func(*args, **kwargs))
+                with Span(label, {}, detached=True):
+                    return (yield from func(*args, **kwargs))
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with Span(label, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(label, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def format_tree(roots: List[Span], min_ms: float = 0.0) -> str:
+    """Árbol de spans con duración y porcentaje del total, para `--profile`."""
+    total = sum(root.duration or 0.0 for root in roots) or 1e-9
+    lines: List[str] = []
+
+    def walk(node: Span, prefix: str, last: bool, depth: int) -> None:
+        ms = (node.duration or 0.0) * 1000
+        if depth and ms < min_ms:
+            return
+        branch = "" if not depth else ("└─ " if last else "├─ ")
+        attrs = " ".join(f"{key}={value}" for key, value in node.attrs.items())
+        line = f"{prefix}{branch}{node.name:<{max(1, 34 - len(prefix) - len(branch))}} {ms:>9.2f} ms {ms / 10 / total:>5.1f}%"
+        if attrs:
+            line += f"  {attrs}"
+        if node.error:
+            line += f"  ERROR {node.error}"
+        lines.append(line)
+        children = [child for child in node.children if (child.duration or 0.0) * 1000 >= min_ms]
+        for index, child in enumerate(children):
+            walk(child, prefix + ("" if not depth else ("   " if last else "│  ")), index == len(children) - 1, depth + 1)
+
+    for root in roots:
+        walk(root, "", True, 0)
+    return "\n".join(lines)
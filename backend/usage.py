@@ -0,0 +1,160 @@
+import atexit
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.database import DatabaseError
+
+
+USAGE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS ai_calls (
+        id INTEGER PRIMARY KEY,
+        created_at REAL NOT NULL,
+        prompt TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        latency_ms REAL NOT NULL,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        max_tokens INTEGER,
+        cached INTEGER NOT NULL DEFAULT 0,
+        stream INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_ai_calls_created_at ON ai_calls(created_at)",
+]
+# Llamadas acumuladas en memoria antes de escribirlas en una transacción
+FLUSH_EVERY = 256
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre valores ya ordenados (None si no hay valores)."""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * pct // 100))  # ceil(n * pct / 100)
+    return values[int(rank) - 1]
+
+
+class UsageLedger:
+    """Registro en SQLite de cada llamada a la IA: latencia, tokens, modelo y aciertos de cache."""
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        self._conn: Optional[sqlite3.Connection] = None
+        # Pendientes de escribir: se vuelcan en `stats`, `close` o cada FLUSH_EVERY llamadas
+        self._pending: List[tuple] = []
+
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_file)
+                conn.execute("PRAGMA journal_mode = wal")
+                conn.execute("PRAGMA synchronous = normal")
+                conn.execute("PRAGMA busy_timeout = 5000")
+                with conn:
+                    for statement in USAGE_SCHEMA:
+                        conn.execute(statement)
+            except sqlite3.Error as e:
+                raise DatabaseError(f"No se pudo abrir el registro de uso '{self.db_file}': {e}")
+            self._conn = conn
+            atexit.register(self.flush)  # Procesos de un solo comando: no pierden los pendientes
+        return self._conn
+
+
+    def flush(self) -> None:
+        """Escribe las llamadas acumuladas en memoria en una transacción."""
+        if self._conn is None or not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO ai_calls(created_at, prompt, provider, model, latency_ms, input_tokens, "
+                "output_tokens, max_tokens, cached, stream, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending
+            )
+        self._pending = []
+
+
+    def record(self, prompt: str, provider: str, model: str, latency: float,
+               usage: Optional[Dict[str, int]] = None, max_tokens: Optional[int] = None,
+               cached: bool = False, stream: bool = False, error: Optional[str] = None) -> None:
+        """Registra una llamada (`latency` en segundos; `usage` con input_tokens/output_tokens).
+
+        Se llama desde el event loop de las ejecuciones en paralelo: solo acumula
+        en memoria, y la escritura (un commit en SQLite) ocurre por lotes.
+        """
+        usage = usage or {}
+        self._get_conn()  # Un fallo al abrir el registro se informa en la primera llamada
+        self._pending.append((time.time(), prompt, provider, model, latency * 1000, usage.get("input_tokens"),
+                              usage.get("output_tokens"), max_tokens, int(cached), int(stream), error))
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+
+    def stats(self, since: Optional[float] = None, prompt: Optional[str] = None,
+              model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Resumen por (prompt, modelo) desde `since` (epoch): llamadas, errores, tasa de
+        aciertos de cache, latencia p50/p95/p99 y tokens de las llamadas reales al proveedor.
+        """
+        filters, params = [], []
+        if since is not None:
+            filters.append("created_at >= ?")
+            params.append(since)
+        if prompt:
+            filters.append("prompt = ?")
+            params.append(prompt)
+        if model:
+            filters.append("model = ?")
+            params.append(model)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        conn = self._get_conn()
+        self.flush()
+        rows = conn.execute(
+            f"SELECT prompt, model, latency_ms, input_tokens, output_tokens, max_tokens, cached, error "
+            f"FROM ai_calls {where} ORDER BY prompt, model, latency_ms", params
+        )
+        for name, model_name, latency, tokens_in, tokens_out, max_tokens, cached, error in rows:
+            group = groups.setdefault((name, model_name), {
+                "prompt": name, "model": model_name, "calls": 0, "errors": 0, "cached": 0,
+                "latencies": [], "input_tokens": 0, "output_tokens": 0, "max_output_tokens": 0,
+                "max_tokens": max_tokens,
+            })
+            group["calls"] += 1
+            if cached:
+                group["cached"] += 1
+                continue
+            if error:
+                group["errors"] += 1
+                continue
+            group["latencies"].append(latency)
+            group["input_tokens"] += tokens_in or 0
+            group["output_tokens"] += tokens_out or 0
+            group["max_output_tokens"] = max(group["max_output_tokens"], tokens_out or 0)
+            group["max_tokens"] = max_tokens or group["max_tokens"]
+
+        results = []
+        for group in groups.values():
+            latencies = group.pop("latencies")  # Ordenadas por la consulta
+            served = len(latencies)
+            group.update({
+                "hit_ratio": group["cached"] / group["calls"],
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "avg_input_tokens": group["input_tokens"] / served if served else 0,
+                "avg_output_tokens": group["output_tokens"] / served if served else 0,
+            })
+            results.append(group)
+        return results
+
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            atexit.unregister(self.flush)
+            self._conn.close()
+            self._conn = None
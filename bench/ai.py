@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Benchmark de los caminos de IA sin red ni cuota, con el proveedor local.
+
+Mide sobre `PromptManager` (el mismo código que usan los comandos de IA):
+ejecución serial vs concurrente (`execute_many`), hits de la cache de
+respuestas, y tiempo al primer fragmento en streaming. El proveedor local
+simula latencia, ritmo de tokens y fallos de forma determinística, así
+que los resultados son comparables entre corridas (ej. en CI).
+
+Uso:
+    python bench/ai.py
+    python bench/ai.py --items 500 --latency 0.2 --concurrency 1,8,32 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "cli"))
+sys.path.insert(0, str(ROOT))
+
+from backend.cache import ResponseCache  # noqa: E402
+from backend.providers import LocalProvider  # noqa: E402
+from prompts import PromptManager  # noqa: E402
+
+
+def make_items(count: int) -> List[Any]:
+    return [(i, {"content": f"Nota sintética {i}: " + "contenido de prueba " * (5 + i % 40)}) for i in range(count)]
+
+
+def run_many(pm: PromptManager, items: List[Any], concurrency: int, use_cache: bool) -> Dict[str, Any]:
+    async def consume():
+        failed = 0
+        async for _, _, error in pm.execute_many("resumir", items, concurrency=concurrency, use_cache=use_cache):
+            failed += error is not None
+        return failed
+
+    start = time.perf_counter()
+    failed = asyncio.run(consume())
+    elapsed = time.perf_counter() - start
+    return {"concurrency": concurrency, "seconds": round(elapsed, 3),
+            "items_per_s": round(len(items) / elapsed, 1), "failed": failed}
+
+
+def run_serial(pm: PromptManager, items: List[Any], use_cache: bool) -> Dict[str, Any]:
+    start = time.perf_counter()
+    failed = sum(pm.execute_prompt("resumir", use_cache=use_cache, **kwargs) is None for _, kwargs in items)
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "items_per_s": round(len(items) / elapsed, 1), "failed": failed}
+
+
+def run_stream(pm: PromptManager, items: List[Any]) -> Dict[str, Any]:
+    first, total = [], []
+    for _, kwargs in items:
+        start = time.perf_counter()
+        try:
+            for i, _ in enumerate(pm.execute_prompt_stream("resumir", use_cache=False, **kwargs)):
+                if i == 0:
+                    first.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            continue
+        total.append((time.perf_counter() - start) * 1000)
+    return {"first_chunk_ms": round(statistics.median(first), 2) if first else None,
+            "full_response_ms": round(statistics.median(total), 2) if total else None,
+            "runs": len(total)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline de los comandos de IA")
+    parser.add_argument("--items", type=int, default=200, help="Notas a procesar por escenario")
+    parser.add_argument("--latency", type=float, default=0.1, help="Segundos hasta el primer token (simulado)")
+    parser.add_argument("--tps", type=float, default=400, help="Tokens por segundo (simulado)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fracción de llamadas que fallan")
+    parser.add_argument("--concurrency", default="8,32", help="Niveles de concurrencia separados por coma")
+    parser.add_argument("--serial-items", type=int, default=20, help="Notas del escenario serial (es lento a propósito)")
+    parser.add_argument("--stream-items", type=int, default=10, help="Notas del escenario de streaming")
+    parser.add_argument("--output", type=Path, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    provider = LocalProvider(latency=args.latency, tokens_per_second=args.tps, failure_rate=args.failure_rate)
+    items = make_items(args.items)
+    results: Dict[str, Any] = {"provider": {"latency": args.latency, "tokens_per_second": args.tps,
+                                            "failure_rate": args.failure_rate}, "items": args.items}
+
+    with tempfile.TemporaryDirectory(prefix="mnai_") as tmp:
+        cache = ResponseCache(str(Path(tmp) / "cache.db"))
+        pm = PromptManager(prompts_file=str(Path(tmp) / "prompts.json"),
+                           log_file=str(Path(tmp) / "prompts.log"), cache=cache, provider=provider)
+
+        results["serial"] = run_serial(pm, items[:args.serial_items], use_cache=False)
+        print(f"serial ({args.serial_items} notas): {results['serial']['items_per_s']} notas/s")
+
+        results["concurrent"] = []
+        for level in (int(c) for c in args.concurrency.split(",")):
+            row = run_many(pm, items, level, use_cache=False)
+            results["concurrent"].append(row)
+            print(f"concurrencia {level:>3}: {row['seconds']:>7.2f} s, {row['items_per_s']:>8.1f} notas/s, {row['failed']} fallidas")
+
+        run_many(pm, items, max(int(c) for c in args.concurrency.split(",")), use_cache=True)  # Llena la cache
+        cached = run_many(pm, items, max(int(c) for c in args.concurrency.split(",")), use_cache=True)
+        results["cache_hits"] = {**cached, "stats": cache.stats()}
+        print(f"cache (hits):     {cached['seconds']:>7.3f} s, {cached['items_per_s']:>8.1f} notas/s")
+
+        results["stream"] = run_stream(pm, items[:args.stream_items])
+        print(f"streaming:        primer fragmento {results['stream']['first_chunk_ms']} ms, "
+              f"respuesta completa {results['stream']['full_response_ms']} ms")
+        cache.close()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nResultados: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
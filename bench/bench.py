@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""Benchmarks de Minimal Notes: CRUD, listado, búsqueda, import/export y latencia de mnctl.
+
+Genera bases sintéticas (10k, 100k, 1M notas con contenidos de distinto
+tamaño), mide cada operación y escribe los resultados a JSON para poder
+compararlos contra un baseline guardado.
+
+Uso:
+    python bench/bench.py                                # 10k, 100k y 1M notas
+    python bench/bench.py --sizes 10k --repeat 50
+    python bench/bench.py --save-baseline                # Guarda bench/baseline.json
+    python bench/bench.py --baseline bench/baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "cli"))
+
+from backend.database import ConnectionManager, add_notes
+from backend.export import export_notes
+from router import Router
+
+DATA_DIR = ROOT / "bench" / ".data"
+DEFAULT_OUTPUT = ROOT / "bench" / "results.json"
+DEFAULT_BASELINE = ROOT / "bench" / "baseline.json"
+GENERATOR_VERSION = 1  # Subir si cambia la forma de generar datos (invalida bases cacheadas)
+
+# Distribución de tamaños de contenido: (peso, mínimo, máximo) en caracteres
+CONTENT_SIZES = [
+    (0.80, 40, 400),         # Notas cortas
+    (0.18, 1_000, 4_000),    # Notas medianas
+    (0.02, 16_000, 64_000),  # Documentos importados
+]
+VOCABULARY = (
+    "api gateway redis cache bug fix memory leak auth middleware deploy docker kubernetes "
+    "servicio usuario base datos consulta índice nota reunión tarea pendiente revisar "
+    "arquitectura microservicios latencia rendimiento backup migración esquema sqlite "
+    "python typer gemini resumen traducción pregunta proyecto cliente release sprint"
+).split()
+SEARCH_QUERIES = ["redis", "memory leak", '"api gateway"', "micro*", "deploy AND docker", "latencia OR rendimiento"]
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000."""
+    text = text.strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def size_label(count: int) -> str:
+    if count >= 1_000_000 and count % 1_000_000 == 0:
+        return f"{count // 1_000_000}m"
+    if count >= 1_000 and count % 1_000 == 0:
+        return f"{count // 1_000}k"
+    return str(count)
+
+
+def synthetic_contents(count: int, seed: int = 42):
+    """Genera `count` contenidos pseudoaleatorios reproducibles (streaming)."""
+    rng = random.Random(seed)
+    paragraphs = [" ".join(rng.choices(VOCABULARY, k=rng.randint(8, 60))) + "." for _ in range(2_000)]
+    weights = [w for w, _, _ in CONTENT_SIZES]
+
+    for _ in range(count):
+        _, low, high = rng.choices(CONTENT_SIZES, weights=weights)[0]
+        target = rng.randint(low, high)
+        parts, length = [], 0
+        while length < target:
+            paragraph = rng.choice(paragraphs)
+            parts.append(paragraph)
+            length += len(paragraph) + 1
+        yield " ".join(parts)[:target]
+
+
+def generate_database(count: int, seed: int = 42, force: bool = False) -> Path:
+    """Crea (o reutiliza) una base sintética con `count` notas."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = DATA_DIR / f"notes_{size_label(count)}_v{GENERATOR_VERSION}_s{seed}.db"
+    if path.exists() and not force:
+        return path
+
+    tmp = path.with_suffix(".tmp")
+    for leftover in (tmp, Path(f"{tmp}-wal"), Path(f"{tmp}-shm")):
+        leftover.unlink(missing_ok=True)
+
+    print(f"  Generando base sintética de {count:,} notas -> {path.name}", file=sys.stderr)
+    db = ConnectionManager(str(tmp))
+    add_notes(db.get(), synthetic_contents(count, seed), batch_size=50_000)
+    db.get().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+    tmp.rename(path)
+    return path
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Ejecuta `fn` varias veces y devuelve estadísticas en milisegundos."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "max_ms": round(samples[-1], 4),
+    }
+
+
+def bench_config(db_path: Path, workdir: Path) -> Dict[str, Any]:
+    return {
+        "database": {"active": str(db_path), "prompts": str(workdir / "prompts.json")},
+        "logger": {
+            "cli": str(workdir / "cli.log"),
+            "router": str(workdir / "router.log"),
+            "prompts": str(workdir / "prompts.log"),
+            "stream": False,
+        },
+    }
+
+
+def write_toml(config: Dict[str, Any], path: Path) -> None:
+    lines = []
+    for section, values in config.items():
+        lines.append(f"[{section}]")
+        for key, value in values.items():
+            lines.append(f"{key} = {json.dumps(value)}" if not isinstance(value, bool) else f"{key} = {str(value).lower()}")
+        lines.append("")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def mnctl_latency(config_path: Path, argv: List[str], repeat: int) -> Optional[Dict[str, float]]:
+    """Latencia end-to-end de una invocación de `mnctl` (arranque de Python incluido)."""
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "bench")
+    cmd = [sys.executable, str(ROOT / "cli" / "mnctl.py"), "--config", str(config_path), *argv]
+
+    probe = subprocess.run(cmd, cwd=ROOT, env=env, stdin=subprocess.DEVNULL, capture_output=True)
+    if probe.returncode != 0:
+        print(f"  mnctl {' '.join(argv)}: omitido ({probe.stderr.decode(errors='replace').strip().splitlines()[-1:]})",
+              file=sys.stderr)
+        return None
+
+    return measure(
+        lambda: subprocess.run(cmd, cwd=ROOT, env=env, stdin=subprocess.DEVNULL, capture_output=True),
+        repeat=repeat, warmup=0
+    )
+
+
+def bench_size(count: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Corre todos los benchmarks sobre una base de `count` notas."""
+    label = size_label(count)
+    print(f"[{label}] preparando datos", file=sys.stderr)
+    source = generate_database(count, seed=args.seed, force=args.regenerate)
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"mnbench_{label}_"))
+    try:
+        # Se trabaja sobre una copia para que las escrituras no alteren la base cacheada
+        db_path = workdir / "notes.db"
+        shutil.copyfile(source, db_path)
+        (workdir / "prompts.json").write_text("{}", encoding="utf-8")
+        config = bench_config(db_path, workdir)
+        router = Router(config=config)
+
+        rng = random.Random(args.seed)
+        max_id = router.db.get().execute("SELECT max(id) FROM notes").fetchone()[0]
+        heavy = max(1, min(args.repeat // 10, 1_000_000 // count))  # Repeticiones para operaciones O(n)
+        results: Dict[str, Any] = {"notes": count}
+
+        print(f"[{label}] CRUD", file=sys.stderr)
+        created: List[int] = []
+        results["new_note"] = measure(lambda: created.append(router.new_note("Nota de benchmark " * 8)), args.repeat)
+        results["get_note"] = measure(lambda: router.get_note(rng.randint(1, max_id)), args.repeat)
+        results["update_note"] = measure(lambda: router.update_note(rng.choice(created), "Nota modificada"), args.repeat)
+        results["delete_note"] = measure(lambda: created and router.delete_note(created.pop()), min(args.repeat, len(created) - 1))
+        results["read_notes"] = measure(lambda: router.read_notes(), heavy)
+
+        print(f"[{label}] listado y búsqueda", file=sys.stderr)
+        results["list_page"] = measure(lambda: list(router.iter_notes(limit=50, preview=True)), args.repeat)
+        results["list_all"] = measure(lambda: sum(1 for _ in router.iter_notes(page_size=1000, preview=True)), heavy)
+        queries = iter(SEARCH_QUERIES * (args.repeat + 1))
+        results["search"] = measure(lambda: router.search_notes(next(queries), limit=20), args.repeat)
+
+        print(f"[{label}] import/export", file=sys.stderr)
+        import_dir = workdir / "import"
+        import_dir.mkdir()
+        for i, content in enumerate(synthetic_contents(args.import_files, seed=args.seed + 1)):
+            (import_dir / f"doc_{i}.txt").write_text(content, encoding="utf-8")
+        files = sorted(import_dir.iterdir())
+        results["import"] = measure(
+            lambda: router.new_notes(f.read_text(encoding="utf-8") for f in files), max(1, heavy // 2)
+        )
+        results["import"]["files"] = len(files)
+        export_path = workdir / "export.ndjson"
+        results["export_ndjson"] = measure(
+            lambda: export_notes(router.iter_notes(page_size=1000), "ndjson", str(export_path)), max(1, heavy // 2), warmup=0
+        )
+        router.close()
+
+        if not args.skip_cli:
+            print(f"[{label}] latencia de mnctl", file=sys.stderr)
+            config_path = workdir / "config.toml"
+            write_toml(config, config_path)
+            for name, argv in {
+                "mnctl_ls": ["ls", "-n", "1"],
+                "mnctl_leer": ["leer", str(max_id // 2)],
+                "mnctl_buscar": ["buscar", "redis", "-n", "5"],
+            }.items():
+                latency = mnctl_latency(config_path, argv, args.cli_repeat)
+                if latency:
+                    results[name] = latency
+
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Devuelve las regresiones: medianas más lentas que baseline * (1 + threshold)."""
+    regressions = []
+    for label, metrics in results["results"].items():
+        base_metrics = baseline.get("results", {}).get(label, {})
+        for name, stats in metrics.items():
+            base = base_metrics.get(name)
+            if not isinstance(stats, dict) or not isinstance(base, dict):
+                continue
+            if base["median_ms"] > 0 and stats["median_ms"] > base["median_ms"] * (1 + threshold):
+                ratio = stats["median_ms"] / base["median_ms"]
+                regressions.append(f"{label}/{name}: {base['median_ms']:.3f} ms -> {stats['median_ms']:.3f} ms (x{ratio:.2f})")
+    return regressions
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    for label, metrics in results["results"].items():
+        print(f"\n== {label} notas ==")
+        print(f"{'operación':<16}{'mediana ms':>14}{'p95 ms':>12}{'runs':>7}")
+        for name, stats in metrics.items():
+            if isinstance(stats, dict):
+                print(f"{name:<16}{stats['median_ms']:>14.3f}{stats['p95_ms']:>12.3f}{stats['runs']:>7}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de Minimal Notes")
+    parser.add_argument("--sizes", default="10k,100k,1m", help="Tamaños de base separados por coma (ej. 10k,100k,1m)")
+    parser.add_argument("--repeat", type=int, default=100, help="Repeticiones por operación puntual")
+    parser.add_argument("--cli-repeat", type=int, default=10, help="Repeticiones por invocación de mnctl")
+    parser.add_argument("--import-files", type=int, default=1000, help="Archivos para el benchmark de importación")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--regenerate", action="store_true", help="Regenerar las bases sintéticas cacheadas")
+    parser.add_argument("--skip-cli", action="store_true", help="No medir la latencia de mnctl")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", type=Path, help="Comparar contra este JSON de resultados")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Regresión tolerada sobre la mediana (0.20 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Guardar los resultados como baseline ({DEFAULT_BASELINE.name})")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "generator_version": GENERATOR_VERSION,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes.split(","):
+        count = parse_size(size)
+        results["results"][size_label(count)] = bench_size(count, args)
+
+    print_table(results)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nResultados: {args.output}")
+
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Baseline guardado: {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print(f"\nRegresiones (> {args.threshold:.0%} sobre {args.baseline}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nSin regresiones respecto de {args.baseline} (umbral {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
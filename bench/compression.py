@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Benchmark de la compresión de cuerpos (`[database] compression`) sobre las bases sintéticas.
+
+Para cada tamaño y algoritmo (none, zlib, lzma) compacta una copia de la
+base de `bench.py`, y mide el tamaño del archivo, el tiempo de
+compactación y el costo de lectura: recorrido completo (`iter_notes`),
+`get_note` al azar, búsqueda full-text y listado (que no lee los cuerpos).
+
+Uso:
+    python bench/compression.py
+    python bench/compression.py --sizes 10k,100k --min-bytes 1024 --output compression.json
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from backend.database import (  # noqa: E402
+    ConnectionManager,
+    compact_notes,
+    compression_policy,
+    get_note,
+    iter_notes,
+    search_notes,
+    vacuum
+)
+from bench import SEARCH_QUERIES, generate_database, measure, parse_size, size_label  # noqa: E402
+
+ALGORITHMS = ["none", "zlib", "lzma"]
+
+
+def file_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in (path, Path(f"{path}-wal")) if p.exists())
+
+
+def bench_algorithm(source: Path, algorithm: str, args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix=f"mnbench_{algorithm}_"))
+    try:
+        db_path = workdir / "notes.db"
+        shutil.copyfile(source, db_path)
+        db = ConnectionManager(str(db_path))
+        conn = db.get()
+        vacuum(conn)  # Mismo punto de partida para todos (la copia puede venir sin compactar)
+        size_before = file_size(db_path)
+
+        start = time.perf_counter()
+        stats = compact_notes(conn, compression_policy(algorithm, args.min_bytes))
+        vacuum(conn)
+        compact_s = time.perf_counter() - start
+
+        rng = random.Random(args.seed)
+        max_id = conn.execute("SELECT max(id) FROM notes").fetchone()[0]
+        queries = iter(SEARCH_QUERIES * (args.repeat + 1))
+        heavy = max(1, args.repeat // 10)
+        result = {
+            "algorithm": algorithm,
+            "compressed": stats["changed"],
+            "content_mb": round(stats["bytes_after"] / 1024 ** 2, 2),
+            "file_mb_before": round(size_before / 1024 ** 2, 2),
+            "file_mb": round(file_size(db_path) / 1024 ** 2, 2),
+            "compact_s": round(compact_s, 2),
+            "read_all": measure(lambda: sum(1 for _ in iter_notes(conn, page_size=1000)), heavy),
+            "get_note": measure(lambda: get_note(conn, rng.randint(1, max_id)), args.repeat),
+            "search": measure(lambda: search_notes(conn, next(queries)), args.repeat),
+            "list_all": measure(lambda: sum(1 for _ in iter_notes(conn, page_size=1000, preview=True)), heavy),
+        }
+        db.close()
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,100k", help="Tamaños de base, ej. 10k,100k")
+    parser.add_argument("--algorithms", default=",".join(ALGORITHMS), help="Algoritmos a medir")
+    parser.add_argument("--min-bytes", type=int, default=4096, help="compress_min_bytes")
+    parser.add_argument("--repeat", type=int, default=200, help="Repeticiones de get_note/search")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    for count in (parse_size(size) for size in args.sizes.split(",")):
+        label = size_label(count)
+        source = generate_database(count, seed=args.seed)
+        results[label] = []
+        print(f"\n[{label}] min_bytes={args.min_bytes}")
+        print(f"{'algoritmo':<10} {'comprim.':>9} {'cuerpos MB':>11} {'archivo MB':>16} {'compact s':>10} "
+              f"{'read_all ms':>12} {'get_note ms':>12} {'search ms':>10} {'list_all ms':>12}")
+        for algorithm in args.algorithms.split(","):
+            row = bench_algorithm(source, algorithm.strip(), args)
+            results[label].append(row)
+            print(f"{row['algorithm']:<10} {row['compressed']:>9} {row['content_mb']:>11.2f} "
+                  f"{row['file_mb_before']:>7.2f} -> {row['file_mb']:>5.2f} {row['compact_s']:>10.2f} "
+                  f"{row['read_all']['median_ms']:>12.1f} {row['get_note']['median_ms']:>12.3f} "
+                  f"{row['search']['median_ms']:>10.2f} {row['list_all']['median_ms']:>12.1f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Benchmark de arranque de mnctl: latencia por comando y módulos más lentos de importar.
+
+Mide cada comando en un proceso nuevo (como lo usa un script) y resta el
+arranque del intérprete (`python -c pass`) para aislar el costo propio de
+mnctl. Falla (exit 1) si algún comando no-IA supera `--target-ms`.
+
+Uso:
+    python bench/startup.py
+    python bench/startup.py --repeat 20 --target-ms 100 --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+MNCTL = ROOT / "cli" / "mnctl.py"
+
+# Comandos no-IA: no deberían cargar el SDK de Gemini ni el PromptManager
+COMMANDS = {
+    "ls": ["ls", "-n", "1"],
+    "leer": ["leer", "1"],
+    "buscar": ["buscar", "nota", "-n", "1"],
+    "crear": ["crear", "Nota de benchmark de arranque"],
+}
+
+
+def run_ms(cmd: List[str], cwd: Path, env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def median_ms(cmd: List[str], cwd: Path, env: Dict[str, str], repeat: int) -> float:
+    run_ms(cmd, cwd, env)  # Warmup (caché de bytecode y de disco)
+    return statistics.median(run_ms(cmd, cwd, env) for _ in range(repeat))
+
+
+def slowest_imports(cwd: Path, env: Dict[str, str], top: int) -> List[Dict[str, object]]:
+    """Módulos de mayor tiempo acumulado según `python -X importtime` (sin contar `site`)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(MNCTL), *COMMANDS["ls"]],
+                          cwd=cwd, env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match and match.group(4) != "site":
+            rows.append({"module": match.group(4), "cumulative_ms": int(match.group(2)) / 1000,
+                         "depth": len(match.group(3)) // 2})
+    rows = [r for r in rows if r["depth"] <= 2]
+    return sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de mnctl")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--target-ms", type=float, default=100.0, help="Costo propio máximo por comando no-IA")
+    parser.add_argument("--top", type=int, default=10, help="Cantidad de imports lentos a mostrar")
+    parser.add_argument("--output", type=Path, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop("GEMINI_API_KEY", None)  # Los comandos no-IA no deberían necesitarla
+
+    with tempfile.TemporaryDirectory(prefix="mnstartup_") as tmp:
+        workdir = Path(tmp)
+        # Config y prompts por defecto sin confirmaciones interactivas
+        subprocess.run([sys.executable, str(MNCTL), "crear", "nota inicial"], cwd=workdir, env=env,
+                       input=b"y\ny\n", capture_output=True)
+
+        interpreter = median_ms([sys.executable, "-c", "pass"], workdir, env, args.repeat)
+        results = {"interpreter_ms": round(interpreter, 2), "target_ms": args.target_ms, "commands": {}}
+        print(f"{'comando':<10}{'total ms':>10}{'mnctl ms':>10}")
+        print(f"{'(python)':<10}{interpreter:>10.1f}{'-':>10}")
+
+        failed = False
+        for name, argv in COMMANDS.items():
+            total = median_ms([sys.executable, str(MNCTL), *argv], workdir, env, args.repeat)
+            own = total - interpreter
+            failed |= own > args.target_ms
+            results["commands"][name] = {"total_ms": round(total, 2), "mnctl_ms": round(own, 2)}
+            print(f"{name:<10}{total:>10.1f}{own:>10.1f}{'  <-- sobre objetivo' if own > args.target_ms else ''}")
+
+        results["imports"] = slowest_imports(workdir, env, args.top)
+
+    print("\nImports más lentos (acumulado, `ls`):")
+    for row in results["imports"]:
+        print(f"  {row['cumulative_ms']:>8.1f} ms  {'  ' * row['depth']}{row['module']}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nResultados: {args.output}")
+
+    if failed:
+        print(f"\nAlgún comando supera el objetivo de {args.target_ms:.0f} ms de costo propio.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
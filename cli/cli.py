@@ -1,21 +1,138 @@
+import os
 import sys
+import json
+import time
+import shlex
+import logging
 import typer
-from typing import Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
 
 from dataclasses import dataclass
 
-from prompts import PromptManager
-from router import Router
+from router import Router, DEFAULT_PATHS
 from logger import Logger
+from backend import tracing
+
+if TYPE_CHECKING:
+    from prompts import PromptManager
+    from backend.cache import ResponseCache
+    from backend.usage import UsageLedger
 
 app = typer.Typer()
 
+# Resaltado de coincidencias en `buscar` (click lo elimina si la salida no es una terminal)
+HIGHLIGHT_START = "\x1b[1;33m"
+HIGHLIGHT_END = "\x1b[0m"
+
+
+def load_response_cache(router: Router) -> Optional["ResponseCache"]:
+    """Crea la cache de respuestas IA según la sección [cache] (None si está deshabilitada)."""
+    from backend.cache import ResponseCache
+
+    settings = router.cache_settings()
+    if not settings["enabled"]:
+        return None
+    return ResponseCache(settings["file"], ttl=settings["ttl"], max_mb=settings["max_mb"])
+
+
+def load_usage_ledger(router: Router) -> Optional["UsageLedger"]:
+    """Crea el registro de uso de la IA según la sección [usage] (None si está deshabilitado)."""
+    from backend.usage import UsageLedger
+
+    settings = router.usage_settings()
+    if not settings["enabled"]:
+        return None
+    return UsageLedger(settings["file"])
+
+
+def load_prompt_manager(router: Router, logger: Logger, cache: Optional["ResponseCache"] = None,
+                        ledger: Optional["UsageLedger"] = None) -> "PromptManager":
+    """Crea el PromptManager (importa prompts y, con él, el backend de IA)."""
+    from prompts import PromptManager
+    from backend.providers import ProviderError, create_provider
+
+    try:
+        provider = create_provider(router.ai_settings())
+    except ProviderError as e:
+        typer.echo(f"Error en la sección [ai] de la config: {e}")
+        logger.critical(f"Proveedor de IA inválido: {e}")
+        sys.exit(1)
+
+    try:
+        pm_instance = PromptManager(
+            prompts_file=router.prompts_file,
+            log_file=router.prompts_log,
+            cache=cache,
+            provider=provider,
+            log_level=router.log_level,
+            ledger=ledger
+        )
+    except ValueError as e:
+        typer.echo(str(e))
+        logger.critical(f"El archivo {router.prompts_file} está corrupto.")
+        sys.exit(1)
+
+    if not pm_instance.file_exists:
+        typer.echo("No existe o no se detectó una configuración de prompts.")
+        if typer.confirm(f"¿Desea crear una en la ruta '{router.prompts_file}'?", default=True):
+            pm_instance.save_prompts(prompts=pm_instance.prompts)
+            logger.debug("Se creó la configuración default de prompts en: %s", router.prompts_file)
+        else:
+            typer.echo("Usando configuración en memoria por defecto.")
+
+    return pm_instance
+
 
 @dataclass
 class AppContext:
     router: Router
     logger: Logger
-    pm: PromptManager
+    _pm: Optional["PromptManager"] = None
+    _cache: Optional["ResponseCache"] = None
+    _cache_loaded: bool = False
+    _ledger: Optional["UsageLedger"] = None
+    _ledger_loaded: bool = False
+
+    @property
+    def pm(self) -> "PromptManager":
+        """PromptManager cargado recién en el primer comando de IA (arranque rápido del resto)."""
+        if self._pm is None:
+            self._pm = load_prompt_manager(self.router, self.logger, cache=self.cache, ledger=self.ledger)
+        return self._pm
+
+    @property
+    def cache(self) -> Optional["ResponseCache"]:
+        """Cache de respuestas IA (None si está deshabilitada en la config)."""
+        if not self._cache_loaded:
+            self._cache = load_response_cache(self.router)
+            self._cache_loaded = True
+        return self._cache
+
+    @property
+    def ledger(self) -> Optional["UsageLedger"]:
+        """Registro de uso de la IA (None si está deshabilitado en la config)."""
+        if not self._ledger_loaded:
+            self._ledger = load_usage_ledger(self.router)
+            self._ledger_loaded = True
+        return self._ledger
+
+
+# Contextos inicializados por config (solo en modo daemon; None = deshabilitado)
+_warm_contexts: Optional[Dict[Tuple, AppContext]] = None
+
+
+def _context_key(config: Optional[str]) -> Tuple:
+    """Clave de contexto: cwd, ruta absoluta de la config y su mtime (recarga si se edita).
+
+    El cwd cuenta porque las rutas de la config (base, logs) pueden ser relativas.
+    """
+    path = Path(config) if config else DEFAULT_PATHS["config"]
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    return (os.getcwd(), str(path.resolve()), mtime)
 
 
 @app.callback()
@@ -24,13 +141,34 @@ def cli(ctx: typer.Context,
             None,
             "--config", "-c",
             help="Ruta al archivo de configuración TOML"
+        ),
+        profile: bool = typer.Option(
+            False,
+            "--profile",
+            help="Mostrar al terminar el árbol de tiempos (spans) del comando"
+        ),
+        profile_dump: Optional[Path] = typer.Option(
+            None,
+            "--profile-dump",
+            help="Guardar estadísticas de cProfile en este archivo (ver con `python -m pstats`)"
         )
     ):
     """Inicializa la aplicación CLI de notas con configuración flexible."""
-    router_instance = Router()
-    config_path = config if config else router_instance.config_path
+    started = time.perf_counter()
+    profiler = _start_profiler() if profile_dump else None
+
+    # En modo daemon (`serve`) se reutiliza el contexto ya inicializado para esta config
+    key = _context_key(config)
+    if _warm_contexts is not None and key in _warm_contexts:
+        ctx.obj = _warm_contexts[key]
+        _start_tracing(ctx, profile, profile_dump, profiler, started, None)
+        return
+
+    router_instance = Router(config_path=config)  # Única lectura del TOML
+    config_path = router_instance.config_path
+    config_parsed = time.perf_counter()
 
-    if not router_instance.parse_config(config_path):
+    if not router_instance.config_loaded:
         typer.echo("No se otorgó o no existe una configuración válida.")
         if typer.confirm(f"¿Desea crear una en la ruta '{config_path}'?", default=True):
             router_instance.create_config_file(config_path)
@@ -39,32 +177,70 @@ def cli(ctx: typer.Context,
             typer.echo("Usando configuración en memoria por defecto.")
 
     # A partir de este punto hay logs (Router pos config)
-    logger_instance = Logger("Minimal-Notes", log_file=router_instance.cli_log, stream=router_instance.stream).get()
-
-    try:
-        pm_instance = PromptManager(
-            prompts_file=router_instance.prompts_file, 
-            log_file=router_instance.prompts_log
-        )
-    except ValueError as e:
-        typer.echo(str(e))
-        logger_instance.critical(f"El archivo {router_instance.prompts_file} está corrupto.")
-        sys.exit(1)
-
-    if not pm_instance.file_exists:
-        typer.echo("No existe o no se detectó una configuración de prompts.")
-        if typer.confirm(f"¿Desea crear una en la ruta '{router_instance.prompts_file}'?", default=True):
-            pm_instance.save_prompts(prompts=pm_instance.prompts)
-            logger_instance.debug(f"Se creó la configuración default de prompts en: {router_instance.prompts_file}")
-        else:
-            typer.echo("Usando configuración en memoria por defecto.")
+    logger_instance = Logger("Minimal-Notes", log_file=router_instance.cli_log, stream=router_instance.stream,
+                             level=router_instance.log_level).get()
 
     # Objeto de contexto flexible como AppContext
     ctx.obj = AppContext(
         router=router_instance,
-        pm=pm_instance,
         logger=logger_instance
     )
+    if _warm_contexts is not None:
+        router_instance.resolve_paths()
+        _warm_contexts[key] = ctx.obj
+    _start_tracing(ctx, profile, profile_dump, profiler, started, config_parsed)
+
+
+def _start_profiler() -> Any:
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _start_tracing(ctx: typer.Context, profile: bool, profile_dump: Optional[Path], profiler: Any,
+                   started: float, config_parsed: Optional[float]) -> None:
+    """Abre el span raíz del comando si hay tracing (--profile o `tracing = true`) y lo cierra al terminar.
+
+    Cada span se escribe como una línea JSON en el log de trazas; con
+    --profile además se imprime el árbol por stderr.
+    """
+    router = ctx.obj.router
+    if not (profile or router.tracing or profiler):
+        return
+
+    trace_logger = Logger("Trace", log_file=router.trace_log, level=logging.INFO,
+                          formatter=logging.Formatter("%(message)s")).get()
+    trace_id = f"{os.getpid()}-{int(time.time() * 1000)}"
+    command = ctx.invoked_subcommand or ""
+
+    def sink(record: Dict[str, Any]) -> None:
+        trace_logger.info(json.dumps({"trace": trace_id, "command": command, **record}, ensure_ascii=False, default=str))
+
+    tracing.reset()
+    tracing.enable(sink)
+    root = tracing.span(f"mnctl {command}".strip())
+    root.__enter__()
+    # El proceso arrancó antes que el callback: el arranque (imports) se registra hacia atrás
+    if tracing.process_start is not None and _warm_contexts is None:
+        root.start = tracing.process_start
+        tracing.record("startup", tracing.process_start, started)
+    if config_parsed is not None:
+        tracing.record("config.parse", started, config_parsed)
+
+    def finish() -> None:
+        root.finish()
+        roots = tracing.reset()
+        tracing.disable()
+        if profile:
+            typer.echo("\n" + tracing.format_tree(roots), err=True)
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(str(profile_dump))
+            typer.echo(f"cProfile: {profile_dump} (python -m pstats {profile_dump})", err=True)
+
+    ctx.call_on_close(finish)
 
 
 # Comandos CRUD
@@ -90,18 +266,31 @@ def crear(ctx: typer.Context, content: str):
 @app.command("listar")
 @app.command("list")
 @app.command("ls")
-def listar(ctx: typer.Context):
-    """Lista todas las notas almacenadas."""
+def listar(ctx: typer.Context,
+           limit: Optional[int] = typer.Option(None, "--limit", "-n", min=1, help="Máximo de notas a listar"),
+           after: Optional[int] = typer.Option(None, "--after", help="Listar a partir de este ID (sin incluirlo)"),
+           reverse: bool = typer.Option(False, "--reverse", "-r", help="Más recientes primero"),
+           page_size: int = typer.Option(500, "--page-size", min=1, help="Notas leídas por consulta")):
+    """Lista las notas almacenadas (en streaming, página por página)."""
     router = ctx.obj.router
-    notes = router.read_notes()
+    count = 0
 
-    if not notes:
-        typer.echo(f"No hay notas almacenadas en: '{router.database_file}'")
-        return
+    try:
+        with tracing.span("render") as render:
+            # Solo la vista previa y el largo guardados: no se leen los cuerpos de las notas
+            for n in router.iter_notes(limit=limit, after=after, reverse=reverse, page_size=page_size, preview=True):
+                typer.echo(f"ID: {n[0]} | FECHA: {n[2]}")
+                typer.echo(f"   >>> {n[1]}{'...' if n[3] > len(n[1]) else ''}\n")
+                count += 1
+            render.set(rows=count)
+    except Exception as e:
+        typer.echo(f"Error listando notas: {e}")
+        sys.exit(1)
 
-    for n in notes:
-        typer.echo(f"ID: {n[0]} | FECHA: {n[2]}")
-        typer.echo(f"   >>> {n[1][:50]}{'...' if len(n[1]) > 50 else ''}\n")
+    if not count and after is not None:
+        typer.echo(f"No hay más notas a partir del ID {after}")
+    elif not count:
+        typer.echo(f"No hay notas almacenadas en: '{router.database_file}'")
 
 
 @app.command("leer")
@@ -110,13 +299,7 @@ def listar(ctx: typer.Context):
 def leer(ctx: typer.Context, note_id: int):
     """Lee una nota específica por su ID."""
     router = ctx.obj.router
-    notes = router.read_notes()
-
-    if not notes:
-        typer.echo(f"No hay notas en: '{router.database_file}'")
-        sys.exit(1)
-
-    note = next((n for n in notes if n[0] == note_id), None)
+    note = router.get_note(note_id)
     if not note:
         typer.echo(f"No se encontró la nota con el ID {note_id}")
         sys.exit(1)
@@ -167,41 +350,173 @@ def eliminar(ctx: typer.Context, note_id: int):
 @app.command("search")
 @app.command("find")
 @app.command("grep")
-def buscar(ctx: typer.Context, query: str):
-    """Busca notas que contengan el texto especificado."""
+def buscar(ctx: typer.Context, query: str,
+           limit: int = typer.Option(20, "--limit", "-n", min=1, help="Máximo de resultados"),
+           semantic: bool = typer.Option(False, "--semantic", "-s", help="Buscar por significado (embeddings) en vez de por texto")):
+    """Busca notas por texto (cada palabra también como prefijo; frases "..." exactas; AND/OR/NOT), ordenadas por relevancia."""
     router = ctx.obj.router
-    notes = router.read_notes()
-
-    if not notes:
-        typer.echo("No hay notas para buscar.")
-        return
+    if semantic:
+        if not _sync_index(router):
+            sys.exit(1)
+        matches = router.semantic_search(query, limit=limit)
+    else:
+        matches = router.search_notes(query, limit=limit, highlight=(HIGHLIGHT_START, HIGHLIGHT_END))
 
-    matches = [n for n in notes if query.lower() in n[1].lower()]
+    if matches is None:
+        typer.echo("Error: No se pudo realizar la búsqueda.")
+        sys.exit(1)
 
     if not matches:
-        typer.echo(f"No se encontraron notas que contengan: '{query}'")
+        typer.echo(f"No se encontraron notas {'parecidas a' if semantic else 'que contengan:'} '{query}'")
         return
 
-    typer.echo(f"Encontradas {len(matches)} nota(s) con '{query}':")
-    for n in matches:
-        typer.echo(f"ID: {n[0]} | FECHA: {n[2]}")
-        typer.echo(f"   >>> {n[1][:50]}{'...' if len(n[1]) > 50 else ''}\n")
+    with tracing.span("render", rows=len(matches)):
+        if semantic:
+            typer.echo(f"Encontradas {len(matches)} nota(s) parecidas a '{query}':")
+            for n in matches:
+                snippet = " ".join(n[2].split())
+                typer.echo(f"ID: {n[0]} | FECHA: {n[1]} | SIMILITUD: {n[3]:.3f}")
+                typer.echo(f"   >>> {snippet[:80]}{'...' if len(snippet) > 80 else ''}\n")
+            return
+
+        typer.echo(f"Encontradas {len(matches)} nota(s) con '{query}':")
+        for n in matches:
+            snippet = " ".join(n[2].split())
+            typer.echo(f"ID: {n[0]} | FECHA: {n[1]}")
+            typer.echo(f"   >>> {snippet}\n")
+
+
+def _sync_index(router: Router) -> bool:
+    """Indexa las notas nuevas o modificadas antes de una búsqueda semántica (progreso por stderr)."""
+    def progress(done: int, total: int) -> None:
+        typer.echo(f"\rIndexando notas: {done}/{total}", nl=False, err=True)
+
+    total = router.sync_embeddings(progress=progress)
+    if total is None:
+        typer.echo("Error: No se pudieron indexar las notas (ver la sección [embeddings] de la config).")
+        return False
+    if total:
+        typer.echo(err=True)
+    return True
+
+
+@app.command("indexar")
+@app.command("index")
+def indexar(ctx: typer.Context,
+            rebuild: bool = typer.Option(False, "--rebuild", help="Descartar todos los vectores y recalcularlos")):
+    """Indexa las notas nuevas o modificadas para la búsqueda semántica."""
+    router = ctx.obj.router
+    logger = ctx.obj.logger
+
+    def progress(done: int, total: int) -> None:
+        typer.echo(f"\rIndexando notas: {done}/{total}", nl=False)
+
+    total = router.sync_embeddings(rebuild=rebuild, progress=progress)
+    if total is None:
+        typer.echo("Error: No se pudieron indexar las notas (ver la sección [embeddings] de la config).")
+        sys.exit(1)
+    if total:
+        typer.echo()
+    typer.echo(f"{total} nota(s) indexadas (modelo {router.embedder().model}).")
+    logger.info(f"Índice semántico: {total} notas indexadas")
+
+
+def _parse_change_since(value: str) -> Tuple[int, Optional[str]]:
+    """`exportar --since`: número de secuencia, ventana (24h, 7d) o fecha ISO -> (seq, fecha UTC)."""
+    from datetime import datetime, timezone
+
+    value = value.strip()
+    if value.isdigit():
+        return int(value), None
+    if value[-1:].lower() in _SINCE_UNITS and value[:-1].isdigit():
+        moment = datetime.fromtimestamp(_parse_since(value), timezone.utc)
+    else:
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise typer.BadParameter(f"'{value}' no es un número de secuencia, una ventana (24h, 7d) ni una fecha ISO")
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc)  # Las fechas de la base están en UTC
+    return 0, moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _export_changes(router: Router, logger: Logger, since: str, fmt: Optional[str],
+                    output: Optional[str], page_size: int) -> None:
+    """Exportación incremental: solo las notas cambiadas desde `since`, con tombstones de las borradas."""
+    from backend.export import export_changes, infer_format
+
+    seq, since_time = _parse_change_since(since)
+    fmt = fmt or infer_format(output)
+    output = output or ("cambios.ndjson" if fmt == "ndjson" else "notas")
+    changes = router.iter_changes(since=seq, since_time=since_time, page_size=page_size)
+
+    try:
+        stats = export_changes(changes, fmt, output, stdout=sys.stdout)
+    except Exception as e:
+        typer.echo(f"Error exportando cambios: {e}", err=True)
+        logger.error(f"Error en exportación incremental ({fmt} -> {output}): {e}")
+        sys.exit(1)
+
+    # Con `-o -` el resumen va a stderr para no mezclarse con el ndjson
+    last_seq = stats["last_seq"] if stats["last_seq"] is not None else seq
+    typer.echo(f"{stats['notes']} nota(s) cambiadas y {stats['deleted']} borrada(s) exportadas a: {output} ({fmt})",
+               err=output == "-")
+    typer.echo(f"Próxima exportación: --since {last_seq}", err=output == "-")
+    logger.info(f"Exportación incremental desde {since}: {stats['notes']} notas, "
+                f"{stats['deleted']} borradas -> {output} ({fmt}); último seq={last_seq}")
 
 
 @app.command("exportar")
 @app.command("export")
 @app.command("out")
-def exportar(ctx: typer.Context, note_id: int, filename: Optional[str] = None):
-    """Exporta una nota a un archivo."""
+def exportar(ctx: typer.Context,
+             note_id: Optional[int] = typer.Argument(None, help="ID de la nota a exportar"),
+             filename: Optional[str] = None,
+             all_notes: bool = typer.Option(False, "--all", help="Exportar todas las notas"),
+             from_id: Optional[int] = typer.Option(None, "--from-id", help="Exportar desde este ID (incluido)"),
+             to_id: Optional[int] = typer.Option(None, "--to-id", help="Exportar hasta este ID (incluido)"),
+             query: Optional[str] = typer.Option(None, "--query", "-q", help="Exportar solo notas que coincidan con la búsqueda"),
+             since: Optional[str] = typer.Option(None, "--since", help="Solo lo cambiado desde un número de secuencia, "
+                                                                       "una ventana (24h, 7d) o una fecha ISO; incluye borrados"),
+             fmt: Optional[str] = typer.Option(None, "--format", "-f", help="ndjson, md, tar o zip (default: según --output)"),
+             output: Optional[str] = typer.Option(None, "--output", "-o", help="Archivo/directorio de salida ('-' = stdout)"),
+             page_size: int = typer.Option(1000, "--page-size", min=1, help="Notas leídas por consulta")):
+    """Exporta una nota a un archivo, o muchas (--all/--from-id/--to-id/--query/--since) en streaming."""
     router = ctx.obj.router
     logger = ctx.obj.logger
-    notes = router.read_notes()
 
-    if not notes:
-        typer.echo("No hay notas para exportar.")
-        sys.exit(1)
-    
-    note = next((n for n in notes if n[0] == note_id), None)
+    if since is not None:
+        if note_id is not None or all_notes or from_id is not None or to_id is not None or query:
+            typer.echo("--since no se combina con un ID, --all, --from-id, --to-id ni --query.")
+            sys.exit(1)
+        _export_changes(router, logger, since, fmt, output, page_size)
+        return
+
+    if note_id is None:
+        from backend.export import export_notes, infer_format
+
+        if not (all_notes or from_id is not None or to_id is not None or query):
+            typer.echo("Indicá un ID o una selección: --all, --from-id, --to-id, --query o --since.")
+            sys.exit(1)
+
+        fmt = fmt or infer_format(output)
+        output = output or {"ndjson": "notas.ndjson", "md": "notas", "tar": "notas.tar", "zip": "notas.zip"}.get(fmt, "notas")
+        after = from_id - 1 if from_id is not None else None
+        notes = router.iter_notes(after=after, until=to_id, query=query, page_size=page_size)
+
+        try:
+            count = export_notes(notes, fmt, output, stdout=sys.stdout)
+        except Exception as e:
+            typer.echo(f"Error exportando notas: {e}", err=True)
+            logger.error(f"Error en exportación en bloque ({fmt} -> {output}): {e}")
+            sys.exit(1)
+
+        if output != "-":
+            typer.echo(f"{count} nota(s) exportadas a: {output} ({fmt})")
+        logger.info(f"Exportación en bloque: {count} notas -> {output} ({fmt})")
+        return
+
+    note = router.get_note(note_id)
     if not note:
         typer.echo(f"No se encontró la nota con ID {note_id}")
         sys.exit(1)
@@ -224,56 +539,490 @@ def exportar(ctx: typer.Context, note_id: int, filename: Optional[str] = None):
         sys.exit(1)
 
 
+def _expand_import_paths(paths: List[str], pattern: str) -> Tuple[List[Path], List[Tuple[str, str]]]:
+    """Expande archivos, directorios (recursivo) y globs a una lista de archivos."""
+    import glob
+
+    files: List[Path] = []
+    errors: List[Tuple[str, str]] = []
+
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            found = sorted(p for p in path.rglob(pattern) if p.is_file())
+        elif path.is_file():
+            found = [path]
+        else:
+            found = sorted(Path(p) for p in glob.glob(raw, recursive=True) if Path(p).is_file())
+
+        if not found:
+            errors.append((raw, "no se encontró el archivo"))
+        files.extend(found)
+
+    return files, errors
+
+
+def _read_import_file(path: Path) -> Tuple[Path, Optional[str], Optional[str]]:
+    """Lee un archivo a importar. Devuelve (ruta, contenido, error)."""
+    try:
+        content = path.read_text(encoding='utf-8').strip()
+    except Exception as e:
+        return path, None, str(e)
+    if not content:
+        return path, None, "vacío o sin texto válido"
+    return path, content, None
+
+
+def _read_import_files(files: List[Path], workers: int, window: int = 256):
+    """Lee los archivos en un thread pool, en orden y por ventanas (memoria acotada)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(files), window):
+            yield from pool.map(_read_import_file, files[start:start + window])
+
+
 @app.command("importar")
 @app.command("import")
 @app.command("in")
-def importar(ctx: typer.Context, file_path: str):
-    """Importa contenido de un archivo como nueva nota."""
+def importar(ctx: typer.Context,
+             paths: List[str] = typer.Argument(..., help="Archivos, directorios o globs ('docs/**/*.md')"),
+             pattern: str = typer.Option("*", "--pattern", "-p", help="Patrón de archivos al importar directorios"),
+             batch_size: int = typer.Option(0, "--batch-size", min=0, help="Notas por transacción (0 = una sola)"),
+             workers: int = typer.Option(8, "--workers", "-w", min=1, help="Hilos de lectura de archivos")):
+    """Importa archivos como notas nuevas (uno, varios, directorios o globs)."""
     router = ctx.obj.router
     logger = ctx.obj.logger
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
+    files, errors = _expand_import_paths(paths, pattern)
 
-        if not content:
-            typer.echo("El archivo está vacío o no contiene texto válido.")
+    # Un único archivo: mismo flujo de siempre, mostrando el ID creado
+    if len(files) == 1 and not errors:
+        path, content, error = _read_import_file(files[0])
+        if error:
+            typer.echo(f"Error leyendo '{path}': {error}")
+            logger.error(f"Error importando {path}: {error}")
             sys.exit(1)
 
         note_id = router.new_note(content)
         if note_id:
             typer.echo(f"Archivo importado como nota ID {note_id}:")
             typer.echo(f"   >>> {content[:50]}{'...' if len(content) > 50 else ''}")
-            logger.info(f"Archivo importado: {file_path} -> ID={note_id}")
+            logger.info(f"Archivo importado: {path} -> ID={note_id}")
         else:
             typer.echo("Error: No se pudo importar el archivo.")
-            logger.error(f"Falló importación de: {file_path}")
+            logger.error(f"Falló importación de: {path}")
+            sys.exit(1)
+        return
+
+    imported = 0
+    if files:
+        with typer.progressbar(length=len(files), label="Importando", file=sys.stderr) as bar:
+            def contents():
+                for path, content, error in _read_import_files(files, workers):
+                    bar.update(1)
+                    if error:
+                        errors.append((str(path), error))
+                        continue
+                    yield content
+
+            imported = router.new_notes(contents(), batch_size=batch_size or None)
+
+        if imported is None:
+            typer.echo("Error: No se pudieron guardar las notas importadas.")
+            logger.error(f"Falló importación en bloque de {len(files)} archivos")
             sys.exit(1)
 
-    except FileNotFoundError:
-        typer.echo(f"Error: No se encontró el archivo '{file_path}'")
+    typer.echo(f"Importados {imported} de {len(files)} archivo(s).")
+    logger.info(f"Importación en bloque: {imported}/{len(files)} archivos")
+
+    if errors:
+        typer.echo(f"Errores ({len(errors)}):")
+        for path, error in errors:
+            typer.echo(f"   {path}: {error}")
+        logger.warning(f"Importación con {len(errors)} errores")
+        if not imported:
+            sys.exit(1)
+
+
+@app.command("batch")
+def batch(ctx: typer.Context,
+          source: str = typer.Argument("-", help="Archivo NDJSON con operaciones ('-' = stdin)"),
+          chunk_size: int = typer.Option(0, "--chunk-size", min=0, help="Operaciones por transacción (0 = una sola)")):
+    """Aplica operaciones NDJSON (create/update/delete) en una transacción y reporta cada resultado."""
+    router = ctx.obj.router
+    logger = ctx.obj.logger
+
+    from contextlib import nullcontext
+
+    try:
+        # stdin no se cierra al terminar: es del proceso (y del shell, si se corre desde `mnctl shell`)
+        stream = nullcontext(sys.stdin) if source == "-" else open(source, 'r', encoding='utf-8')
+    except OSError as e:
+        typer.echo(f"Error abriendo '{source}': {e}", err=True)
+        sys.exit(1)
+
+    applied = failed = 0
+    try:
+        with stream as lines:
+            operations = (line for line in lines if line.strip())
+            for result in router.batch(operations, chunk_size=chunk_size or None):
+                typer.echo(json.dumps(result, ensure_ascii=False))
+                if result["ok"]:
+                    applied += 1
+                else:
+                    failed += 1
+    except Exception as e:
+        typer.echo(f"Error aplicando operaciones: {e}", err=True)
+        logger.error(f"Batch abortado tras {applied + failed} operaciones: {e}")
+        sys.exit(1)
+
+    typer.echo(f"{applied + failed} operación(es): {applied} aplicadas, {failed} con error.", err=True)
+    logger.info(f"Batch desde '{source}': {applied} aplicadas, {failed} con error")
+    if failed:
+        sys.exit(1)
+
+
+def _database_size(path: str) -> int:
+    """Tamaño en disco de la base (incluye el WAL)."""
+    return sum(os.path.getsize(f) for f in (path, f"{path}-wal") if os.path.exists(f))
+
+
+@app.command("compact")
+def compact(ctx: typer.Context,
+            no_vacuum: bool = typer.Option(False, "--no-vacuum", help="No reescribir el archivo (no devuelve espacio al disco)")):
+    """Comprime (o descomprime) las notas existentes según [database] compression y reduce el archivo."""
+    router = ctx.obj.router
+    logger = ctx.obj.logger
+    before = _database_size(router.database_file)
+
+    def progress(done: int, total: int) -> None:
+        typer.echo(f"\rCompactando notas: {done}/{total}", nl=False)
+
+    stats = router.compact(vacuum=not no_vacuum, progress=progress)
+    if stats is None:
+        typer.echo("\nError: No se pudieron compactar las notas.", err=True)
+        sys.exit(1)
+    if stats["notes"]:
+        typer.echo()
+
+    after = _database_size(router.database_file)
+    algorithm = router.config.get("database", {}).get("compression", "none") if router.compression else "none"
+    typer.echo(f"{stats['changed']} de {stats['notes']} nota(s) recodificadas (compresión: {algorithm}).")
+    typer.echo(f"Contenido: {stats['bytes_before'] / 1024 ** 2:.1f} MiB -> {stats['bytes_after'] / 1024 ** 2:.1f} MiB")
+    typer.echo(f"Archivo:   {before / 1024 ** 2:.1f} MiB -> {after / 1024 ** 2:.1f} MiB"
+               + (" (sin VACUUM)" if no_vacuum else ""))
+    logger.info(f"Compactación ({algorithm}): {stats['changed']}/{stats['notes']} notas, {before} -> {after} bytes")
+
+
+@app.command("serve")
+def serve(ctx: typer.Context,
+          socket: Optional[str] = typer.Option(None, "--socket", help="Ruta del socket Unix (default: MNCTL_SOCKET o data/mnctl.sock)")):
+    """Inicia un daemon residente: mnctl reenvía los comandos por un socket Unix (sin costo de arranque)."""
+    global _warm_contexts
+    import daemon
+
+    logger = ctx.obj.logger
+    path = socket or daemon.socket_path()
+
+    # Router, conexión SQLite y loggers ya quedaron inicializados por el callback. Cada comando
+    # corre en el cwd de su cliente: las rutas relativas de la config se fijan al de `serve`
+    ctx.obj.router.resolve_paths()
+    _warm_contexts = {_context_key(ctx.parent.params.get("config")): ctx.obj}
+    typer.echo(f"Daemon escuchando en '{path}' (Ctrl+C para detener).")
+    try:
+        daemon.serve(typer.main.get_command(app), path, logger)
+    except (OSError, RuntimeError) as e:
+        typer.echo(f"Error iniciando el daemon: {e}", err=True)
+        logger.error(f"No se pudo iniciar el daemon en {path}: {e}")
         sys.exit(1)
+    finally:
+        _warm_contexts = None
+
+
+@app.command("shell")
+def shell(ctx: typer.Context,
+          history: Optional[Path] = typer.Option(None, "--history", help="Archivo de historial (default: data/.mnctl_history)")):
+    """Shell interactivo: ejecuta comandos de mnctl sin pagar el arranque en cada uno (Tab completa comandos e IDs)."""
+    global _warm_contexts
+    import shell as repl
+
+    # Router, conexión SQLite y loggers se reutilizan en cada línea; el PromptManager, desde el primer comando de IA
+    _warm_contexts = {_context_key(ctx.parent.params.get("config")): ctx.obj}
+    if sys.stdin.isatty():
+        typer.echo("Shell de mnctl: Tab completa comandos e IDs, 'help' lista los comandos, 'exit' o Ctrl+D sale.")
+    try:
+        repl.run(typer.main.get_command(app), ctx.obj.router, ctx.obj.logger, history or DEFAULT_PATHS["history"])
+    finally:
+        _warm_contexts = None
+
+
+@app.command("cache")
+def cache(ctx: typer.Context,
+          action: str = typer.Argument("stats", help="stats | purge (borra expiradas) | clear (vacía todo)")):
+    """Estadísticas y mantenimiento de la cache de respuestas IA."""
+    logger = ctx.obj.logger
+    response_cache = ctx.obj.cache
+
+    if response_cache is None:
+        typer.echo("La cache de respuestas IA está deshabilitada ([cache] enabled = false).")
+        return
+    if action not in ("stats", "purge", "clear"):
+        typer.echo(f"Acción desconocida: '{action}'. Opciones: stats, purge, clear.", err=True)
+        sys.exit(2)
+
+    try:
+        if action == "purge":
+            typer.echo(f"{response_cache.purge()} respuesta(s) expiradas eliminadas.")
+        elif action == "clear":
+            typer.echo(f"Cache vaciada: {response_cache.clear()} respuesta(s) eliminadas.")
+        stats = response_cache.stats()
     except Exception as e:
-        typer.echo(f"Error leyendo archivo: {e}")
-        logger.error(f"Error importando {file_path}: {e}")
+        typer.echo(f"Error accediendo a la cache: {e}", err=True)
+        logger.error(f"Error en `cache {action}`: {e}")
+        sys.exit(1)
+
+    ttl = f"{stats['ttl']} s" if stats["ttl"] else "sin expiración"
+    typer.echo(f"Archivo:   {stats['file']}")
+    typer.echo(f"Entradas:  {stats['entries']} ({stats['size'] / 1024:.1f} KiB de {stats['max_size'] / 1024 ** 2:.0f} MiB)")
+    typer.echo(f"TTL:       {ttl}")
+    typer.echo(f"Aciertos:  {stats['hits']} | Fallos: {stats['misses']} | Tasa: {stats['hit_ratio']:.1%}")
+
+
+# Unidades de `ai-stats --since` (ej. 30m, 24h, 7d)
+_SINCE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _parse_since(value: str) -> Optional[float]:
+    """'30m', '24h', '7d' o 'all' -> epoch desde el que contar (None = todo el historial)."""
+    value = value.strip().lower()
+    if value in ("all", "*"):
+        return None
+    amount, unit = value[:-1], value[-1:]
+    if unit not in _SINCE_UNITS or not amount.isdigit():
+        raise typer.BadParameter(f"'{value}' no es una ventana válida (ej: 30m, 24h, 7d, 2w, all)")
+    return time.time() - int(amount) * _SINCE_UNITS[unit]
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+@app.command("ai-stats")
+def ai_stats(ctx: typer.Context,
+             since: str = typer.Option("24h", "--since", help="Ventana de tiempo: 30m, 24h, 7d, 2w o all"),
+             prompt: Optional[str] = typer.Option(None, "--prompt", "-p", help="Solo este prompt"),
+             model: Optional[str] = typer.Option(None, "--model", "-m", help="Solo este modelo")):
+    """Latencia p50/p95/p99, tokens y tasa de aciertos de cache de la IA por prompt y modelo."""
+    logger = ctx.obj.logger
+    ledger = ctx.obj.ledger
+
+    if ledger is None:
+        typer.echo("El registro de uso de la IA está deshabilitado ([usage] enabled = false).")
+        return
+
+    window = _parse_since(since)
+    try:
+        stats = ledger.stats(since=window, prompt=prompt, model=model)
+    except Exception as e:
+        typer.echo(f"Error leyendo el registro de uso: {e}", err=True)
+        logger.error(f"Error en `ai-stats`: {e}")
+        sys.exit(1)
+
+    if not stats:
+        typer.echo(f"No hay llamadas a la IA registradas ({since}).")
+        return
+
+    typer.echo(f"{'PROMPT':<16} {'MODELO':<22} {'LLAM.':>6} {'ERR':>4} {'CACHE':>6} "
+               f"{'P50 ms':>7} {'P95 ms':>7} {'P99 ms':>7} {'IN PROM':>8} {'OUT PROM':>8} {'OUT MAX':>11}")
+    for row in stats:
+        out_max = f"{row['max_output_tokens']}/{row['max_tokens']}" if row["max_tokens"] else str(row["max_output_tokens"])
+        typer.echo(f"{row['prompt'][:16]:<16} {row['model'][:22]:<22} {row['calls']:>6} {row['errors']:>4} "
+                   f"{row['hit_ratio']:>6.0%} {_ms(row['p50_ms']):>7} {_ms(row['p95_ms']):>7} {_ms(row['p99_ms']):>7} "
+                   f"{row['avg_input_tokens']:>8.0f} {row['avg_output_tokens']:>8.0f} {out_max:>11}")
+
+    # Prompts que llegan al tope de tokens: candidatos a subir `max_tokens` (o a recortar la respuesta)
+    for row in stats:
+        if row["max_tokens"] and row["max_output_tokens"] >= row["max_tokens"]:
+            typer.echo(f"Aviso: '{row['prompt']}' ({row['model']}) alcanzó max_tokens={row['max_tokens']}; "
+                       f"puede haber respuestas truncadas.")
+
+
+# Escrituras por transacción al aplicar resultados de IA en bloque
+AI_WRITE_BATCH = 50
+
+
+def _parse_id_spec(spec: str) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Parsea '7', '1,4,9', '1-500', '1-10,20' o 'all' a rangos de IDs (ambos extremos incluidos)."""
+    if spec.strip().lower() in ("all", "*"):
+        return [(None, None)]
+
+    ranges = []
+    for part in spec.split(","):
+        start, sep, end = part.strip().partition("-")
+        try:
+            first, last = int(start), int(end) if sep else int(start)
+        except ValueError:
+            raise typer.BadParameter(f"'{part.strip()}' no es un ID ni un rango válido (ej: 7, 1,4,9, 1-500, all)")
+        if first > last:
+            raise typer.BadParameter(f"Rango invertido: '{part.strip()}'")
+        ranges.append((first, last))
+    return ranges
+
+
+def _format_id_spec(ids: List[int]) -> str:
+    """Inverso de `_parse_id_spec`: [1, 2, 3, 7] -> '1-3,7'."""
+    parts: List[str] = []
+    ids = sorted(ids)
+    start = prev = ids[0]
+    for note_id in ids[1:] + [None]:
+        if note_id is not None and note_id == prev + 1:
+            prev = note_id
+            continue
+        parts.append(str(start) if start == prev else f"{start}-{prev}")
+        start = prev = note_id
+    return ",".join(parts)
+
+
+def _single_id(ranges: List[Tuple[Optional[int], Optional[int]]], query: Optional[str]) -> Optional[int]:
+    """El ID si la selección es una sola nota (modo interactivo), si no None."""
+    if query or len(ranges) != 1 or ranges[0][0] is None or ranges[0][0] != ranges[0][1]:
+        return None
+    return ranges[0][0]
+
+
+def _select_notes(router: Router, ranges: List[Tuple[Optional[int], Optional[int]]],
+                  query: Optional[str]) -> List[Tuple[int, str]]:
+    """(id, contenido) de las notas en los rangos (y que coinciden con `query`), sin repetir."""
+    selected: Dict[int, str] = {}
+    for start, end in ranges:
+        after = start - 1 if start is not None else None
+        for note in router.iter_notes(after=after, until=end, query=query):
+            selected.setdefault(note[0], note[1])
+    return sorted(selected.items())
+
+
+def _stream_prompt(pm: "PromptManager", logger: Logger, header: str, name: str,
+                   use_cache: bool = True, **variables: str) -> Optional[str]:
+    """Imprime la respuesta de la IA a medida que llega y devuelve el texto completo (None si falla)."""
+    chunks: List[str] = []
+    try:
+        for chunk in pm.execute_prompt_stream(name, use_cache=use_cache, **variables):
+            if not chunks:
+                typer.echo(header)
+            typer.echo(chunk, nl=False)
+            chunks.append(chunk)
+    except Exception as e:
+        if chunks:
+            typer.echo("\n[respuesta incompleta]")
+        logger.error(f"Error ejecutando prompt '{name}' en streaming: {e}")
+        return None
+
+    if chunks and not chunks[-1].endswith("\n"):
+        typer.echo()
+    return "".join(chunks) or None
+
+
+def _run_ai_batch(ctx: typer.Context, prompt: str, notes: List[Tuple[int, str]],
+                  variables: Callable[[str], Dict[str, Any]],
+                  operation: Callable[[int, str], Dict[str, Any]],
+                  description: str, retry: str, concurrency: Optional[int],
+                  rpm: Optional[int], use_cache: bool, yes: bool) -> None:
+    """Ejecuta un prompt sobre muchas notas en paralelo y escribe los resultados en lotes.
+
+    `variables` arma las variables del template a partir del contenido y
+    `operation` la operación de `Router.batch` a partir de (id, resultado).
+    """
+    import asyncio
+
+    router = ctx.obj.router
+    pm = ctx.obj.pm
+    logger = ctx.obj.logger
+
+    if not notes:
+        typer.echo("No hay notas que coincidan con la selección.")
+        sys.exit(1)
+
+    settings = router.ai_settings()
+    concurrency = concurrency or settings["concurrency"]
+    rpm = settings["rpm"] if rpm is None else rpm
+    if not yes and not typer.confirm(f"{description} ¿Continuar?", default=True):
+        typer.echo("Operación cancelada.")
+        return
+
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    failed: Dict[int, str] = {}
+    saved: Set[int] = set()
+
+    def flush() -> None:
+        """Aplica los resultados pendientes en una transacción."""
+        results = router.batch([op for _, op in pending])
+        for (note_id, _), result in zip(pending, results):
+            if result["ok"]:
+                saved.add(note_id)
+                created = f" -> nota {result['id']}" if result["op"] == "create" else ""
+                typer.echo(f"[ok] Nota {note_id}{created}")
+            else:
+                failed[note_id] = result["error"]
+                typer.echo(f"[error] Nota {note_id}: {result['error']}", err=True)
+        pending.clear()
+
+    async def run() -> None:
+        items = ((note_id, variables(content)) for note_id, content in notes)
+        async for note_id, result, error in pm.execute_many(prompt, items, concurrency, rpm, use_cache):
+            if error:
+                failed[note_id] = error
+                typer.echo(f"[error] Nota {note_id}: {error}", err=True)
+            else:
+                pending.append((note_id, operation(note_id, result)))
+                if len(pending) >= AI_WRITE_BATCH:
+                    flush()
+
+    logger.info(f"IA en bloque '{prompt}': {len(notes)} notas (concurrency={concurrency}, rpm={rpm})")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        typer.echo("\nInterrumpido: guardando los resultados ya recibidos...", err=True)
+    finally:
+        if pending:
+            flush()
+
+    # Lo que falló o no llegó a procesarse se puede retomar con la misma orden
+    remaining = [note_id for note_id, _ in notes if note_id not in saved]
+    typer.echo(f"\n{len(saved)} de {len(notes)} nota(s) procesadas, {len(failed)} con error.")
+    logger.info(f"IA en bloque '{prompt}': {len(saved)} ok, {len(failed)} con error, {len(remaining)} pendientes")
+    if remaining:
+        typer.echo(f"Para reintentar las pendientes: mnctl {retry.replace('{ids}', _format_id_spec(remaining))}")
+        logger.warning(f"IA en bloque '{prompt}' pendientes: {_format_id_spec(remaining)}")
         sys.exit(1)
 
 
 # Comandos IA. TODO: Tratar de refactorizar y encapsular la logica (Simplificar código).
 @app.command("mejorar")
 @app.command("enhance")
-def mejorar(ctx: typer.Context, note_id: int):
-    """Mejora el contenido de una nota usando IA."""
+def mejorar(ctx: typer.Context,
+            note_ids: str = typer.Argument(..., help="ID, lista (1,4,9), rango (1-500) o 'all'"),
+            query: Optional[str] = typer.Option(None, "--query", "-q", help="Solo notas que coincidan con la búsqueda"),
+            concurrency: Optional[int] = typer.Option(None, "--concurrency", "-j", min=1, help="Llamadas en paralelo (default: [ai] concurrency)"),
+            rpm: Optional[int] = typer.Option(None, "--rpm", min=0, help="Máximo de llamadas por minuto (default: [ai] rpm)"),
+            yes: bool = typer.Option(False, "--yes", "-y", help="No pedir confirmación en modo bloque"),
+            no_cache: bool = typer.Option(False, "--no-cache", help="Ignorar la cache y llamar siempre a la IA")):
+    """Mejora el contenido de una nota (o de muchas, en paralelo) usando IA."""
     router = ctx.obj.router
     pm = ctx.obj.pm
     logger = ctx.obj.logger
 
-    notes = router.read_notes()
-    if not notes:
-        typer.echo("No hay notas disponibles.")
-        sys.exit(1)
+    ranges = _parse_id_spec(note_ids)
+    note_id = _single_id(ranges, query)
+    if note_id is None:
+        notes = _select_notes(router, ranges, query)
+        _run_ai_batch(ctx, "mejorar", notes, lambda content: {"content": content},
+                      lambda note_id, result: {"op": "update", "id": note_id, "content": result},
+                      f"Se van a mejorar {len(notes)} nota(s), reemplazando su contenido original.",
+                      "mejorar {ids} -y", concurrency, rpm, not no_cache, yes)
+        return
 
-    note = next((n for n in notes if n[0] == note_id), None)
+    note = router.get_note(note_id)
     if not note:
         typer.echo(f"No se encontró la nota con el ID {note_id}")
         sys.exit(1)
@@ -281,10 +1030,9 @@ def mejorar(ctx: typer.Context, note_id: int):
     content = note[1]
     typer.echo(f"Mejorando: {content[:50]}{'...' if len(content) > 50 else ''}")
 
-    result = pm.execute_prompt("mejorar", content=content)
+    result = _stream_prompt(pm, logger, "\n[=== CONTENIDO MEJORADO ===]", "mejorar",
+                            use_cache=not no_cache, content=content)
     if result:
-        typer.echo("\n[=== CONTENIDO MEJORADO ===]")
-        typer.echo(result)
         logger.info(f"Nota mejorada: ID={note_id}")
 
         if typer.confirm("¿Desea reemplazar la nota original con la versión mejorada?"):
@@ -299,30 +1047,41 @@ def mejorar(ctx: typer.Context, note_id: int):
 @app.command("traducir") 
 @app.command("translate") 
 @app.command("trans") 
-def traducir(ctx: typer.Context, note_id: int, language: str):
-    """Traduce una nota al idioma especificado."""
+def traducir(ctx: typer.Context,
+             note_ids: str = typer.Argument(..., help="ID, lista (1,4,9), rango (1-500) o 'all'"),
+             language: str = typer.Argument(..., help="Idioma destino"),
+             query: Optional[str] = typer.Option(None, "--query", "-q", help="Solo notas que coincidan con la búsqueda"),
+             concurrency: Optional[int] = typer.Option(None, "--concurrency", "-j", min=1, help="Llamadas en paralelo (default: [ai] concurrency)"),
+             rpm: Optional[int] = typer.Option(None, "--rpm", min=0, help="Máximo de llamadas por minuto (default: [ai] rpm)"),
+             yes: bool = typer.Option(False, "--yes", "-y", help="No pedir confirmación en modo bloque"),
+             no_cache: bool = typer.Option(False, "--no-cache", help="Ignorar la cache y llamar siempre a la IA")):
+    """Traduce una nota (o muchas, en paralelo) al idioma especificado."""
     router = ctx.obj.router
     pm = ctx.obj.pm
     logger = ctx.obj.logger
 
-    notes = router.read_notes()
-    if not notes:
-        typer.echo("No hay notas disponibles.")
-        sys.exit(1)
+    ranges = _parse_id_spec(note_ids)
+    note_id = _single_id(ranges, query)
+    if note_id is None:
+        notes = _select_notes(router, ranges, query)
+        _run_ai_batch(ctx, "traducir", notes, lambda content: {"content": content, "language": language},
+                      lambda note_id, result: {"op": "create", "content": f"[Traducción a {language}]\n{result}"},
+                      f"Se van a traducir a {language} {len(notes)} nota(s), guardando cada traducción como nota nueva.",
+                      "traducir {ids} " + shlex.quote(language) + " -y", concurrency, rpm, not no_cache, yes)
+        return
 
-    note = next((n for n in notes if n[0] == note_id), None)
+    note = router.get_note(note_id)
     if not note:
         typer.echo(f"No se encontró la nota con el ID {note_id}")
-        logger.debug(f"No se encontró la nota con el ID {note_id}")
+        logger.debug("No se encontró la nota con el ID %s", note_id)
         sys.exit(1)
 
     content = note[1]
     typer.echo(f"Traduciendo a {language} la nota: {content[:50]}{'...' if len(content) > 50 else ''}")
 
-    result = pm.execute_prompt("traducir", content=content, language=language)
+    result = _stream_prompt(pm, logger, f"\n[=== TRADUCCIÓN A {language.upper()} ===]", "traducir",
+                            use_cache=not no_cache, content=content, language=language)
     if result:
-        typer.echo(f"\n[=== TRADUCCIÓN A {language.upper()} ===]")
-        typer.echo(result)
         logger.info(f"Nota traducida: ID={note_id} -> {language}")
         
         if typer.confirm("¿Desea guardar la traducción como una nueva nota?"):
@@ -338,18 +1097,29 @@ def traducir(ctx: typer.Context, note_id: int, language: str):
 @app.command("resumir")
 @app.command("summarize")
 @app.command("sum")
-def resumir(ctx: typer.Context, note_id: int):
-    """Resume una nota utilizando IA."""
+def resumir(ctx: typer.Context,
+            note_ids: str = typer.Argument(..., help="ID, lista (1,4,9), rango (1-500) o 'all'"),
+            query: Optional[str] = typer.Option(None, "--query", "-q", help="Solo notas que coincidan con la búsqueda"),
+            concurrency: Optional[int] = typer.Option(None, "--concurrency", "-j", min=1, help="Llamadas en paralelo (default: [ai] concurrency)"),
+            rpm: Optional[int] = typer.Option(None, "--rpm", min=0, help="Máximo de llamadas por minuto (default: [ai] rpm)"),
+            yes: bool = typer.Option(False, "--yes", "-y", help="No pedir confirmación en modo bloque"),
+            no_cache: bool = typer.Option(False, "--no-cache", help="Ignorar la cache y llamar siempre a la IA")):
+    """Resume una nota (o muchas, en paralelo) utilizando IA."""
     router = ctx.obj.router
     pm = ctx.obj.pm
     logger = ctx.obj.logger
 
-    notes = router.read_notes()
-    if not notes:
-        typer.echo("No hay notas disponibles.")
-        sys.exit(1)
+    ranges = _parse_id_spec(note_ids)
+    note_id = _single_id(ranges, query)
+    if note_id is None:
+        notes = _select_notes(router, ranges, query)
+        _run_ai_batch(ctx, "resumir", notes, lambda content: {"content": content},
+                      lambda note_id, result: {"op": "create", "content": f"[Resumen de nota {note_id}]\n{result}"},
+                      f"Se van a resumir {len(notes)} nota(s), guardando cada resumen como nota nueva.",
+                      "resumir {ids} -y", concurrency, rpm, not no_cache, yes)
+        return
 
-    note = next((n for n in notes if n[0] == note_id), None)
+    note = router.get_note(note_id)
     if not note:
         typer.echo(f"No se encontró la nota con el ID {note_id}")
         sys.exit(1)
@@ -357,10 +1127,9 @@ def resumir(ctx: typer.Context, note_id: int):
     content = note[1]
     typer.echo(f"Resumiendo: {content[:50]}{'...' if len(content) > 50 else ''}")
     
-    result = pm.execute_prompt("resumir", content=content)
+    result = _stream_prompt(pm, logger, "\n[=== RESUMEN ===]", "resumir",
+                            use_cache=not no_cache, content=content)
     if result:
-        typer.echo("\n[=== RESUMEN ===]")
-        typer.echo(result)
         logger.info(f"Nota resumida: ID={note_id}")
 
         if typer.confirm("¿Desea guardar el resumen como una nueva nota?"):
@@ -375,18 +1144,28 @@ def resumir(ctx: typer.Context, note_id: int):
 
 @app.command("preguntar")
 @app.command("ask")
-def preguntar(ctx: typer.Context, note_id: int, question: str):
-    """Hace una pregunta sobre el contenido de una nota específica."""
+def preguntar(ctx: typer.Context,
+              note_id: Optional[int] = typer.Argument(None, help="ID de la nota (omitir con --all)"),
+              question: Optional[str] = typer.Argument(None, help="Pregunta sobre la nota"),
+              ask_all: Optional[str] = typer.Option(None, "--all", "-a", metavar="PREGUNTA",
+                                                    help="Preguntar sobre todas las notas (usa las más relevantes)"),
+              budget: Optional[int] = typer.Option(None, "--budget", min=100,
+                                                   help="Tokens de contexto para --all (default: [embeddings] context_tokens)"),
+              no_cache: bool = typer.Option(False, "--no-cache", help="Ignorar la cache y llamar siempre a la IA")):
+    """Hace una pregunta sobre una nota, o con --all sobre las notas más relevantes para la pregunta."""
     router = ctx.obj.router
-    pm = ctx.obj.pm
     logger = ctx.obj.logger
 
-    notes = router.read_notes()
-    if not notes:
-        typer.echo("No hay notas disponibles.")
-        sys.exit(1)
+    if ask_all is not None:
+        if note_id is not None or question is not None:
+            raise typer.BadParameter("Con --all la pregunta va como valor de la opción: preguntar --all \"...\"")
+        _preguntar_todas(ctx, ask_all, budget, no_cache)
+        return
+    if note_id is None or question is None:
+        raise typer.BadParameter("Faltan el ID de la nota y la pregunta (o usá --all \"pregunta\")")
 
-    note = next((n for n in notes if n[0] == note_id), None)
+    pm = ctx.obj.pm
+    note = router.get_note(note_id)
     if not note:
         typer.echo(f"No se encontró la nota con el ID {note_id}")
         sys.exit(1)
@@ -394,15 +1173,48 @@ def preguntar(ctx: typer.Context, note_id: int, question: str):
     content = note[1]
     typer.echo(f"Preguntando sobre nota {note_id}: '{question}'")
 
-    result = pm.execute_prompt("preguntar", content=content, question=question)
+    result = _stream_prompt(pm, logger, "\n[=== RESPUESTA ===]", "preguntar",
+                            use_cache=not no_cache, content=content, question=question)
     if result:
-        typer.echo("\n[=== RESPUESTA ===]")
-        typer.echo(result)
         logger.info(f"Pregunta procesada para nota ID={note_id}")
     else:
         typer.echo("Error: No se pudo procesar la pregunta.")
         logger.error(f"Falló pregunta para nota ID={note_id}")
 
+
+# Candidatos de la búsqueda semántica para armar el contexto de `preguntar --all`
+ASK_ALL_CANDIDATES = 50
+
+
+def _preguntar_todas(ctx: typer.Context, question: str, budget: Optional[int], no_cache: bool) -> None:
+    """`preguntar --all`: recupera las notas más parecidas a la pregunta y las usa de contexto."""
+    from backend.chunking import pack_notes
+
+    router = ctx.obj.router
+    logger = ctx.obj.logger
+
+    if not _sync_index(router):
+        sys.exit(1)
+    matches = router.semantic_search(question, limit=ASK_ALL_CANDIDATES)
+    if matches is None:
+        typer.echo("Error: No se pudo realizar la búsqueda.")
+        sys.exit(1)
+    if not matches:
+        typer.echo(f"No se encontraron notas relacionadas con: '{question}'")
+        return
+
+    budget = budget or router.embedding_settings()["context_tokens"]
+    content, used = pack_notes([(n[0], n[2]) for n in matches], budget)
+    typer.echo(f"Preguntando sobre {len(used)} nota(s) relevantes ({_format_id_spec(used)}): '{question}'")
+
+    result = _stream_prompt(ctx.obj.pm, logger, "\n[=== RESPUESTA ===]", "preguntar",
+                            use_cache=not no_cache, content=content, question=question)
+    if result:
+        logger.info(f"Pregunta procesada sobre las notas {_format_id_spec(used)}")
+    else:
+        typer.echo("Error: No se pudo procesar la pregunta.")
+        logger.error("Falló pregunta sobre todas las notas")
+
 # TODO: Feature -> Interfaz para que el usuario cree sus propios prompts para la IA.
 # TODO: Feature -> Comando para cambiar la base de datos activa desde CLI.
 # TODO: Agregar mas decoración al CLI: usando la libreria rich para generar contenido mas visual.
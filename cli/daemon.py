@@ -0,0 +1,350 @@
+import codecs
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SOCKET = "data/mnctl.sock"
+# La salida viaja en frames NDJSON a medida que se produce ({"stdout": ...}, {"stderr": ...} y
+# al final {"exit_code": ...}): memoria acotada en ambos lados aunque se exporten millones de notas.
+# El stdin de `batch` viaja igual hacia el daemon ({"stdin": ...} y al final {"stdin": null})
+FRAME_BYTES = 64 * 1024
+FLUSH_INTERVAL = 0.1  # Segundos máximos que un flush() retiene salida parcial (ej. barras de progreso)
+
+# Comandos que se ejecutan siempre en el proceso local: piden confirmaciones
+# interactivas o imprimen en streaming (no hay terminal del otro lado del
+# socket), o son el propio daemon.
+LOCAL_COMMANDS = {
+    "serve", "shell",
+    "mejorar", "enhance",
+    "traducir", "translate", "trans",
+    "resumir", "summarize", "sum",
+    "preguntar", "ask",
+}
+GLOBAL_OPTIONS_WITH_VALUE = {"--config", "-c", "--profile-dump"}
+# Comandos que leen stdin cuando su fuente es '-' o se omite (con sus opciones que llevan valor)
+STDIN_COMMANDS = {"batch": {"--chunk-size"}}
+
+
+def socket_path() -> str:
+    """Ruta del socket del daemon (sobrescribible con MNCTL_SOCKET)."""
+    return os.environ.get("MNCTL_SOCKET", DEFAULT_SOCKET)
+
+
+def _positionals(argv: List[str], options_with_value: set) -> List[str]:
+    """Argumentos posicionales, salteando las opciones (y el valor de las que lo llevan)."""
+    positionals, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in options_with_value:
+            skip = True
+        elif arg == "-" or not arg.startswith("-"):
+            positionals.append(arg)
+    return positionals
+
+
+def _command_name(argv: List[str]) -> Optional[str]:
+    """Primer argumento que no es una opción global (el subcomando)."""
+    positionals = _positionals(argv, GLOBAL_OPTIONS_WITH_VALUE)
+    return positionals[0] if positionals else None
+
+
+def reads_stdin(argv: List[str]) -> bool:
+    """True si el comando va a consumir stdin (ej. `mnctl batch < ops.ndjson`)."""
+    command = _command_name(argv)
+    if command not in STDIN_COMMANDS:
+        return False
+    source = _positionals(argv[argv.index(command) + 1:], STDIN_COMMANDS[command])
+    return not source or source[0] == "-"
+
+
+# Cliente liviano: se importa antes que typer, así que solo usa la stdlib
+def forward(argv: List[str]) -> Optional[int]:
+    """Reenvía el comando al daemon si hay uno escuchando.
+
+    Returns:
+        Optional[int]: código de salida del comando remoto, o None si hay que
+        ejecutarlo en el proceso local (no hay daemon, comando interactivo, etc).
+    """
+    if os.environ.get("MNCTL_NO_DAEMON") or not hasattr(socket, "AF_UNIX"):
+        return None
+    if any(arg in ("--help", "-h") for arg in argv) or _command_name(argv) in LOCAL_COMMANDS:
+        return None
+
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None  # Socket viejo de un daemon que ya no corre
+
+    # stdin solo se lee para los comandos que lo consumen: leerlo siempre bloquearía
+    # a cualquier cliente con un stdin abierto que no es terminal (cron, CI, etc.)
+    stdin = sys.stdin if sys.stdin is not None and reads_stdin(argv) else None
+    request = {"argv": argv, "cwd": os.getcwd(), "stdin": stdin is not None, "tty": sys.stdout.isatty()}
+
+    with sock, sock.makefile("rb") as frames:
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            if stdin is not None:
+                # En otro hilo: el daemon contesta mientras consume la entrada (ej. resultados por chunk)
+                threading.Thread(target=_send_stdin, args=(sock, stdin), daemon=True).start()
+            for line in frames:
+                frame = json.loads(line)
+                if "exit_code" in frame:
+                    return int(frame["exit_code"])
+                for name, stream in (("stdout", sys.stdout), ("stderr", sys.stderr)):
+                    if name in frame:
+                        stream.write(frame[name])
+                        stream.flush()
+        except BrokenPipeError:
+            # Se cerró la salida del cliente (ej. `| head`): al cerrar el socket el daemon corta el comando
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())  # Sin error extra al salir
+            return 1
+        except (OSError, ValueError) as e:
+            # El comando pudo haberse aplicado: no se reintenta en local
+            print(f"[mnctl]: Se perdió la conexión con el daemon ({e}).", file=sys.stderr)
+            return 1
+
+    print("[mnctl]: El daemon cerró la conexión sin terminar el comando.", file=sys.stderr)
+    return 1
+
+
+def _send_stdin(sock: socket.socket, stdin: Any) -> None:
+    """Manda stdin al daemon en frames a medida que llega (sin esperar a juntar un frame entero)."""
+    decoder = codecs.getincrementaldecoder(stdin.encoding or "utf-8")(errors="replace")
+    try:
+        while chunk := stdin.buffer.read1(FRAME_BYTES):
+            if text := decoder.decode(chunk):
+                sock.sendall(json.dumps({"stdin": text}).encode("utf-8") + b"\n")
+        if tail := decoder.decode(b"", final=True):
+            sock.sendall(json.dumps({"stdin": tail}).encode("utf-8") + b"\n")
+        sock.sendall(b'{"stdin": null}\n')
+    except (OSError, ValueError):
+        pass  # El daemon ya terminó el comando (o se cortó): el hilo principal lo reporta
+
+
+class _FrameReader(io.RawIOBase):
+    """stdin del comando: lee del socket los frames del cliente recién cuando el comando los consume."""
+
+    def __init__(self, rfile: Any) -> None:
+        super().__init__()
+        self.rfile = rfile
+        self._pending = b""
+        self._eof = False
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._pending and not self._eof:
+            try:
+                text = json.loads(self.rfile.readline() or "{}").get("stdin")
+            except (OSError, ValueError):
+                text = None  # El cliente se desconectó: fin de la entrada
+            if text is None:
+                self._eof = True
+            else:
+                self._pending = text.encode("utf-8")
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _FrameWriter:
+    """Envía la salida del comando al cliente en frames NDJSON (un buffer acotado por stream)."""
+
+    def __init__(self, wfile: Any) -> None:
+        self.wfile = wfile
+        self.broken = False
+
+
+    def send(self, frame: Dict[str, Any]) -> None:
+        if self.broken:
+            raise BrokenPipeError("el cliente cerró la conexión")
+        try:
+            self.wfile.write(json.dumps(frame).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        except OSError:
+            self.broken = True  # Ej. `mnctl exportar --all -o - | head`: se corta el comando
+            raise
+
+
+class _FramedStream(io.TextIOBase):
+    """stdout/stderr del comando: acumula hasta FRAME_BYTES o FLUSH_INTERVAL y manda un frame.
+
+    Responde `isatty()` como la terminal del cliente (colores).
+    """
+
+    def __init__(self, writer: _FrameWriter, name: str, tty: bool) -> None:
+        super().__init__()
+        self.writer = writer
+        self.name = name
+        self._tty = tty
+        self._chunks: List[str] = []
+        self._size = 0
+        self._sent = time.monotonic()
+
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+    def writable(self) -> bool:
+        return True
+
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            # Como StringIO: click prueba `write(b"")` para detectar streams binarios
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= FRAME_BYTES:
+            self.send()
+        return len(text)
+
+
+    def flush(self) -> None:
+        # click hace flush tras cada echo: mandar un frame por línea sería caro, así que se agrupa
+        if self._chunks and time.monotonic() - self._sent >= FLUSH_INTERVAL:
+            self.send()
+
+
+    def send(self) -> None:
+        if not self._chunks:
+            return
+        text = "".join(self._chunks)
+        self._chunks, self._size = [], 0
+        self._sent = time.monotonic()
+        self.writer.send({self.name: text})
+
+
+def execute(command: Any, request: Dict[str, Any], writer: _FrameWriter, rfile: Any = None) -> int:
+    """Ejecuta un comando de click en el cwd del cliente, enviándole la salida por `writer`.
+
+    Si el cliente manda su stdin, el comando lo lee de `rfile` a medida que lo consume.
+
+    Returns:
+        int: código de salida (ya enviado al cliente en el último frame, si sigue conectado)
+    """
+    import click
+
+    tty = bool(request.get("tty"))
+    stdout = _FramedStream(writer, "stdout", tty)
+    stderr = _FramedStream(writer, "stderr", tty)
+    saved = (sys.stdin, sys.stdout, sys.stderr, os.getcwd())
+    exit_code = 0
+
+    try:
+        os.chdir(request.get("cwd") or saved[3])
+        if request.get("stdin") and rfile is not None:
+            sys.stdin = io.TextIOWrapper(io.BufferedReader(_FrameReader(rfile)), encoding="utf-8")
+        else:
+            sys.stdin = io.StringIO("")
+        sys.stdout, sys.stderr = stdout, stderr
+        result = command.main(args=list(request.get("argv", [])), prog_name="mnctl", standalone_mode=False)
+        exit_code = result if isinstance(result, int) else 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if e.code is not None and not isinstance(e.code, int):
+            stderr.write(f"{e.code}\n")
+    except click.exceptions.Exit as e:
+        exit_code = e.exit_code
+    except click.ClickException as e:
+        e.show(file=stderr)
+        exit_code = e.exit_code
+    except click.Abort:
+        stderr.write("Aborted!\n")
+        exit_code = 1
+    except Exception as e:
+        stderr.write(f"Error interno del daemon: {e}\n")
+        exit_code = 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved[:3]
+        os.chdir(saved[3])
+
+    if not writer.broken:
+        try:
+            stdout.send()
+            stderr.send()
+            writer.send({"exit_code": exit_code})
+        except OSError:
+            pass
+    return exit_code
+
+
+class _Shutdown(BaseException):
+    """SIGTERM: atraviesa el manejo de errores de click y corta `serve_forever`."""
+
+
+def serve(command: Any, path: str, logger: Any) -> None:
+    """Atiende comandos por el socket Unix hasta recibir SIGINT/SIGTERM.
+
+    Es secuencial a propósito: la conexión SQLite y la redirección de
+    stdout/stderr son del proceso, así que un comando a la vez.
+    """
+    import signal
+    import socketserver
+
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise RuntimeError(f"Ya hay un daemon escuchando en '{path}'")
+        except OSError:
+            os.unlink(path)  # Socket viejo
+        finally:
+            probe.close()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            writer = _FrameWriter(self.wfile)
+            try:
+                request = json.loads(self.rfile.readline())
+            except ValueError as e:
+                try:
+                    writer.send({"stderr": f"Petición inválida: {e}\n"})
+                    writer.send({"exit_code": 2})
+                except OSError:
+                    pass
+                return
+            exit_code = execute(command, request, writer, self.rfile)
+            logger.debug("Daemon: %s -> exit=%s%s", request.get("argv"), exit_code,
+                         " (el cliente se desconectó)" if writer.broken else "")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # El socket nace con permisos 0600: con chmod después del bind habría una ventana con los del umask
+    umask = os.umask(0o077)
+    try:
+        server = socketserver.UnixStreamServer(path, Handler)
+    finally:
+        os.umask(umask)
+    os.chmod(path, 0o600)
+
+    def stop(signum, frame):
+        raise _Shutdown()
+
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"Daemon escuchando en {path} (pid={os.getpid()})")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, _Shutdown):
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        logger.info("Daemon detenido")
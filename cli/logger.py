@@ -1,7 +1,32 @@
+import atexit
 import logging
 import logging.handlers
+import queue
+import threading
 
 from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+# Nivel por defecto de los logs (clave `level` de la sección [logger] de config.toml)
+DEFAULT_LEVEL = "info"
+LEVELS = {
+    "debug":    logging.DEBUG,
+    "info":     logging.INFO,
+    "warning":  logging.WARNING,
+    "error":    logging.ERROR,
+    "critical": logging.CRITICAL,
+}
+
+
+def parse_level(level: Union[str, int]) -> int:
+    """Convierte 'debug'/'info'/... (o un nivel numérico) en un nivel de logging. ValueError si no existe."""
+    if isinstance(level, int):
+        return level
+    try:
+        return LEVELS[level.strip().lower()]
+    except (AttributeError, KeyError):
+        raise ValueError(f"Nivel de log inválido: {level!r}. Opciones: {', '.join(LEVELS)}")
+
 
 class ColorFormatter(logging.Formatter):
     """Formater con ANSI Colors"""
@@ -21,9 +46,15 @@ class ColorFormatter(logging.Formatter):
     }
 
 
+    def __init__(self) -> None:
+        super().__init__(self.log_format)
+        # Un Formatter por nivel, creado una sola vez (no uno nuevo por registro)
+        self._formatters = {level: logging.Formatter(fmt) for level, fmt in self.FORMATS.items()}
+
+
     def format(self, record):
-        fmt = self.FORMATS.get(record.levelno)
-        return logging.Formatter(fmt).format(record)
+        formatter = self._formatters.get(record.levelno)
+        return formatter.format(record) if formatter else super().format(record)
 
 
 class PlainFormatter(logging.Formatter):
@@ -32,33 +63,136 @@ class PlainFormatter(logging.Formatter):
     log_format = "[%(asctime)s][%(name)s][%(levelname)s] %(message)s (%(filename)s:%(lineno)d)"
 
 
-    def format(self, record):
-        return logging.Formatter(self.log_format).format(record)
+    def __init__(self) -> None:
+        super().__init__(self.log_format)
+
+
+# Pipeline compartido: los loggers solo encolan registros y un único hilo
+# escritor los formatea y los escribe (archivos rotativos y/o terminal).
+class _Dispatcher(logging.Handler):
+    """Handler del hilo escritor: reparte cada registro a los destinos de su logger."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.routes: Dict[str, Tuple[logging.Handler, ...]] = {}
+
+
+    def handle(self, record):
+        for handler in self.routes.get(record.name, ()):
+            handler.handle(record)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Encola el registro con el mensaje ya armado: el formato final (fecha, colores) se aplica en el hilo escritor."""
+
+    def prepare(self, record):
+        # El mensaje (%-style) se resuelve acá, como en QueueHandler: los argumentos
+        # mutables se verían con su valor al momento de escribir, no al de loguear
+        record.msg = record.getMessage()
+        record.args = None
+        # El traceback también: referencia frames que no sobreviven a la llamada
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_dispatcher = _Dispatcher()
+_traceback_formatter = logging.Formatter()
+_listener: Optional[logging.handlers.QueueListener] = None
+_file_handlers: Dict[Tuple, logging.Handler] = {}
+_stream_handler: Optional[logging.Handler] = None
+_lock = threading.Lock()
+
+
+def _file_handler(log_file: str, formatter: Optional[logging.Formatter] = None) -> logging.Handler:
+    """Handler rotativo por archivo y formato, compartido por los loggers que escriben igual en el mismo."""
+    path = str(Path(log_file).resolve())
+    # Por formato y no por instancia: cada comando crea su Formatter (ej. el de trazas)
+    style = None if formatter is None else (type(formatter), formatter._fmt, formatter.datefmt)
+    key = (path, style)
+    if key not in _file_handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            filename=path,
+            encoding='utf-8',
+            maxBytes=32*1024*1024,
+            backupCount=5
+        )
+        handler.setFormatter(formatter or PlainFormatter())
+        _file_handlers[key] = handler
+    return _file_handlers[key]
+
+
+def _close_unused_handlers() -> None:
+    """Cierra los handlers de archivo que ya no usa ningún logger (llamar con `_lock` tomado)."""
+    used = {handler for targets in _dispatcher.routes.values() for handler in targets}
+    for key in [key for key, handler in _file_handlers.items() if handler not in used]:
+        _file_handlers.pop(key).close()
+
+
+def _terminal_handler() -> logging.Handler:
+    global _stream_handler
+    if _stream_handler is None:
+        _stream_handler = logging.StreamHandler()
+        _stream_handler.setFormatter(ColorFormatter())
+    return _stream_handler
+
+
+def shutdown() -> None:
+    """Escribe los registros pendientes y detiene el hilo escritor (se llama al salir)."""
+    global _listener, _stream_handler
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in _file_handlers.values():
+            handler.close()
+        _file_handlers.clear()
+        _stream_handler = None
+
+
+# Registrado al importar: corre después de los atexit de quienes loguean al cerrar (ej. Router.close)
+atexit.register(shutdown)
 
 
 class Logger:
-    """Minimal Logger exportable con file handling y streaming opcional"""
+    """Minimal Logger exportable con file handling y streaming opcional.
 
-    def __init__(self, logger_name: str, log_file: str = "latest.log", stream: bool = False, level: int = logging.DEBUG) -> None:
+    La escritura ocurre en un hilo compartido (QueueListener): loguear solo
+    encola el registro, así el archivo y la terminal no frenan las operaciones.
+    """
+
+    def __init__(self, logger_name: str, log_file: str = "latest.log", stream: bool = False, level: int = logging.DEBUG,
+                 formatter: Optional[logging.Formatter] = None) -> None:
+        global _listener
         Path(log_file).parent.mkdir(parents=True, exist_ok=True)
         self._logger = logging.getLogger(logger_name)
         self._logger.setLevel(level)
         self._logger.propagate = False
         self._logger.handlers.clear()
 
-        fh = logging.handlers.RotatingFileHandler(
-            filename=log_file,
-            encoding='utf-8',
-            maxBytes=32*1024*1024,
-            backupCount=5
-        )
-        fh.setFormatter(PlainFormatter())
-        self._logger.addHandler(fh)
+        with _lock:
+            targets = [_file_handler(log_file, formatter)]
+            if stream:
+                targets.append(_terminal_handler())
+            previous = _dispatcher.routes.get(logger_name, ())
+            repointed = bool(set(previous) - set(targets))  # Ej. cambio de config en `serve`
+            if repointed and _listener is not None:
+                # Se detiene el hilo escritor: así lo ya encolado va a los destinos anteriores
+                _listener.stop()
+                _listener = None
+            _dispatcher.routes[logger_name] = tuple(targets)
+            if repointed:
+                _close_unused_handlers()
+
+            if _listener is None:
+                _listener = logging.handlers.QueueListener(_queue, _dispatcher)
+                _listener.start()
 
-        if stream:
-            sh = logging.StreamHandler()
-            sh.setFormatter(ColorFormatter())
-            self._logger.addHandler(sh)
+        self._logger.addHandler(_QueueHandler(_queue))
 
 
     def get(self) -> logging.Logger:
@@ -66,7 +200,7 @@ class Logger:
 
 
 if __name__ == "__main__":
-    logger = Logger(log_file="data/latest.log", stream=True).get()
+    logger = Logger("Test", log_file="data/latest.log", stream=True).get()
     logger.info("Esto es informacion")
     logger.debug("El logger funciona bien")
     logger.warning("Se van a ejecutar dos simulacros!")
@@ -1,6 +1,10 @@
 # Esta es la version para Windows del Wrapper.
+import sys
+import time
 from sys import argv, exit
 
+_START = time.perf_counter()  # Para el span de arranque de --profile
+
 def custom_help():
     from rich.table import Table
     from rich.console import Console
@@ -27,8 +31,13 @@ def custom_help():
     commands.add_row("eliminar",  "[red]->[default]",   "Eliminar nota vía ID ")
     commands.add_row("listar",    "[red]->[default]",   "Listar notas")
     commands.add_row("buscar",    "[red]->[default]",   "Buscar nota vía texto")
+    commands.add_row("indexar",   "[red]->[default]",   "Indexar notas (búsqueda semántica)")
     commands.add_row("exportar",  "[red]->[default]",   "Exportar notas")
     commands.add_row("importar",  "[red]->[default]",   "Importar notas")
+    commands.add_row("batch",     "[red]->[default]",   "Aplicar operaciones NDJSON")
+    commands.add_row("compact",   "[red]->[default]",   "Comprimir notas y reducir la base")
+    commands.add_row("serve",     "[red]->[default]",   "Iniciar daemon residente")
+    commands.add_row("shell",     "[red]->[default]",   "Shell interactivo")
     
     ai_commands = Table(box=box.SIMPLE_HEAVY)
     ai_commands.add_column("[bright_magenta]+Extra IA ", style="bold green1")
@@ -38,6 +47,8 @@ def custom_help():
     ai_commands.add_row("resumir",   "[red]->[default]",   "Resumir nota vía ID")
     ai_commands.add_row("preguntar", "[red]->[default]",   "Preguntar sobre nota ")
     ai_commands.add_row("traducir",  "[red]->[default]",   "Traducir nota vía ID")
+    ai_commands.add_row("cache",     "[red]->[default]",   "Estado de la cache IA")
+    ai_commands.add_row("ai-stats",  "[red]->[default]",   "Latencia y tokens de la IA")
 
     console.print(commands, ai_commands)
     console.print("'[bold yellow]mnctl <[green]comando[/green]> --help[/bold yellow]' para mejor ayuda.\n")
@@ -48,6 +59,29 @@ if not args or args[0] in ["--help", "-h"]:
     custom_help()
     exit(0)
 
+def command_name(args):
+    """Primer argumento que no es una opción global (ni el valor de una)."""
+    args = iter(args)
+    for arg in args:
+        if arg in ("--config", "-c", "--profile-dump"):
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+# HACK: Typer importa rich (~200 ms) solo para formatear ayudas y errores. En los comandos
+# de una sola ejecución se oculta, así typer usa el formato plano de click (Mejora de
+# Rendimiento). `serve` y `shell` son procesos residentes: conservan rich
+if not any(arg in ("--help", "-h") for arg in args) and command_name(args) not in ("serve", "shell"):
+    sys.modules.setdefault("rich", None)
+
 if __name__ == "__main__":
-    from cli import app
+    # Si hay un daemon (`mnctl serve`) escuchando, se le reenvía el comando
+    from daemon import forward
+    code = forward(args)
+    if code is not None:
+        exit(code)
+
+    from cli import app, tracing
+    tracing.process_start = _START
     app()
\ No newline at end of file
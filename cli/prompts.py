@@ -1,14 +1,22 @@
+import asyncio
+import contextlib
 import json
+import logging
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, Tuple, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Tuple, Optional
 
 from logger import Logger
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from backend.gemini import generate
+from backend.cache import ResponseCache, cache_key
+from backend.chunking import estimate_tokens, group_parts, join_parts, split_chunks
+from backend.providers import GeminiProvider, Provider
+from backend.usage import UsageLedger
+from backend.tracing import span, traced
 
 DEFAULT_PROMPTS = {
     "mejorar": {
@@ -19,7 +27,13 @@ DEFAULT_PROMPTS = {
     "resumir": {
         "system": "Eres un experto en síntesis. Crea resúmenes concisos y precisos.",
         "template": "Resume este texto en máximo 3 párrafos:\n\n{content}",
-        "max_tokens": 512
+        "max_tokens": 512,
+        "chunking": {
+            "chunk_tokens": 3000,
+            "overlap_tokens": 200,
+            "parallel": 4,
+            "reduce_template": "Estos son resúmenes parciales de fragmentos consecutivos de un mismo documento. Combínalos en un único resumen de máximo 3 párrafos, sin repetir información:\n\n{content}"
+        }
     },
     "traducir": {
         "system": "Eres un traductor profesional. Traduce con precisión manteniendo el contexto.",
@@ -29,7 +43,14 @@ DEFAULT_PROMPTS = {
     "preguntar": {
         "system": "Eres un asistente analítico. Responde basándote únicamente en el contenido proporcionado.",
         "template": "Basándote en este texto:\n\n{content}\n\nResponde: {question}",
-        "max_tokens": 512
+        "max_tokens": 512,
+        "chunking": {
+            "chunk_tokens": 3000,
+            "overlap_tokens": 200,
+            "parallel": 4,
+            "map_template": "Basándote en este fragmento de un documento:\n\n{content}\n\nResponde: {question}\nSi el fragmento no contiene información para responder, responde solo: SIN DATOS.",
+            "reduce_template": "Estas son respuestas parciales a la pregunta \"{question}\", obtenidas de fragmentos de un mismo documento (ignora las que dicen SIN DATOS):\n\n{content}\n\nCombínalas en una única respuesta."
+        }
     },
     "corregir": {
         "system": "Eres un corrector ortográfico y gramatical experto. Corrige errores sin cambiar el estilo.",
@@ -39,15 +60,55 @@ DEFAULT_PROMPTS = {
 }
 
 
+# Defaults de la sección "chunking" de un prompt (map-reduce sobre contenidos largos)
+DEFAULT_CHUNKING = {
+    "field": "content",       # variable del template que se fragmenta
+    "chunk_tokens": 3000,     # tamaño de fragmento (y umbral para fragmentar)
+    "overlap_tokens": 200,    # solapamiento entre fragmentos consecutivos
+    "parallel": 4,            # fragmentos procesados en paralelo
+}
+
+
+class RateLimiter:
+    """Acota las llamadas al proveedor: como máximo `concurrency` en vuelo y `rpm` inicios por minuto (0 = sin límite)."""
+
+    def __init__(self, rpm: int = 0, concurrency: int = 0):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = 0.0
+        self._slots = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Una llamada en vuelo: espera un lugar libre y su turno en el rate limit."""
+        async with self._slots or contextlib.nullcontext():
+            await self.wait()
+            yield
+
+
 class PromptManager:
     """Gestor de prompts minimalista con logging disciplinado"""
 
-    def __init__(self, prompts_file: str = "data/prompts.json", log_file: str = "data/logs/prompts.log", log_stream: bool = False):
+    def __init__(self, prompts_file: str = "data/prompts.json", log_file: str = "data/logs/prompts.log", log_stream: bool = False,
+                 cache: Optional[ResponseCache] = None, provider: Optional[Provider] = None, log_level: int = logging.DEBUG,
+                 ledger: Optional[UsageLedger] = None):
         self.prompts_file = Path(prompts_file)
-        self.logger = Logger("PromptManager", log_file=log_file, stream=log_stream).get()
+        self.logger = Logger("PromptManager", log_file=log_file, stream=log_stream, level=log_level).get()
         self.prompts, self.file_exists = self.load_prompts()
+        self.cache = cache
+        self.ledger = ledger
+        self.provider = provider or GeminiProvider()
         
-        self.logger.info(f"PromptManager inicializado: file={prompts_file}, exists={self.file_exists}")
+        self.logger.info(f"PromptManager inicializado: file={prompts_file}, exists={self.file_exists}, "
+                         f"provider={self.provider.name}, cache={cache.db_file if cache else None}")
 
 
     def load_prompts(self, prompts_filepath: Optional[str] = None) -> Tuple[Dict[str, Dict[str, Any]], bool]:
@@ -57,7 +118,7 @@ class PromptManager:
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 prompts = json.load(f)
-            self.logger.debug(f"Prompts cargados desde {path}: {len(prompts)} prompts")
+            self.logger.debug("Prompts cargados desde %s: %d prompts", path, len(prompts))
             return (prompts, True)
         except FileNotFoundError:
             self.logger.warning(f"Archivo de prompts no encontrado: {path}, usando defaults")
@@ -82,7 +143,7 @@ class PromptManager:
     def list_prompts(self) -> list[str]:
         """Lista nombres de prompts disponibles"""
         prompts = list(self.prompts.keys())
-        self.logger.debug(f"Listando {len(prompts)} prompts disponibles")
+        self.logger.debug("Listando %d prompts disponibles", len(prompts))
         return prompts
 
 
@@ -90,7 +151,7 @@ class PromptManager:
         """Obtiene configuración de prompt por nombre"""
         prompt = self.prompts.get(name)
         if prompt:
-            self.logger.debug(f"Prompt '{name}' encontrado")
+            self.logger.debug("Prompt '%s' encontrado", name)
         else:
             self.logger.warning(f"Prompt '{name}' no existe")
         return prompt
@@ -136,18 +197,52 @@ class PromptManager:
             return False
 
 
-    def execute_prompt(self, name: str, **kwargs) -> Optional[str]:
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Lectura de la cache: un fallo se loguea y cuenta como miss (no corta la llamada)."""
+        try:
+            with span("cache.get") as current:
+                cached = self.cache.get(key)
+                current.set(hit=cached is not None)
+                return cached
+        except Exception as e:
+            self.logger.warning(f"Cache no disponible: {e}")
+            return None
+
+
+    def _cache_put(self, key: str, response: str, **meta: str) -> None:
+        try:
+            self.cache.put(key, response, **meta)
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar la respuesta en la cache: {e}")
+
+
+    def _record(self, name: str, model: str, started: float, usage: Optional[Dict[str, int]] = None,
+                max_tokens: Optional[int] = None, cached: bool = False, stream: bool = False,
+                error: Optional[str] = None) -> None:
+        """Registra la llamada en el ledger de uso; un fallo se loguea y no corta la ejecución."""
+        if self.ledger is None:
+            return
+        try:
+            self.ledger.record(name, self.provider.name, model, time.perf_counter() - started, usage=usage,
+                               max_tokens=max_tokens, cached=cached, stream=stream, error=error)
+        except Exception as e:
+            self.logger.warning(f"No se pudo registrar el uso de la IA: {e}")
+
+
+    @traced("prompt.execute")
+    def execute_prompt(self, name: str, use_cache: bool = True, **kwargs) -> Optional[str]:
         """
         Ejecuta prompt con parámetros y logging completo
         
         Args:
             name: Nombre del prompt
+            use_cache: Consultar/guardar la respuesta en la cache (si hay una configurada)
             **kwargs: Variables para el template
             
         Returns:
-            Respuesta de Gemini o None si falla
+            Respuesta del proveedor de IA (o de la cache) o None si falla
         """
-        self.logger.debug(f"Ejecutando prompt '{name}' con args: {list(kwargs.keys())}")
+        self.logger.debug("Ejecutando prompt '%s' con args: %s", name, list(kwargs))
         
         prompt_config = self.get_prompt(name)
         if not prompt_config:
@@ -155,25 +250,55 @@ class PromptManager:
             return None
 
         try:
-            # Formatear template
-            formatted_prompt = prompt_config["template"].format(**kwargs)
-            content_preview = formatted_prompt[:100] + "..." if len(formatted_prompt) > 100 else formatted_prompt
-            self.logger.debug(f"Prompt formateado: {content_preview}")
-
-            # Llamar a Gemini
-            self.logger.info(f"Llamando a Gemini para prompt '{name}' (max_tokens={prompt_config['max_tokens']})")
-            result = generate(
-                prompt=formatted_prompt,
-                sysprompt=prompt_config["system"],
-                max_tokens=prompt_config["max_tokens"]
-            )
-            
+            # Formatear template (si el contenido es largo: map-reduce por fragmentos)
+            chunking = self._chunking(prompt_config, kwargs)
+            if chunking:
+                formatted_prompt = asyncio.run(self._map_reduce_prompt(name, prompt_config, kwargs, chunking, use_cache))
+            else:
+                formatted_prompt = prompt_config["template"].format(**kwargs)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                content_preview = formatted_prompt[:100] + "..." if len(formatted_prompt) > 100 else formatted_prompt
+                self.logger.debug("Prompt formateado: %s", content_preview)
+
+            model = self._model(prompt_config)
+            max_tokens = prompt_config["max_tokens"]
+            cache = self.cache if use_cache else None
+            if cache:
+                started = time.perf_counter()
+                key = cache_key(formatted_prompt, prompt_config["system"], model, max_tokens)
+                cached = self._cache_get(key)
+                if cached is not None:
+                    self.logger.info(f"Prompt '{name}' servido desde la cache (hits={cache.hits}, misses={cache.misses})")
+                    self._record(name, model, started, max_tokens=max_tokens, cached=True)
+                    return cached
+
+            # Llamar al proveedor de IA
+            self.logger.info(f"Llamando a {self.provider.name} para prompt '{name}' (max_tokens={max_tokens})")
+            usage: Dict[str, int] = {}
+            started = time.perf_counter()
+            try:
+                with span("llm.call", provider=self.provider.name, model=model, prompt=name):
+                    result = self.provider.generate(
+                        prompt=formatted_prompt,
+                        sysprompt=prompt_config["system"],
+                        max_tokens=max_tokens,
+                        model=model,
+                        usage=usage
+                    )
+            except Exception as e:
+                self._record(name, model, started, usage, max_tokens, error=str(e) or type(e).__name__)
+                raise
+            self._record(name, model, started, usage, max_tokens, error=None if result else "resultado vacío")
+
             if result:
-                result_preview = result[:100] + "..." if len(result) > 100 else result
                 self.logger.info(f"Prompt '{name}' ejecutado exitosamente: {len(result)} chars")
-                self.logger.debug(f"Resultado: {result_preview}")
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    result_preview = result[:100] + "..." if len(result) > 100 else result
+                    self.logger.debug("Resultado: %s", result_preview)
+                if cache:
+                    self._cache_put(key, result, prompt=name, model=model)
             else:
-                self.logger.error(f"Gemini devolvió resultado vacío para prompt '{name}'")
+                self.logger.error(f"{self.provider.name} devolvió resultado vacío para prompt '{name}'")
                 
             return result
             
@@ -185,6 +310,236 @@ class PromptManager:
             return None
 
 
+    def _render(self, name: str, kwargs: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Prepara un prompt: (prompt formateado, config del prompt, chunking).
+
+        Si el contenido requiere map-reduce, el prompt es None y `chunking` trae
+        su configuración. ValueError si el prompt no existe o falta una variable.
+        """
+        prompt_config = self.get_prompt(name)
+        if not prompt_config:
+            raise ValueError(f"Prompt '{name}' no existe")
+        chunking = self._chunking(prompt_config, kwargs)
+        if chunking:
+            return None, prompt_config, chunking
+        return self._format(prompt_config["template"], kwargs), prompt_config, None
+
+
+    def _model(self, prompt_config: Dict[str, Any]) -> str:
+        return prompt_config.get("model", self.provider.default_model)
+
+
+    @staticmethod
+    def _format(template: str, variables: Dict[str, Any]) -> str:
+        try:
+            return template.format(**variables)
+        except KeyError as e:
+            raise ValueError(f"Variable faltante en template: {e}")
+
+
+    def _chunking(self, prompt_config: Dict[str, Any], kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Config de map-reduce si el prompt la define y el contenido supera `chunk_tokens`, si no None."""
+        if not prompt_config.get("chunking"):
+            return None
+        chunking = {**DEFAULT_CHUNKING, **prompt_config["chunking"]}
+        content = kwargs.get(chunking["field"])
+        if not isinstance(content, str) or estimate_tokens(content) <= chunking["chunk_tokens"]:
+            return None
+        if not chunking.get("reduce_template"):
+            raise ValueError("Falta 'reduce_template' en la sección 'chunking' del prompt")
+        return chunking
+
+
+    async def _acall(self, name: str, formatted_prompt: str, prompt_config: Dict[str, Any],
+                     use_cache: bool = True, limiter: Optional[RateLimiter] = None) -> str:
+        """Una llamada async al proveedor, pasando por la cache. Propaga los errores."""
+        model = self._model(prompt_config)
+        max_tokens = prompt_config["max_tokens"]
+        cache = self.cache if use_cache else None
+        if cache:
+            started = time.perf_counter()
+            key = cache_key(formatted_prompt, prompt_config["system"], model, max_tokens)
+            cached = self._cache_get(key)
+            if cached is not None:
+                self._record(name, model, started, max_tokens=max_tokens, cached=True)
+                return cached
+
+        # La latencia se mide después del rate limiter: es la del proveedor, no la espera
+        usage: Dict[str, int] = {}
+        started = time.perf_counter()
+        try:
+            async with limiter.slot() if limiter else contextlib.nullcontext():
+                started = time.perf_counter()
+                with span("llm.call", provider=self.provider.name, model=model, prompt=name):
+                    result = await self.provider.agenerate(
+                        prompt=formatted_prompt,
+                        sysprompt=prompt_config["system"],
+                        max_tokens=max_tokens,
+                        model=model,
+                        usage=usage
+                    )
+        except Exception as e:
+            self._record(name, model, started, usage, max_tokens, error=str(e) or type(e).__name__)
+            raise
+        self._record(name, model, started, usage, max_tokens, error=None if result else "resultado vacío")
+        if not result:
+            raise ValueError(f"{self.provider.name} devolvió un resultado vacío")
+        if cache:
+            self._cache_put(key, result, prompt=name, model=model)
+        return result
+
+
+    @traced("prompt.map_reduce")
+    async def _map_reduce_prompt(self, name: str, prompt_config: Dict[str, Any], kwargs: Dict[str, Any],
+                                 chunking: Dict[str, Any], use_cache: bool = True,
+                                 limiter: Optional[RateLimiter] = None) -> str:
+        """
+        Fase map (y reduces intermedios) de un contenido largo; devuelve el prompt del reduce final
+        
+        Cada fragmento se procesa con `map_template` (default: el template del
+        prompt), hasta `parallel` a la vez (y dentro del `limiter` compartido con
+        los demás ítems, si lo hay). Si los resultados parciales juntos
+        todavía superan `chunk_tokens`, se reducen por grupos (reduce jerárquico).
+        El reduce final lo ejecuta el llamador, así puede hacerlo en streaming.
+        """
+        field, limit = chunking["field"], chunking["chunk_tokens"]
+        map_template = chunking.get("map_template") or prompt_config["template"]
+        reduce_template = chunking["reduce_template"]
+        semaphore = asyncio.Semaphore(max(1, chunking["parallel"]))
+
+        async def run(template: str, content: str) -> str:
+            formatted_prompt = self._format(template, {**kwargs, field: content})
+            async with semaphore:
+                return await self._acall(name, formatted_prompt, prompt_config, use_cache, limiter)
+
+        chunks = split_chunks(kwargs[field], limit, chunking["overlap_tokens"])
+        self.logger.info(f"Prompt '{name}': map-reduce sobre {len(chunks)} fragmentos (parallel={chunking['parallel']})")
+        partials = await asyncio.gather(*(run(map_template, chunk) for chunk in chunks))
+
+        while len(partials) > 1 and estimate_tokens(join_parts(partials)) > limit:
+            groups = group_parts(partials, limit)
+            self.logger.debug("Prompt '%s': reduce intermedio de %d parciales en %d grupos", name, len(partials), len(groups))
+            partials = await asyncio.gather(*(run(reduce_template, join_parts(group)) for group in groups))
+
+        return self._format(reduce_template, {**kwargs, field: join_parts(partials)})
+
+
+    def execute_prompt_stream(self, name: str, use_cache: bool = True, **kwargs) -> Iterator[str]:
+        """
+        Ejecuta prompt devolviendo la respuesta por fragmentos, a medida que llega
+        
+        Un hit de cache se entrega en un único fragmento; la respuesta completa
+        se guarda en la cache al terminar. A diferencia de `execute_prompt`,
+        propaga los errores (el llamador ya pudo haber mostrado parte del texto).
+        
+        Args:
+            name: Nombre del prompt
+            use_cache: Consultar/guardar la respuesta en la cache (si hay una configurada)
+            **kwargs: Variables para el template
+            
+        Yields:
+            Fragmentos de texto de la respuesta
+        """
+        formatted_prompt, prompt_config, chunking = self._render(name, kwargs)
+        if chunking:
+            # Los fragmentos se procesan en paralelo; se transmite el reduce final
+            formatted_prompt = asyncio.run(self._map_reduce_prompt(name, prompt_config, kwargs, chunking, use_cache))
+
+        model = self._model(prompt_config)
+        max_tokens = prompt_config["max_tokens"]
+        cache = self.cache if use_cache else None
+        if cache:
+            started = time.perf_counter()
+            key = cache_key(formatted_prompt, prompt_config["system"], model, max_tokens)
+            cached = self._cache_get(key)
+            if cached is not None:
+                self.logger.info(f"Prompt '{name}' servido desde la cache (hits={cache.hits}, misses={cache.misses})")
+                self._record(name, model, started, max_tokens=max_tokens, cached=True, stream=True)
+                yield cached
+                return
+
+        self.logger.info(f"Llamando a {self.provider.name} (streaming) para prompt '{name}' (max_tokens={max_tokens})")
+        chunks = []
+        usage: Dict[str, int] = {}
+        started = time.perf_counter()
+        try:
+            with span("llm.stream", detached=True, provider=self.provider.name, model=model, prompt=name) as current:
+                for chunk in self.provider.generate_stream(
+                    prompt=formatted_prompt,
+                    sysprompt=prompt_config["system"],
+                    max_tokens=max_tokens,
+                    model=model,
+                    usage=usage
+                ):
+                    chunks.append(chunk)
+                    yield chunk
+                current.set(chunks=len(chunks))
+        except Exception as e:
+            self._record(name, model, started, usage, max_tokens, stream=True, error=str(e) or type(e).__name__)
+            raise
+        self._record(name, model, started, usage, max_tokens, stream=True,
+                     error=None if chunks else "resultado vacío")
+
+        result = "".join(chunks)
+        if not result:
+            self.logger.error(f"{self.provider.name} devolvió resultado vacío para prompt '{name}'")
+            raise ValueError(f"{self.provider.name} devolvió un resultado vacío")
+        self.logger.info(f"Prompt '{name}' ejecutado exitosamente (streaming): {len(result)} chars en {len(chunks)} fragmentos")
+        if cache:
+            self._cache_put(key, result, prompt=name, model=model)
+
+
+    async def aexecute_prompt(self, name: str, use_cache: bool = True,
+                              limiter: Optional[RateLimiter] = None, **kwargs) -> str:
+        """Variante asíncrona de `execute_prompt` (`agenerate` del proveedor).
+
+        A diferencia de `execute_prompt`, propaga los errores para poder
+        reportarlos por ítem. El `limiter` solo frena las llamadas reales (no los hits de cache),
+        también las de la fase map.
+        """
+        formatted_prompt, prompt_config, chunking = self._render(name, kwargs)
+        if chunking:
+            formatted_prompt = await self._map_reduce_prompt(name, prompt_config, kwargs, chunking, use_cache, limiter)
+        return await self._acall(name, formatted_prompt, prompt_config, use_cache, limiter)
+
+
+    async def execute_many(self, name: str, items: Iterable[Tuple[Any, Dict[str, Any]]],
+                           concurrency: int = 8, rpm: int = 0,
+                           use_cache: bool = True) -> AsyncIterator[Tuple[Any, Optional[str], Optional[str]]]:
+        """
+        Ejecuta un prompt sobre muchos ítems en paralelo, con concurrencia acotada y rate limit
+        
+        Args:
+            name: Nombre del prompt
+            items: Pares (clave, variables del template)
+            concurrency: Máximo de llamadas en vuelo
+            rpm: Máximo de llamadas por minuto (0 = sin límite)
+            use_cache: Consultar/guardar las respuestas en la cache
+            
+        Yields:
+            (clave, resultado, error) a medida que termina cada ítem
+        """
+        # Un único límite por llamada al proveedor (no por ítem): los fragmentos de un
+        # map-reduce compiten con los demás ítems, así nunca hay más de `concurrency` en vuelo
+        limiter = RateLimiter(rpm, max(1, concurrency))
+
+        async def run(key: Any, kwargs: Dict[str, Any]) -> Tuple[Any, Optional[str], Optional[str]]:
+            try:
+                return key, await self.aexecute_prompt(name, use_cache, limiter, **kwargs), None
+            except Exception as e:
+                self.logger.error(f"Error ejecutando prompt '{name}' para {key}: {e}")
+                return key, None, str(e) or type(e).__name__
+
+        tasks = [asyncio.ensure_future(run(key, kwargs)) for key, kwargs in items]
+        self.logger.info(f"Ejecutando prompt '{name}' sobre {len(tasks)} ítems (concurrency={concurrency}, rpm={rpm})")
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
 def test_prompts():
     """Test básico CRUD con logging"""
     print("[PROMPT MANAGER TEST]")
@@ -1,14 +1,26 @@
 import os
 import sys
+import atexit
 import tomllib
 from pathlib import Path
-from typing import Dict, Any, Optional, Union, List, Tuple
+from typing import Dict, Any, Callable, Iterable, Iterator, Optional, Union, List, Tuple
 
-from logger import Logger
+from logger import Logger, DEFAULT_LEVEL, parse_level
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from backend.handler import notes_handler
+from backend.database import (
+    ConnectionManager,
+    DEFAULT_COMPRESSION,
+    DEFAULT_PRAGMAS,
+    Compression,
+    compression_policy,
+    data_version
+)
+from backend.notecache import DEFAULT_NOTE_CACHE, NoteCache
+from backend.cache import DEFAULT_CACHE
+from backend.tracing import traced
 
 DEFAULT_PATHS = {
     "config": Path("data/config.toml"),
@@ -17,6 +29,29 @@ DEFAULT_PATHS = {
     "prompts.log": Path("data/log/prompts.log"),
     "router.log": Path("data/log/router.log"),
     "cli.log": Path("data/log/cli.log"),
+    "trace.log": Path("data/log/trace.log"),
+    "history": Path("data/.mnctl_history"),
+}
+
+# Ejecución de IA sobre muchas notas (sección [ai] de config.toml)
+DEFAULT_AI = {
+    "provider": "gemini",   # gemini | local (determinístico, para benchmarks/CI)
+    "concurrency": 8,   # llamadas en vuelo
+    "rpm": 60,          # llamadas por minuto (0 = sin límite)
+}
+
+# Registro de uso de la IA para `mnctl ai-stats` (sección [usage] de config.toml)
+DEFAULT_USAGE = {
+    "enabled": True,    # registrar cada llamada (latencia, tokens, aciertos de cache)
+}
+
+# Búsqueda semántica y `preguntar --all` (sección [embeddings] de config.toml)
+DEFAULT_EMBEDDINGS = {
+    "embedder": "hashing",      # hashing (local, offline) | gemini
+    "dim": 512,                 # dimensión del embedder local
+    "model": "",                # modelo de gemini ("" = el default)
+    "batch_size": 256,          # notas por lote al indexar
+    "context_tokens": 3000,     # presupuesto de contexto de `preguntar --all`
 }
 
 
@@ -35,11 +70,26 @@ class Router:
         self.router_log = self.config.get("logger", {}).get("router", str(DEFAULT_PATHS["router.log"]))
         self.prompts_log = self.config.get("logger", {}).get("prompts", str(DEFAULT_PATHS["prompts.log"]))
         self.cli_log = self.config.get("logger", {}).get("cli", str(DEFAULT_PATHS["cli.log"]))
+        self.trace_log = self.config.get("logger", {}).get("trace", str(DEFAULT_PATHS["trace.log"]))
+        self.tracing = self.config.get("logger", {}).get("tracing", False)
         self.stream = stream if stream is not None else self.config.get("logger", {}).get("stream", False)
+        self.log_level, level_error = self._log_level()
+        self.compression, compression_error = self._compression()
         self._ensure_paths()
 
-        self.logger = Logger("Router",log_file=self.router_log, stream=self.stream).get()
-        self.logger.debug(f"Router init: {self.config}")
+        self.logger = Logger("Router",log_file=self.router_log, stream=self.stream, level=self.log_level).get()
+        if level_error:
+            self.logger.warning(f"{level_error} (se usa '{DEFAULT_LEVEL}')")
+        if compression_error:
+            self.logger.warning(f"{compression_error} (se usa 'none')")
+        self.logger.debug("Router init: %s", self.config)
+
+        # Conexión única por proceso: se abre al primer CRUD y se cierra al salir
+        self.db = ConnectionManager(self.database_file, pragmas=self._pragmas())
+        self._embedder = None  # Se crea al primer uso (importa NumPy)
+        self._embedding_index = None  # Matriz de vectores en memoria, cargada en la primera búsqueda semántica
+        self.notes_cache = NoteCache(self._note_cache_size())
+        atexit.register(self.close)
 
 
     def _ensure_paths(self) -> None:
@@ -49,16 +99,115 @@ class Router:
         Path(self.router_log).parent.mkdir(parents=True, exist_ok=True)
 
 
+    def resolve_paths(self) -> None:
+        """Fija las rutas relativas de la config contra el cwd actual.
+
+        Para procesos residentes (`serve`, `shell`): la base, los prompts y las caches
+        se abren recién al primer uso, que puede ocurrir con otro cwd.
+        """
+        for attr in ("database_file", "prompts_file", "router_log", "prompts_log", "cli_log", "trace_log"):
+            setattr(self, attr, str(Path(getattr(self, attr)).resolve()))
+        if self.db.db_file != self.database_file:
+            self.db.close()
+            self.db = ConnectionManager(self.database_file, pragmas=self._pragmas())
+
+
+    def _pragmas(self) -> Dict[str, Any]:
+        """Perfil de PRAGMAs: defaults sobrescritos por la sección [database]."""
+        database = self.config.get("database", {})
+        return {key: database.get(key, default) for key, default in DEFAULT_PRAGMAS.items()}
+
+
+    def _compression(self) -> Tuple[Optional[Compression], Optional[str]]:
+        """Política de compresión de cuerpos de [database] y el error si la config es inválida (se usa 'none')."""
+        database = self.config.get("database", {})
+        try:
+            return compression_policy(database.get("compression", DEFAULT_COMPRESSION["compression"]),
+                                      database.get("compress_min_bytes", DEFAULT_COMPRESSION["compress_min_bytes"])), None
+        except (TypeError, ValueError) as e:
+            return None, str(e)
+
+
+    def _note_cache_size(self) -> int:
+        """Notas en memoria (clave `note_cache` de [database]; 0 = sin cache de lectura)."""
+        return max(0, int(self.config.get("database", {}).get("note_cache", DEFAULT_NOTE_CACHE)))
+
+
+    def _cached_notes(self) -> Optional[NoteCache]:
+        """La cache de notas, ya validada contra la versión actual de la base (None si está deshabilitada)."""
+        if not self.notes_cache.enabled:
+            return None
+        self.notes_cache.sync(data_version(self.db.get()))
+        return self.notes_cache
+
+
+    def _invalidate(self, note_id: Optional[int] = None) -> None:
+        """Escritura propia (no cambia `data_version`): descarta la nota `note_id` (o todas) y la matriz de vectores."""
+        self.notes_cache.invalidate(note_id)
+        if self._embedding_index is not None:
+            self._embedding_index.invalidate()
+
+
+    def _log_level(self) -> Tuple[int, Optional[str]]:
+        """Nivel de log de la sección [logger] (default: info) y el error si el valor es inválido."""
+        try:
+            return parse_level(self.config.get("logger", {}).get("level", DEFAULT_LEVEL)), None
+        except ValueError as e:
+            return parse_level(DEFAULT_LEVEL), str(e)
+
+
+    def cache_settings(self) -> Dict[str, Any]:
+        """Config de la cache de respuestas IA: defaults sobrescritos por la sección [cache]."""
+        settings = {**DEFAULT_CACHE, **self.config.get("cache", {})}
+        settings.setdefault("file", str(Path(self.database_file).parent / "cache.db"))
+        return settings
+
+
+    def usage_settings(self) -> Dict[str, Any]:
+        """Config del registro de uso de la IA: defaults sobrescritos por la sección [usage]."""
+        settings = {**DEFAULT_USAGE, **self.config.get("usage", {})}
+        settings.setdefault("file", str(Path(self.database_file).parent / "usage.db"))
+        return settings
+
+
+    def ai_settings(self) -> Dict[str, Any]:
+        """Proveedor, concurrencia y rate limit de la IA: defaults sobrescritos por la sección [ai]."""
+        return {**DEFAULT_AI, **self.config.get("ai", {})}
+
+
+    def embedding_settings(self) -> Dict[str, Any]:
+        """Embedder y presupuesto de contexto: defaults sobrescritos por la sección [embeddings]."""
+        return {**DEFAULT_EMBEDDINGS, **self.config.get("embeddings", {})}
+
+
+    def embedder(self):
+        """Embedder configurado, creado al primer uso. Lanza EmbeddingError si la config es inválida."""
+        if self._embedder is None:
+            from backend.embeddings import create_embedder
+            self._embedder = create_embedder(self.embedding_settings())
+        return self._embedder
+
+
     def _load_config(self, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-        """Carga config con prioridad: param > file > default."""
+        """Carga config con prioridad: param > file > default.
+
+        Deja en `self.config_loaded` si se usó una config otorgada o un archivo
+        válido (False = se cayó a los defaults en memoria).
+        """
+        self.config_loaded = True
         if config:
             return config.copy()
 
         try:
             with open(self.config_path, 'rb') as f:
-                return tomllib.load(f)
+                loaded = tomllib.load(f)
+            if self._validate_config(loaded):
+                return loaded
         except (FileNotFoundError, tomllib.TOMLDecodeError):
-            return tomllib.loads(self._default_toml())
+            pass
+
+        self.config_loaded = False
+        return tomllib.loads(self._default_toml())
 
 
     def _default_toml(self) -> str:
@@ -66,11 +215,40 @@ class Router:
         return f"""[database]
 active = "{DEFAULT_PATHS['notes.db']}"
 prompts = "{DEFAULT_PATHS['prompts.json']}"
+journal_mode = "{DEFAULT_PRAGMAS['journal_mode']}"
+synchronous = "{DEFAULT_PRAGMAS['synchronous']}"
+cache_size = {DEFAULT_PRAGMAS['cache_size']}
+mmap_size = {DEFAULT_PRAGMAS['mmap_size']}
+busy_timeout = {DEFAULT_PRAGMAS['busy_timeout']}
+note_cache = {DEFAULT_NOTE_CACHE}
+compression = "{DEFAULT_COMPRESSION['compression']}"
+compress_min_bytes = {DEFAULT_COMPRESSION['compress_min_bytes']}
+
+[cache]
+enabled = {str(DEFAULT_CACHE['enabled']).lower()}
+ttl = {DEFAULT_CACHE['ttl']}
+max_mb = {DEFAULT_CACHE['max_mb']}
+
+[usage]
+enabled = {str(DEFAULT_USAGE['enabled']).lower()}
+
+[ai]
+provider = "{DEFAULT_AI['provider']}"
+concurrency = {DEFAULT_AI['concurrency']}
+rpm = {DEFAULT_AI['rpm']}
+
+[embeddings]
+embedder = "{DEFAULT_EMBEDDINGS['embedder']}"
+dim = {DEFAULT_EMBEDDINGS['dim']}
+context_tokens = {DEFAULT_EMBEDDINGS['context_tokens']}
 
 [logger]
 cli = "{DEFAULT_PATHS['cli.log']}"
 router = "{DEFAULT_PATHS['router.log']}"
 prompts = "{DEFAULT_PATHS['prompts.log']}"
+trace = "{DEFAULT_PATHS['trace.log']}"
+tracing = false
+level = "{DEFAULT_LEVEL}"
 stream = false"""
 
     def _validate_config(self, config: Dict[str, Any]) -> bool:
@@ -101,7 +279,7 @@ stream = false"""
                 return False
 
             if new_config == self.config:
-                self.logger.debug(f"Config '{path}': sin cambios")
+                self.logger.debug("Config '%s': sin cambios", path)
                 return True
 
             self.config = new_config
@@ -127,13 +305,38 @@ stream = false"""
         self.router_log = self.config["logger"]["router"]
         self.prompts_log = self.config["logger"]["prompts"]
         self.cli_log = self.config["logger"]["cli"]
+        self.trace_log = self.config["logger"].get("trace", str(DEFAULT_PATHS["trace.log"]))
+        self.tracing = self.config["logger"].get("tracing", False)
         self.stream = self.config["logger"]["stream"]
+        self.log_level, level_error = self._log_level()
+        self.compression, compression_error = self._compression()
 
         self._ensure_paths()
-        self.logger = Logger("Router", log_file=self.router_log, stream=self.stream).get()
+        self.logger = Logger("Router", log_file=self.router_log, stream=self.stream, level=self.log_level).get()
+        if level_error:
+            self.logger.warning(f"{level_error} (se usa '{DEFAULT_LEVEL}')")
+        if compression_error:
+            self.logger.warning(f"{compression_error} (se usa 'none')")
+        self._embedder = None
+
+        pragmas = self._pragmas()
+        if self.db.db_file != self.database_file or self.db.pragmas != pragmas:
+            self.db.close()
+            self.db = ConnectionManager(self.database_file, pragmas=pragmas)
+        self.notes_cache = NoteCache(self._note_cache_size())
+        self._embedding_index = None
         self.logger.info("Componentes reinicializados")
 
 
+    def close(self) -> None:
+        """Cierra la conexión persistente a la base de datos."""
+        self.notes_cache.clear()
+        self._embedding_index = None
+        if self.db.is_open:
+            self.db.close()
+            self.logger.debug("Conexión a la base de datos cerrada")
+
+
     def create_config_file(self, file_path: Optional[Union[str, Path]] = None) -> bool:
         """Crea archivo config default."""
         path = Path(file_path) if file_path else DEFAULT_PATHS["config"]
@@ -150,6 +353,7 @@ stream = false"""
 
 
     # CRUD Operations
+    @traced()
     def new_note(self, content: str) -> Optional[int]:
         """Crea nota nueva."""
         content = content.strip()
@@ -158,25 +362,162 @@ stream = false"""
             return None
 
         try:
-            note_id = notes_handler("create", self.database_file, content=content)
-            self.logger.debug(f"Nota creada: id={note_id}")
+            note_id = notes_handler("create", self.database_file, content=content, conn=self.db.get(),
+                                    compression=self.compression)
+            self.logger.debug("Nota creada: id=%s", note_id)
             return note_id
         except Exception as e:
             self.logger.error(f"Error creando nota: {e}")
             return None
+        finally:
+            self._invalidate()
+
+
+    @traced()
+    def new_notes(self, contents: Iterable[str], batch_size: Optional[int] = None) -> Optional[int]:
+        """Crea muchas notas en una transacción (o en lotes de `batch_size`)."""
+        stripped = (c for c in (content.strip() for content in contents) if c)
+
+        try:
+            total = notes_handler("create_many", self.database_file, content=stripped,
+                                  conn=self.db.get(), batch_size=batch_size, compression=self.compression)
+            self.logger.debug("%s notas creadas en bloque", total)
+            return total
+        except Exception as e:
+            self.logger.error(f"Error creando notas en bloque: {e}")
+            return None
+        finally:
+            self._invalidate()
 
 
+    @traced()
     def read_notes(self) -> Optional[List[Tuple]]:
-        """Lee todas las notas."""
+        """Lee todas las notas (desde memoria si la base no cambió desde la última lectura)."""
         try:
-            notes = notes_handler("read", self.database_file)
-            self.logger.debug(f"{len(notes)} notas leídas")
+            cache = self._cached_notes()
+            notes = cache.get_all() if cache else None
+            if notes is not None:
+                self.logger.debug("%d notas leídas (cache)", len(notes))
+                return notes
+            notes = notes_handler("read", self.database_file, conn=self.db.get())
+            if cache:
+                cache.put_all(notes)
+            self.logger.debug("%d notas leídas", len(notes))
             return notes
         except Exception as e:
             self.logger.error(f"Error leyendo notas: {e}")
             return None
 
 
+    @traced()
+    def iter_notes(self, limit: Optional[int] = None, after: Optional[int] = None,
+                   reverse: bool = False, page_size: int = 500, until: Optional[int] = None,
+                   query: Optional[str] = None, preview: bool = False) -> Iterator[Tuple]:
+        """Recorre las notas por páginas (streaming). Con `preview` solo (id, preview, timestamp, char_count).
+
+        Propaga errores tras loguearlos.
+        """
+        try:
+            yield from notes_handler("iter", self.database_file, conn=self.db.get(), limit=limit,
+                                     after=after, reverse=reverse, page_size=page_size,
+                                     until=until, query=query, preview=preview)
+        except Exception as e:
+            self.logger.error(f"Error recorriendo notas: {e}")
+            raise
+
+
+    def iter_changes(self, since: int = 0, since_time: Optional[str] = None,
+                     page_size: int = 500) -> Iterator[Tuple]:
+        """Recorre las notas cambiadas desde el número de secuencia `since` (tombstones incluidos).
+
+        Propaga errores tras loguearlos.
+        """
+        try:
+            yield from notes_handler("changes", self.database_file, conn=self.db.get(), since=since,
+                                     since_time=since_time, page_size=page_size)
+        except Exception as e:
+            self.logger.error(f"Error recorriendo cambios: {e}")
+            raise
+
+
+    @traced()
+    def get_note(self, note_id: int) -> Optional[Tuple]:
+        """Lee una nota por ID (búsqueda por clave primaria, o desde memoria si la base no cambió)."""
+        try:
+            cache = self._cached_notes()
+            if cache:
+                found, note = cache.get(note_id)
+                if found:
+                    self.logger.debug("Nota id=%s %s (cache)", note_id, "leída" if note else "no encontrada")
+                    return note
+            note = notes_handler("get", self.database_file, note_id=note_id, conn=self.db.get())
+            if cache and note:
+                cache.put(note)
+            self.logger.debug("Nota id=%s %s", note_id, "leída" if note else "no encontrada")
+            return note
+        except Exception as e:
+            self.logger.error(f"Error leyendo nota id={note_id}: {e}")
+            return None
+
+
+    @traced()
+    def search_notes(self, query: str, limit: int = 20,
+                     highlight: Tuple[str, str] = ("[", "]")) -> Optional[List[Tuple]]:
+        """Busca notas por texto usando el índice full-text."""
+        query = query.strip()
+        if not query:
+            self.logger.error("Consulta vacía")
+            return None
+
+        try:
+            matches = notes_handler("search", self.database_file, content=query, conn=self.db.get(),
+                                    limit=limit, highlight=highlight)
+            self.logger.debug("Búsqueda '%s': %d resultados", query, len(matches))
+            return matches
+        except Exception as e:
+            self.logger.error(f"Error buscando '{query}': {e}")
+            return None
+
+
+    @traced()
+    def sync_embeddings(self, rebuild: bool = False,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Optional[int]:
+        """Indexa (calcula el vector de) las notas nuevas o modificadas desde la última vez."""
+        try:
+            total = notes_handler("embed", self.database_file, conn=self.db.get(), embedder=self.embedder(),
+                                  batch_size=self.embedding_settings()["batch_size"],
+                                  rebuild=rebuild, progress=progress)
+            self.logger.debug("Embeddings: %s notas indexadas (modelo %s)", total, self.embedder().model)
+            if total or rebuild:
+                self._invalidate()
+            return total
+        except Exception as e:
+            self.logger.error(f"Error indexando notas: {e}")
+            return None
+
+
+    @traced()
+    def semantic_search(self, query: str, limit: int = 20) -> Optional[List[Tuple]]:
+        """Notas más parecidas a la consulta por similitud coseno (id, timestamp, content, score)."""
+        query = query.strip()
+        if not query:
+            self.logger.error("Consulta vacía")
+            return None
+
+        try:
+            if self._embedding_index is None:
+                from backend.embeddings import EmbeddingIndex
+                self._embedding_index = EmbeddingIndex()
+            matches = notes_handler("semantic", self.database_file, content=query, conn=self.db.get(),
+                                    embedder=self.embedder(), limit=limit, index=self._embedding_index)
+            self.logger.debug("Búsqueda semántica '%s': %d resultados", query, len(matches))
+            return matches
+        except Exception as e:
+            self.logger.error(f"Error en la búsqueda semántica '{query}': {e}")
+            return None
+
+
+    @traced()
     def update_note(self, note_id: int, content: str) -> Optional[bool]:
         """Actualiza nota existente."""
         content = content.strip()
@@ -185,23 +526,66 @@ stream = false"""
             return False
 
         try:
-            notes_handler("update", self.database_file, note_id=note_id, content=content)
-            self.logger.debug(f"Nota id={note_id} actualizada")
+            notes_handler("update", self.database_file, note_id=note_id, content=content, conn=self.db.get(),
+                          compression=self.compression)
+            self.logger.debug("Nota id=%s actualizada", note_id)
             return True
         except Exception as e:
             self.logger.error(f"Error actualizando nota id={note_id}: {e}")
             return None
+        finally:
+            self._invalidate(note_id)
 
 
+    @traced()
     def delete_note(self, note_id: int) -> Optional[bool]:
         """Elimina nota por ID."""
         try:
-            notes_handler("delete", self.database_file, note_id=note_id)
-            self.logger.debug(f"Nota id={note_id} eliminada")
+            notes_handler("delete", self.database_file, note_id=note_id, conn=self.db.get())
+            self.logger.debug("Nota id=%s eliminada", note_id)
             return True
         except Exception as e:
             self.logger.error(f"Error eliminando nota id={note_id}: {e}")
             return None
+        finally:
+            self._invalidate(note_id)
+
+
+    @traced()
+    def batch(self, operations: Iterable[Any], chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Aplica un stream de operaciones create/update/delete en transacciones (o en lotes)."""
+        applied = failed = 0
+        try:
+            for result in notes_handler("batch", self.database_file, content=operations, conn=self.db.get(),
+                                        chunk_size=chunk_size, compression=self.compression):
+                if result["ok"]:
+                    applied += 1
+                else:
+                    failed += 1
+                self._invalidate()  # Entre yields el llamador puede volver a leer
+                yield result
+        except Exception as e:
+            self.logger.error(f"Error aplicando lote de operaciones: {e}")
+            raise
+        finally:
+            self._invalidate()
+            self.logger.debug("Lote aplicado: %d ok, %d con error", applied, failed)
+
+
+    @traced()
+    def compact(self, vacuum: bool = True,
+                progress: Optional[Callable[[int, int], None]] = None) -> Optional[Dict[str, int]]:
+        """Recodifica los cuerpos de las notas según la compresión configurada (y hace VACUUM)."""
+        try:
+            stats = notes_handler("compact", self.database_file, conn=self.db.get(), compression=self.compression,
+                                  progress=progress, vacuum=vacuum)
+            self.logger.debug("Compactación: %s", stats)
+            return stats
+        except Exception as e:
+            self.logger.error(f"Error compactando notas: {e}")
+            return None
+        finally:
+            self._invalidate()
 
 
     def get_summary(self) -> Dict[str, Any]:
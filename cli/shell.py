@@ -0,0 +1,217 @@
+import shlex
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import readline
+except ImportError:  # Windows sin pyreadline: el shell funciona sin completado ni historial
+    readline = None
+
+from backend.database import data_version
+from daemon import reads_stdin
+
+PROMPT = "mnctl> "
+EXIT_COMMANDS = {"exit", "quit", "salir"}
+HISTORY_LENGTH = 1000
+# Comandos cuyo primer argumento es un ID de nota (o una selección de IDs): se completan con el índice
+ID_COMMANDS = {
+    "leer", "read", "id",
+    "modificar", "modify", "update", "mod",
+    "eliminar", "remove", "delete", "rm",
+    "exportar", "export", "out",
+    "mejorar", "enhance",
+    "traducir", "translate", "trans",
+    "resumir", "summarize", "sum",
+    "preguntar", "ask",
+}
+# No escriben notas: después de ellos el índice de completado sigue válido
+READ_ONLY_COMMANDS = {
+    "leer", "read", "id",
+    "listar", "list", "ls",
+    "buscar", "search", "find", "grep",
+    "exportar", "export", "out",
+    "indexar", "index",
+    "cache", "ai-stats",
+}
+# No tienen sentido dentro del shell (bloquean o anidan el loop)
+BLOCKED_COMMANDS = {"shell", "serve"}
+MAX_LISTED = 40
+
+
+class NoteIndex:
+    """IDs y vistas previas de las notas para el completado; se recarga solo si la base cambió."""
+
+    def __init__(self, router: Any) -> None:
+        self.router = router
+        self.previews: Dict[int, str] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self.writes = 0  # Lo incrementa el shell tras cada comando (escrituras propias)
+
+
+    def refresh(self) -> Dict[int, str]:
+        version = (data_version(self.router.db.get()), self.writes)
+        if version != self._version:
+            self.previews = {
+                note[0]: " ".join(note[1].split())
+                for note in self.router.iter_notes(page_size=2000, preview=True)
+            }
+            self._version = version
+        return self.previews
+
+
+class Completer:
+    """Completado de readline: comandos, opciones del comando e IDs de nota (con vista previa)."""
+
+    def __init__(self, group: Any, index: NoteIndex) -> None:
+        self.group = group
+        self.index = index
+        self.commands = sorted(set(group.commands) - BLOCKED_COMMANDS | EXIT_COMMANDS)
+        self._matches: List[str] = []
+
+
+    def _options(self, name: str) -> List[str]:
+        command = self.group.commands.get(name)
+        if command is None:
+            return []
+        return sorted(opt for param in command.params for opt in param.opts + param.secondary_opts
+                      if opt.startswith("-"))
+
+
+    def candidates(self, words: List[str], text: str) -> List[str]:
+        if not words:
+            return [name for name in self.commands if name.startswith(text)]
+        if text.startswith("-"):
+            return [opt for opt in self._options(words[0]) if opt.startswith(text)]
+        if words[0] in ID_COMMANDS and len(words) == 1:
+            try:
+                previews = self.index.refresh()
+            except Exception:
+                return []
+            return [str(note_id) for note_id in sorted(previews) if str(note_id).startswith(text)]
+        return []
+
+
+    def complete(self, text: str, state: int) -> Optional[str]:
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_begidx()]
+            try:
+                words = shlex.split(line)
+            except ValueError:
+                words = []
+            self._matches = self.candidates(words, text)
+        return self._matches[state] if state < len(self._matches) else None
+
+
+    def display(self, substitution: str, matches: List[str], longest: int) -> None:
+        """Lista los candidatos; los IDs van con la vista previa de la nota."""
+        print()
+        previews = self.index.previews
+        for match in matches[:MAX_LISTED]:
+            preview = previews.get(int(match)) if match.isdigit() else None
+            print(f"{match:>8}  {preview}" if preview is not None else f"  {match}")
+        if len(matches) > MAX_LISTED:
+            print(f"  ... y {len(matches) - MAX_LISTED} más")
+        print(PROMPT + readline.get_line_buffer(), end="", flush=True)
+
+
+def _setup_readline(completer: Completer, history_file: Path) -> None:
+    if readline is None:
+        return
+    readline.set_completer(completer.complete)
+    readline.set_completer_delims(" \t\n\"'")
+    readline.set_completion_display_matches_hook(completer.display)
+    # libedit (macOS) usa otra sintaxis para el binding
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+    readline.set_history_length(HISTORY_LENGTH)
+    try:
+        readline.read_history_file(history_file)
+    except OSError:
+        pass  # Primera sesión
+
+
+def _save_history(history_file: Path) -> None:
+    if readline is None:
+        return
+    try:
+        history_file.parent.mkdir(parents=True, exist_ok=True)
+        readline.write_history_file(history_file)
+    except OSError:
+        pass
+
+
+def execute(group: Any, argv: List[str]) -> int:
+    """Ejecuta una línea como `mnctl <argv>` en el proceso actual. Devuelve el código de salida."""
+    import click
+
+    try:
+        result = group.main(args=argv, prog_name="mnctl", standalone_mode=False)
+        return result if isinstance(result, int) else 0
+    except SystemExit as e:
+        if e.code is not None and not isinstance(e.code, int):
+            print(e.code, file=sys.stderr)
+            return 1
+        return e.code or 0
+    except click.exceptions.Exit as e:
+        return e.exit_code
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+    except (click.Abort, KeyboardInterrupt):
+        print("\nCancelado.", file=sys.stderr)
+        return 1
+    except Exception as e:
+        # Un comando que falla no puede tirar abajo la sesión (y su estado ya inicializado)
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+def run(group: Any, router: Any, logger: Any, history_file: Path) -> None:
+    """Loop interactivo: lee comandos de mnctl y los ejecuta con el contexto ya inicializado."""
+    index = NoteIndex(router)
+    completer = Completer(group, index)
+    interactive = sys.stdin.isatty()
+    if interactive:
+        _setup_readline(completer, history_file)
+
+    try:
+        while True:
+            try:
+                line = input(PROMPT if interactive else "")
+            except EOFError:
+                break
+            except KeyboardInterrupt:
+                print()
+                continue
+
+            try:
+                argv = shlex.split(line)
+            except ValueError as e:
+                print(f"Línea inválida: {e}", file=sys.stderr)
+                continue
+            if not argv:
+                continue
+            if argv[0] in EXIT_COMMANDS:
+                break
+            if argv[0] in BLOCKED_COMMANDS:
+                print(f"'{argv[0]}' no está disponible dentro del shell.", file=sys.stderr)
+                continue
+            if reads_stdin(argv):
+                # Leería el stdin del shell hasta EOF: las operaciones tienen que venir de un archivo
+                print(f"'{argv[0]}' lee de stdin: dentro del shell indicá un archivo (ej. {argv[0]} ops.ndjson).",
+                      file=sys.stderr)
+                continue
+            if argv[0] in ("help", "ayuda"):
+                argv = ["--help"]
+
+            code = execute(group, argv)
+            if argv[0] not in READ_ONLY_COMMANDS:
+                index.writes += 1  # Pudo escribir con la conexión propia (data_version no cambia)
+            logger.debug("Shell: %s -> exit=%s", argv, code)
+    finally:
+        if interactive:
+            _save_history(history_file)
+            print()